@@ -0,0 +1,29 @@
+from django.contrib import admin
+
+from .models import LedgerEntry, MerchantBalanceSnapshot
+# Register your models here.
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """The ledger is append-only; postings come from the balance operations, not the admin."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(ReadOnlyAdmin):
+    list_display = ('id', 'created_at', 'kind', 'account', 'amount', 'transaction_id', 'posting_id')
+    list_filter = ('kind',)
+    search_fields = ('account', 'posting_id')
+
+
+@admin.register(MerchantBalanceSnapshot)
+class MerchantBalanceSnapshotAdmin(ReadOnlyAdmin):
+    list_display = ('merchant_id', 'balance', 'as_of', 'last_entry_id')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from django.db.models import Exists, OuterRef, Sum
+
+from apps.ledger.models import LedgerEntry
+from apps.ledger.postings import OPENING, Posting, post_many
+from apps.merchant.models import Merchant
+
+
+class Command(BaseCommand):
+    help = (
+        "Carry merchant balances into the ledger: post, once per merchant, the part of "
+        "current_balance the ledger does not account for yet"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be posted")
+
+    def handle(self, *args, **options):
+        with db_transaction.atomic():
+            # lock the wallets so no balance moves between reading it and posting it
+            merchants = list(
+                Merchant.objects.select_for_update()
+                .filter(~Exists(LedgerEntry.objects.filter(kind=OPENING, merchant_id=OuterRef('id'))))
+                .values_list('id', 'current_balance')
+            )
+            in_ledger = dict(
+                LedgerEntry.objects.filter(merchant_id__in=[merchant_id for merchant_id, _ in merchants])
+                .values('merchant_id').annotate(total=Sum('amount')).order_by()
+                .values_list('merchant_id', 'total')
+            )
+            postings = []
+            for merchant_id, balance in merchants:
+                opening = balance - in_ledger.get(merchant_id, 0)
+                if opening > 0:
+                    postings.append(Posting(OPENING, merchant_id, opening, description="Opening balance"))
+                elif opening < 0:
+                    self.stderr.write(f"Merchant {merchant_id}: ledger exceeds current_balance by {-opening}, not posted")
+            if options["dry_run"]:
+                self.stdout.write(f"Would post {len(postings)} opening balance(s)")
+                return
+            count = post_many(postings)
+        self.stdout.write(f"Posted {count} opening balance(s)")
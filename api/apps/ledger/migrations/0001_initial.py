@@ -0,0 +1,68 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('merchant', '0007_merchant_api_key_hash'),
+        ('product', '0010_transaction_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posting_id', models.UUIDField(db_index=True, default=uuid.uuid4)),
+                ('kind', models.CharField(choices=[('debit', 'Debit'), ('reversal', 'Reversal'), ('funding', 'Funding'), ('opening', 'Opening Balance')], max_length=20)),
+                ('account', models.CharField(max_length=64)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('funding_ref', models.UUIDField(blank=True, null=True)),
+                ('description', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('merchant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='merchant.merchant')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='product.transaction')),
+            ],
+            options={
+                'db_table': 'ledger_entries',
+            },
+        ),
+        migrations.CreateModel(
+            name='MerchantBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('last_entry_id', models.BigIntegerField()),
+                ('as_of', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='balance_snapshots', to='merchant.merchant')),
+            ],
+            options={
+                'db_table': 'ledger_balance_snapshots',
+                'indexes': [models.Index(fields=['merchant', 'as_of'], name='ledger_snapshot_merchant_idx'), models.Index(fields=['last_entry_id'], name='ledger_snapshot_entry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='merchantbalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('merchant', 'last_entry_id'), name='ledger_snapshot_merchant_entry_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['merchant', 'id'], name='ledger_merchant_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['account', 'created_at'], name='ledger_account_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['created_at'], name='ledger_created_idx'),
+        ),
+    ]
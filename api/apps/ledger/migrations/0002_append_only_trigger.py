@@ -0,0 +1,42 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:36
+
+from django.db import migrations
+
+# PostgreSQL only; other backends rely on the model/queryset guards
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION ledger_entries_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'ledger_entries is append-only; post a correcting entry instead';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ledger_entries_append_only
+    BEFORE UPDATE OR DELETE ON ledger_entries
+    FOR EACH ROW EXECUTE FUNCTION ledger_entries_append_only();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS ledger_entries_append_only ON ledger_entries;
+DROP FUNCTION IF EXISTS ledger_entries_append_only();
+"""
+
+
+def create_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -0,0 +1,93 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+
+# Create your models here.
+
+#=============================================#
+#********** Ledger Entry *********************#
+#=============================================#
+class AppendOnlyQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError("ledger entries are append-only; post a correcting entry instead")
+
+    def delete(self):
+        raise TypeError("ledger entries are append-only; post a correcting entry instead")
+
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a double-entry posting. Every posting writes two or more legs
+    sharing ``posting_id`` whose amounts sum to zero; a merchant wallet leg
+    is positive when money is credited to the merchant.
+
+    Rows are never updated or deleted (enforced here and, on PostgreSQL, by
+    a trigger): a mistake is corrected with another posting.
+    """
+    KIND = [
+        ("debit", "Debit"),
+        ("reversal", "Reversal"),
+        ("funding", "Funding"),
+        ("opening", "Opening Balance"),
+    ]
+    posting_id = models.UUIDField(default=uuid.uuid4, db_index=True)
+    kind = models.CharField(max_length=20, choices=KIND)
+    account = models.CharField(max_length=64)  # "merchant:<id>" or a system account, see apps.ledger.postings
+    merchant = models.ForeignKey('merchant.Merchant', on_delete=models.DO_NOTHING, related_name='ledger_entries', null=True, blank=True)
+    amount = models.DecimalField(max_digits=16, decimal_places=2)
+    transaction = models.ForeignKey('product.Transaction', on_delete=models.DO_NOTHING, related_name='ledger_entries', null=True, blank=True)
+    funding_ref = models.UUIDField(null=True, blank=True)
+    description = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = AppendOnlyQuerySet.as_manager()
+
+    class Meta:
+        db_table = "ledger_entries"
+        indexes = [
+            # balance deltas: a merchant's entries after a snapshot's last_entry_id
+            models.Index(fields=['merchant', 'id'], name='ledger_merchant_id_idx'),
+            models.Index(fields=['account', 'created_at'], name='ledger_account_created_idx'),
+            models.Index(fields=['created_at'], name='ledger_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("ledger entries are append-only; post a correcting entry instead")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("ledger entries are append-only; post a correcting entry instead")
+
+    def __str__(self):
+        return f"{self.kind} {self.account} {self.amount}"
+
+
+#=============================================#
+#********** Merchant Balance Snapshot ********#
+#=============================================#
+class MerchantBalanceSnapshot(models.Model):
+    """
+    A merchant's wallet balance including every ledger entry up to
+    ``last_entry_id``; the balance at any later point is this plus the sum of
+    the merchant's entries after it.
+    """
+    merchant = models.ForeignKey('merchant.Merchant', on_delete=models.DO_NOTHING, related_name='balance_snapshots')
+    balance = models.DecimalField(max_digits=16, decimal_places=2)
+    last_entry_id = models.BigIntegerField()
+    as_of = models.DateTimeField()  # created_at of the last entry included
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "ledger_balance_snapshots"
+        constraints = [
+            models.UniqueConstraint(fields=['merchant', 'last_entry_id'], name='ledger_snapshot_merchant_entry_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['merchant', 'as_of'], name='ledger_snapshot_merchant_idx'),
+            models.Index(fields=['last_entry_id'], name='ledger_snapshot_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.merchant_id} {self.balance} @ {self.as_of}"
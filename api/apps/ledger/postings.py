@@ -0,0 +1,200 @@
+"""
+Double-entry postings and point-in-time balances.
+
+A posting moves money between a merchant's wallet account and a system
+account, as two ``LedgerEntry`` legs that sum to zero:
+
+    debit     merchant -amount, system:sales +amount    (vend)
+    reversal  merchant +amount, system:sales -amount    (failed vend refunded)
+    funding   merchant +amount, system:funding -amount  (merchant tops up)
+    opening   merchant +amount, system:opening -amount  (balance carried into the ledger)
+
+Postings are written in the same database transaction as the balance change
+they record (``Merchant.debit_balance`` callers, ``Merchant.credit_balance``).
+Batch jobs use ``post_many``, which inserts thousands of legs per statement.
+
+Balances are snapshot plus delta: ``take_snapshots`` (Celery beat) records
+every changed merchant's balance up to a ledger entry id, and
+``balance_at`` adds the merchant's entries since the latest snapshot.
+
+A snapshot must never pass an id whose transaction has not committed yet (a
+vend in flight, or ``ledger_opening_balances`` inserting for minutes): later
+snapshots start after it and would miss the entry for good. On PostgreSQL
+each run therefore records the newest visible id together with the
+snapshot's xmax, and a later run only snapshots up to that id once
+``pg_snapshot_xmin`` has passed the xmax, i.e. once every transaction that
+could still have held a smaller id has finished. Entries must also be older
+than ``SNAPSHOT_SETTLE``; elsewhere that is the only guard.
+"""
+import datetime
+import logging
+import uuid
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import connections, transaction as db_transaction
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from apps.ledger.models import LedgerEntry, MerchantBalanceSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEBIT = "debit"
+REVERSAL = "reversal"
+FUNDING = "funding"
+OPENING = "opening"
+
+MERCHANT_ACCOUNT = "merchant:{}"
+SALES_ACCOUNT = "system:sales"  # value vended, settled with the providers
+FUNDING_ACCOUNT = "system:funding"  # money received from merchants
+OPENING_ACCOUNT = "system:opening"
+
+# kind -> (sign of the merchant leg, counter account)
+POSTING_RULES = {
+    DEBIT: (-1, SALES_ACCOUNT),
+    REVERSAL: (1, SALES_ACCOUNT),
+    FUNDING: (1, FUNDING_ACCOUNT),
+    OPENING: (1, OPENING_ACCOUNT),
+}
+
+BULK_BATCH_SIZE = 2000  # legs per INSERT
+# Entries younger than this are left for the next snapshot: their id may have
+# been allocated before a smaller one whose transaction has not committed yet
+SNAPSHOT_SETTLE = datetime.timedelta(minutes=2)
+SNAPSHOT_CANDIDATE_KEY = "ledger:snapshot_candidate"  # (newest entry id, snapshot xmax) of the last run
+
+TXID_SQL = """
+    SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint,
+           pg_snapshot_xmax(pg_current_snapshot())::text::bigint,
+           (SELECT max(id) FROM ledger_entries)
+"""
+
+
+class Posting(NamedTuple):
+    kind: str
+    merchant_id: int
+    amount: Decimal
+    transaction_id: Optional[int] = None
+    funding_ref: Optional[uuid.UUID] = None
+    description: str = ""
+    created_at: Optional[datetime.datetime] = None
+
+
+#================ POSTING ====
+def legs(posting):
+    """The balanced ``LedgerEntry`` rows (unsaved) for one posting."""
+    amount = Decimal(posting.amount)
+    if amount <= 0:
+        raise ValueError("Posting amount must be greater than 0")
+    sign, counter_account = POSTING_RULES[posting.kind]
+    common = {
+        "posting_id": uuid.uuid4(),
+        "kind": posting.kind,
+        "transaction_id": posting.transaction_id,
+        "funding_ref": posting.funding_ref,
+        "description": posting.description[:255],
+        "created_at": posting.created_at or timezone.now(),
+    }
+    return [
+        LedgerEntry(account=MERCHANT_ACCOUNT.format(posting.merchant_id), merchant_id=posting.merchant_id,
+                    amount=sign * amount, **common),
+        LedgerEntry(account=counter_account, amount=-sign * amount, **common),
+    ]
+
+
+def post(kind, merchant_id, amount, **kwargs):
+    """Write one posting (a single INSERT); call it inside the transaction that moves the balance."""
+    return LedgerEntry.objects.bulk_create(legs(Posting(kind, merchant_id, amount, **kwargs)))
+
+
+def post_many(postings, batch_size=BULK_BATCH_SIZE):
+    """
+    Bulk posting for batch jobs: ``postings`` is any iterable of ``Posting``.
+    Legs are inserted ``batch_size`` at a time and a posting never straddles
+    two batches. Wrap the call in ``transaction.atomic()`` for all-or-nothing.
+    Returns the number of postings written.
+    """
+    count = 0
+    batch = []
+    for posting in postings:
+        batch.extend(legs(posting))
+        count += 1
+        if len(batch) >= batch_size:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        LedgerEntry.objects.bulk_create(batch)
+    return count
+
+
+#================ BALANCES ====
+def balance_at(merchant_id, at=None):
+    """Wallet balance of ``merchant_id`` at ``at`` (now when None), from the ledger."""
+    snapshots = MerchantBalanceSnapshot.objects.filter(merchant_id=merchant_id)
+    entries = LedgerEntry.objects.filter(merchant_id=merchant_id)
+    if at is not None:
+        snapshots = snapshots.filter(as_of__lte=at)
+        entries = entries.filter(created_at__lte=at)
+    snapshot = snapshots.order_by('-last_entry_id').values_list('balance', 'last_entry_id').first()
+    balance, last_entry_id = snapshot or (Decimal("0"), 0)
+    delta = entries.filter(id__gt=last_entry_id).aggregate(total=Sum('amount'))['total']
+    return balance + (delta or 0)
+
+
+def _committed_upper(settle):
+    """Newest entry id every smaller id of which has committed (or rolled back), or None."""
+    upper = LedgerEntry.objects.filter(created_at__lte=timezone.now() - settle).aggregate(last=Max('id'))['last']
+    connection = connections[LedgerEntry.objects.db]
+    if upper is None or connection.vendor != "postgresql":
+        return upper
+    with connection.cursor() as cursor:
+        cursor.execute(TXID_SQL)
+        xmin, xmax, newest = cursor.fetchone()
+
+    candidate = cache.get(SNAPSHOT_CANDIDATE_KEY)
+    if candidate is not None and xmin < candidate[1]:
+        return None  # a transaction running at the last capture is still open
+    if newest is not None:
+        cache.set(SNAPSHOT_CANDIDATE_KEY, (newest, xmax), None)
+    # the time guard still covers a statement that has drawn its id but not yet its xid
+    return min(upper, candidate[0]) if candidate is not None else None
+
+
+def take_snapshots(settle=SNAPSHOT_SETTLE):
+    """
+    Snapshot every merchant with ledger entries since the previous run, up to
+    the newest settled entry. Returns the number of snapshots written.
+    """
+    upper = _committed_upper(settle)
+    lower = MerchantBalanceSnapshot.objects.aggregate(last=Max('last_entry_id'))['last'] or 0
+    if upper is None or upper <= lower:
+        return 0
+
+    # every merchant with entries up to ``lower`` was snapshotted at ``lower``,
+    # so its latest snapshot plus this window is its balance at ``upper``
+    previous = (
+        MerchantBalanceSnapshot.objects.filter(merchant_id=OuterRef('merchant_id'))
+        .order_by('-last_entry_id')
+        .values('balance')[:1]
+    )
+    changes = (
+        LedgerEntry.objects.filter(merchant__isnull=False, id__gt=lower, id__lte=upper)
+        .values('merchant_id')
+        .annotate(delta=Sum('amount'), as_of=Max('created_at'), previous=Subquery(previous))
+        .order_by()
+    )
+    snapshots = [
+        MerchantBalanceSnapshot(
+            merchant_id=row['merchant_id'],
+            balance=(row['previous'] or 0) + row['delta'],
+            last_entry_id=upper,
+            as_of=row['as_of'],
+        )
+        for row in changes.iterator()
+    ]
+    with db_transaction.atomic():
+        MerchantBalanceSnapshot.objects.bulk_create(snapshots, batch_size=BULK_BATCH_SIZE)
+    logger.info(f"LEDGER SNAPSHOTS:: MERCHANTS={len(snapshots)} LAST_ENTRY_ID={upper}")
+    return len(snapshots)
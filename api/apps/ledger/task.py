@@ -0,0 +1,27 @@
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+
+from apps.ledger.postings import take_snapshots
+
+logger = logging.getLogger(__name__)
+
+LOCK_EXPIRE = 600  # seconds
+
+
+#******************************************************#
+#======= per-merchant ledger balance snapshots ========#
+#******************************************************#
+@shared_task(bind=True)
+def take_balance_snapshots_task(self):
+    lock_id = "ledger-snapshot-lock"
+    if not cache.add(lock_id, "locked", LOCK_EXPIRE):
+        logger.warning("Ledger snapshot already running, skipping...")
+        return
+    try:
+        return take_snapshots()
+    except Exception as e:
+        logger.error(f"LEDGER SNAPSHOT FAILED:: REASON={e}", exc_info=True)
+    finally:
+        cache.delete(lock_id)
@@ -0,0 +1,186 @@
+import datetime
+import io
+import unittest
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction as db_transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from apps.ledger import postings
+from apps.ledger.models import LedgerEntry, MerchantBalanceSnapshot
+from apps.merchant.models import Merchant, User
+
+NO_SETTLE = datetime.timedelta(0)
+
+
+def create_merchant(name="ledger"):
+    user = User.objects.create(email=f"{name}@example.com", username=name)
+    return Merchant.objects.create(business_name=name, current_balance=Decimal("0"), user=user)
+
+
+def snapshot():
+    # on PostgreSQL the first run only records the commit watermark
+    postings.take_snapshots(settle=NO_SETTLE)
+    postings.take_snapshots(settle=NO_SETTLE)
+
+
+#================ POSTING ====
+class PostTests(TestCase):
+    def setUp(self):
+        self.merchant = create_merchant()
+
+    def test_post_writes_balanced_legs(self):
+        entries = postings.post(postings.DEBIT, self.merchant.id, Decimal("100"), description="vend")
+        self.assertEqual(len(entries), 2)
+        merchant_leg, sales_leg = entries
+        self.assertEqual((merchant_leg.account, merchant_leg.amount), (f"merchant:{self.merchant.id}", Decimal("-100")))
+        self.assertEqual((sales_leg.account, sales_leg.amount, sales_leg.merchant_id), (postings.SALES_ACCOUNT, Decimal("100"), None))
+        self.assertEqual(merchant_leg.posting_id, sales_leg.posting_id)
+
+    def test_counter_accounts_and_signs(self):
+        for kind, sign, account in [
+            (postings.FUNDING, 1, postings.FUNDING_ACCOUNT),
+            (postings.REVERSAL, 1, postings.SALES_ACCOUNT),
+            (postings.OPENING, 1, postings.OPENING_ACCOUNT),
+        ]:
+            merchant_leg, counter_leg = postings.post(kind, self.merchant.id, Decimal("10"))
+            self.assertEqual(merchant_leg.amount, sign * Decimal("10"))
+            self.assertEqual((counter_leg.account, counter_leg.amount), (account, -sign * Decimal("10")))
+
+    def test_amount_must_be_positive(self):
+        for amount in (Decimal("0"), Decimal("-5")):
+            with self.assertRaises(ValueError):
+                postings.post(postings.DEBIT, self.merchant.id, amount)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_post_many_keeps_postings_whole(self):
+        count = postings.post_many(
+            (postings.Posting(postings.FUNDING, self.merchant.id, Decimal("5")) for _ in range(7)), batch_size=3,
+        )
+        self.assertEqual(count, 7)
+        self.assertEqual(LedgerEntry.objects.count(), 14)
+        self.assertEqual(LedgerEntry.objects.values("posting_id").distinct().count(), 7)
+        self.assertEqual(sum(LedgerEntry.objects.values_list("amount", flat=True)), 0)
+
+
+#================ BALANCES ====
+class BalanceTests(TransactionTestCase):
+    def setUp(self):
+        cache.delete(postings.SNAPSHOT_CANDIDATE_KEY)
+        self.merchant = create_merchant()
+        self.other = create_merchant("other")
+
+    def tearDown(self):
+        cache.delete(postings.SNAPSHOT_CANDIDATE_KEY)
+
+    def test_balance_from_entries(self):
+        postings.post(postings.FUNDING, self.merchant.id, Decimal("100"))
+        postings.post(postings.DEBIT, self.merchant.id, Decimal("30"))
+        postings.post(postings.FUNDING, self.other.id, Decimal("999"))
+        self.assertEqual(postings.balance_at(self.merchant.id), Decimal("70"))
+
+    def test_balance_at_a_point_in_time(self):
+        start = timezone.now() - datetime.timedelta(hours=3)
+        postings.post(postings.FUNDING, self.merchant.id, Decimal("100"), created_at=start)
+        postings.post(postings.DEBIT, self.merchant.id, Decimal("30"), created_at=start + datetime.timedelta(hours=1))
+        postings.post(postings.DEBIT, self.merchant.id, Decimal("20"), created_at=start + datetime.timedelta(hours=2))
+        self.assertEqual(postings.balance_at(self.merchant.id, start - datetime.timedelta(minutes=1)), Decimal("0"))
+        self.assertEqual(postings.balance_at(self.merchant.id, start + datetime.timedelta(minutes=90)), Decimal("70"))
+        self.assertEqual(postings.balance_at(self.merchant.id), Decimal("50"))
+
+    def test_snapshot_plus_delta(self):
+        postings.post(postings.FUNDING, self.merchant.id, Decimal("100"))
+        postings.post(postings.FUNDING, self.other.id, Decimal("40"))
+        snapshot()
+        self.assertEqual(
+            dict(MerchantBalanceSnapshot.objects.values_list("merchant_id", "balance")),
+            {self.merchant.id: Decimal("100"), self.other.id: Decimal("40")},
+        )
+        postings.post(postings.DEBIT, self.merchant.id, Decimal("25"))
+        self.assertEqual(postings.balance_at(self.merchant.id), Decimal("75"))
+
+        snapshot()
+        latest = MerchantBalanceSnapshot.objects.filter(merchant=self.merchant).order_by("-last_entry_id").first()
+        self.assertEqual(latest.balance, Decimal("75"))
+        # untouched merchants get no new snapshot
+        self.assertEqual(MerchantBalanceSnapshot.objects.filter(merchant=self.other).count(), 1)
+        self.assertEqual(postings.balance_at(self.merchant.id), Decimal("75"))
+
+    def test_unsettled_entries_wait(self):
+        postings.post(postings.FUNDING, self.merchant.id, Decimal("100"))
+        self.assertEqual(postings.take_snapshots(), 0)
+        self.assertEqual(postings.balance_at(self.merchant.id), Decimal("100"))
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "commit watermark is PostgreSQL only")
+    def test_open_transactions_hold_the_watermark(self):
+        postings.post(postings.FUNDING, self.merchant.id, Decimal("100"))
+        # a capture whose transactions have not all finished yet
+        cache.set(postings.SNAPSHOT_CANDIDATE_KEY, (LedgerEntry.objects.latest("id").id, 2 ** 62), None)
+        self.assertEqual(postings.take_snapshots(settle=NO_SETTLE), 0)
+        self.assertFalse(MerchantBalanceSnapshot.objects.exists())
+
+
+#================ OPENING BALANCES ====
+class OpeningBalanceTests(TestCase):
+    def run_command(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("ledger_opening_balances", stdout=out, stderr=err)
+        return out.getvalue().strip()
+
+    def opening(self, merchant):
+        return list(LedgerEntry.objects.filter(kind=postings.OPENING, merchant=merchant).values_list("amount", flat=True))
+
+    def test_later_runs_pick_up_new_and_skipped_merchants(self):
+        funded = create_merchant()
+        Merchant.objects.filter(id=funded.id).update(current_balance=Decimal("100"))
+        empty = create_merchant("empty")
+        self.assertEqual(self.run_command(), "Posted 1 opening balance(s)")
+        self.assertEqual(self.opening(funded), [Decimal("100")])
+
+        # the counter leg of the first opening has no merchant; it must not hide anyone
+        added = create_merchant("added")
+        Merchant.objects.filter(id__in=[added.id, empty.id]).update(current_balance=Decimal("40"))
+        self.assertEqual(self.run_command(), "Posted 2 opening balance(s)")
+        self.assertEqual(self.opening(added), [Decimal("40")])
+        self.assertEqual(self.opening(empty), [Decimal("40")])
+        self.assertEqual(self.opening(funded), [Decimal("100")])
+
+    def test_ledger_activity_is_not_posted_twice(self):
+        merchant = create_merchant()
+        postings.post(postings.FUNDING, merchant.id, Decimal("30"))
+        Merchant.objects.filter(id=merchant.id).update(current_balance=Decimal("100"))
+        self.assertEqual(self.run_command(), "Posted 1 opening balance(s)")
+        self.assertEqual(self.opening(merchant), [Decimal("70")])
+        self.assertEqual(postings.balance_at(merchant.id), Decimal("100"))
+
+
+#================ APPEND ONLY ====
+class AppendOnlyTests(TestCase):
+    def setUp(self):
+        self.merchant = create_merchant()
+        self.entry = postings.post(postings.FUNDING, self.merchant.id, Decimal("100"))[0]
+
+    def test_queryset_update_and_delete_are_refused(self):
+        with self.assertRaises(TypeError):
+            LedgerEntry.objects.filter(id=self.entry.id).update(amount=1)
+        with self.assertRaises(TypeError):
+            LedgerEntry.objects.filter(id=self.entry.id).delete()
+
+    def test_instance_save_and_delete_are_refused(self):
+        entry = LedgerEntry.objects.get(id=self.entry.id)
+        entry.amount = Decimal("1")
+        with self.assertRaises(TypeError):
+            entry.save()
+        with self.assertRaises(TypeError):
+            entry.delete()
+        self.assertEqual(LedgerEntry.objects.get(id=self.entry.id).amount, Decimal("100"))
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "the trigger is PostgreSQL only")
+    def test_trigger_rejects_update_and_delete(self):
+        for sql in ("UPDATE ledger_entries SET amount = 1 WHERE id = %s", "DELETE FROM ledger_entries WHERE id = %s"):
+            with self.assertRaises(DatabaseError), db_transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [self.entry.id])
+        self.assertEqual(LedgerEntry.objects.get(id=self.entry.id).amount, Decimal("100"))
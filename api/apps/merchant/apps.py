@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MerchantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.merchant'
+
+    def ready(self):
+        from apps.merchant import signals  # noqa: F401
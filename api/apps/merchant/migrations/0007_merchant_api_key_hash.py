@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-19 16:46
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_api_key_hash(apps, schema_editor):
+    Merchant = apps.get_model('merchant', 'Merchant')
+    for merchant in Merchant.objects.exclude(api_key__isnull=True).exclude(api_key='').only('id', 'api_key').iterator():
+        Merchant.objects.filter(id=merchant.id).update(
+            api_key_hash=hashlib.sha256(merchant.api_key.encode()).hexdigest()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchant', '0006_rename_today_tranx_value_merchant_today_tranx_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchant',
+            name='api_key_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_api_key_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchant', '0007_merchant_api_key_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='merchantfunding',
+            index=models.Index(fields=['merchant', 'created_at'], name='vas_funding_merchant_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import hashlib
 import random
 import uuid
 import datetime
@@ -36,6 +37,7 @@ class Merchant(models.Model):
     today_tranx_date = models.DateField(max_length=30,blank=True, null=True)
     api_secret = models.TextField(blank=True, null=True)
     api_key = models.TextField(blank=True, null=True)
+    api_key_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True) #sha256 of api_key, used for auth lookups
     api_secret_updated_at = models.DateTimeField( null=True)
     api_key_updated_at = models.DateTimeField( null=True)
     is_active = models.BooleanField(default=True)
@@ -47,6 +49,10 @@ class Merchant(models.Model):
     def save(self, *args, **kwargs):
         if not self.pk:  # Only generate value on the first create
             self.merchant_code = self._generate_unique_value()
+        self.api_key_hash = hashlib.sha256(self.api_key.encode()).hexdigest() if self.api_key else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'api_key' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'api_key_hash'}
         super().save(*args, **kwargs)
     
     def _generate_unique_value(self):
@@ -74,7 +80,10 @@ class Merchant(models.Model):
     
     #credit balance
     @transaction.atomic()
-    def credit_balance(self, amount: Decimal, source: str="auto_reversal"):
+    def credit_balance(self, amount: Decimal, source: str="auto_reversal", transaction_id=None):
+        """Credit the wallet and record it (MerchantFunding + ledger posting); returns the updated merchant."""
+        from apps.ledger.postings import FUNDING, REVERSAL, post as post_ledger
+
         if amount <= 0:
             raise ValueError("Amount must be greater than 0")
         
@@ -84,7 +93,7 @@ class Merchant(models.Model):
         merchant.last_updated_balance_at = timezone.now()
         merchant.save(update_fields=['current_balance','balance_before','last_updated_balance_at'])
         merchant.refresh_from_db()
-        MerchantFunding.objects.create(
+        funding = MerchantFunding.objects.create(
             amount=amount,
             description="Credit balance",
             merchant=merchant,
@@ -98,6 +107,11 @@ class Merchant(models.Model):
             balance_before=merchant.balance_before,
             balance_after=merchant.current_balance
         )
+        post_ledger(
+            FUNDING if source == "admin" else REVERSAL, merchant.id, amount,
+            transaction_id=transaction_id, funding_ref=funding.funding_ref,
+            description=funding.get_source_display(), created_at=merchant.last_updated_balance_at,
+        )
         return merchant
 
 
@@ -185,7 +199,9 @@ class MerchantFunding(models.Model):
     class Meta:
        db_table = "vas_merchant_funding"
        indexes = [
-           models.Index(fields=["funding_ref","is_approved","is_active"])
+           models.Index(fields=["funding_ref","is_approved","is_active"]),
+           # balance reconciliation: a merchant's fundings after its checkpoint
+           models.Index(fields=["merchant","created_at"], name="vas_funding_merchant_idx"),
        ]
        verbose_name = 'MerchantFunding'
        verbose_name_plural = 'MerchantFundings'
@@ -0,0 +1,60 @@
+"""
+Merchant signal handlers.
+
+Keeps the authentication principal cache coherent: whenever a field that
+authentication depends on changes, the cached principal is dropped on every
+worker once the write has committed, and access tokens issued to the merchant
+before the change are revoked. Discount changes invalidate the merchant's
+cache tag.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.merchant.models import Merchant, MerchantDiscount
+
+logger = logging.getLogger(__name__)
+
+# balance updates save with update_fields and must not evict the principal on every vend
+PRINCIPAL_FIELDS = {
+    'merchant_code', 'api_key', 'api_key_hash', 'api_secret',
+    'api_access_ips', 'is_active', 'user',
+}
+
+
+def _invalidate_after_commit(merchant):
+    from config.principal import invalidate_principal
+    from config.tokens import revoke_merchant_tokens
+    merchant_id, merchant_code = merchant.id, merchant.merchant_code
+
+    def invalidate():
+        invalidate_principal(merchant_code)
+        revoke_merchant_tokens(merchant_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Merchant)
+def merchant_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not PRINCIPAL_FIELDS.intersection(update_fields):
+        return
+    _invalidate_after_commit(instance)
+
+
+@receiver(post_delete, sender=Merchant)
+def merchant_deleted(sender, instance, **kwargs):
+    _invalidate_after_commit(instance)
+
+
+@receiver(post_save, sender=MerchantDiscount)
+@receiver(post_delete, sender=MerchantDiscount)
+def merchant_discount_changed(sender, instance, **kwargs):
+    from apps.product.cache_utils import invalidate_merchant_discount_cache
+    merchant_code = Merchant.objects.filter(pk=instance.merchant_id).values_list('merchant_code', flat=True).first()
+    if merchant_code is None:
+        return
+    transaction.on_commit(lambda: invalidate_merchant_discount_cache(merchant_code))
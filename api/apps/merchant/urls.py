@@ -1,5 +1,9 @@
 from django.urls import path
+from .views import AccessTokenApiView, AccessTokenRevokeApiView
 
 
 urlpatterns = [
-]
\ No newline at end of file
+    #==================== ACCESS TOKENS =========================
+    path('getAccessToken', AccessTokenApiView.as_view({'post':'get_access_token'}),name="getAccessToken"),
+    path('revokeAccessToken', AccessTokenRevokeApiView.as_view({'post':'revoke_access_token'}),name="revokeAccessToken"),
+]
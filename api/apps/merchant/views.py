@@ -1,9 +1,12 @@
 #merchant api views
-from rest_framework.permissions import AllowAny
+from django.conf import settings
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from apps.merchant.models import Merchant
 from rest_framework import viewsets
 from rest_framework.response import Response
-from rest_framework.response import Response
+from config.helper import CustomAuthentication, JsonResponse, SignedRequestAuthentication, get_client_ip
+from config.response_codes import SUCCESS, INVALID_PAYLOAD, NOT_IMPLEMENTED, RESPONSE_MESSAGES
+from config.tokens import TokenPrincipal, issue_access_token, revoke_token
 import logging
 logger = logging.getLogger(__name__)
 
@@ -12,4 +15,34 @@ class MerchantApiView(viewsets.ViewSet):
     permission_classes = [AllowAny]
     
     def list(self, request):
-        return Response({"message": "Hello, world!"})
\ No newline at end of file
+        return Response({"message": "Hello, world!"})
+
+
+class AccessTokenApiView(viewsets.ViewSet):
+    authentication_classes = [SignedRequestAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    #******************************************************#
+    #======= exchange a signed request for a token ========#
+    #******************************************************#
+    def get_access_token(self, request):
+        if not settings.ACCESS_TOKEN_ENABLED:
+            return JsonResponse(code=NOT_IMPLEMENTED, msg=RESPONSE_MESSAGES[NOT_IMPLEMENTED])
+        token, expires_in = issue_access_token(request.auth, get_client_ip(request))
+        logger.info(f"ACCESS TOKEN ISSUED:: MERCHANT={request.auth.merchant_code} EXPIRES IN={expires_in}s")
+        return JsonResponse(code=SUCCESS, data={"accessToken": token, "tokenType": "Bearer", "expiresIn": expires_in})
+
+
+class AccessTokenRevokeApiView(viewsets.ViewSet):
+    authentication_classes = [CustomAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    #******************************************************#
+    #======= revoke the bearer token used on this call ====#
+    #******************************************************#
+    def revoke_access_token(self, request):
+        if not isinstance(request.auth, TokenPrincipal):
+            return JsonResponse(code=INVALID_PAYLOAD, msg="Request must be made with the access token to revoke", status=400)
+        revoke_token(request.auth.jti, request.auth.expires_at)
+        logger.info(f"ACCESS TOKEN REVOKED:: MERCHANT={request.auth.merchant_code}")
+        return JsonResponse(code=SUCCESS)
@@ -0,0 +1,436 @@
+"""
+Load generator for the merchant API.
+
+Drives ``vendAirtime``, ``vendData``, ``getDataBundle`` and
+``requeryTransaction`` with requests signed exactly as a merchant would sign
+them (X-MERCHANT-CODE, X-API-KEY, X-TIMESTAMP and X-SIGNATURE =
+base64(HMAC-SHA256(api_secret, "timestamp|api_key")), see
+config.helper.CustomAuthentication).
+
+Arrival processes:
+
+    closed    ``concurrency`` workers, each sending back to back
+    constant  open loop, one request every 1/rate seconds
+    poisson   open loop, exponential inter-arrival times with mean 1/rate
+    burst     open loop, ``burst_size`` requests at once every burst_size/rate seconds
+
+In the open-loop modes latency is measured from the *scheduled* send time, so
+time spent waiting for a free worker counts against the server (no
+coordinated omission); ``service_ms`` is the time on the wire alone.
+
+A fraction of vends (``duplicate_ratio``) reuse a merchant_ref the same
+merchant already sent, to exercise the duplicate-reference path; requeries
+always ask for a ref that was sent earlier in the run.
+
+While the run is in progress ``LockWaitSampler`` polls pg_stat_activity /
+pg_locks on the database Django is configured for, so lock contention shows
+up in the same report as the latency it causes.
+"""
+import json
+import logging
+import math
+import os
+import queue
+import random
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, deque, namedtuple
+from datetime import datetime, timezone
+
+import requests
+
+from config.helper import request_signature
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ("vendAirtime", "vendData", "getDataBundle", "requeryTransaction")
+ARRIVALS = ("closed", "constant", "poisson", "burst")
+PERCENTILES = (50, 95, 99)
+
+MerchantCredential = namedtuple("MerchantCredential", "merchant_code api_key api_secret")
+
+
+#================ SIGNING ====
+def sign_headers(credential, now=None):
+    timestamp = (now or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "X-MERCHANT-CODE": credential.merchant_code,
+        "X-API-KEY": credential.api_key,
+        "X-TIMESTAMP": timestamp,
+        "X-SIGNATURE": request_signature(credential.api_secret, timestamp, credential.api_key),
+    }
+
+
+#================ WORKLOAD ====
+class Workload:
+    """
+    Builds the next request: picks an endpoint by ``mix`` weight and a
+    merchant uniformly, and remembers the refs each merchant has sent.
+    """
+
+    def __init__(self, merchants, mix, airtime_products, data_products, amount=100,
+                 duplicate_ratio=0.0, phone_prefix="234803", seed=None, remembered_refs=1000):
+        if not merchants:
+            raise ValueError("at least one merchant is required")
+        self.merchants = list(merchants)
+        self.endpoints = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.endpoints]
+        self.airtime_products = list(airtime_products)
+        self.data_products = list(data_products)  # [(product_code, data_code)]
+        self.amount = amount
+        self.duplicate_ratio = duplicate_ratio
+        self.phone_prefix = phone_prefix
+        self.rng = random.Random(seed)
+        self._sent = {m.merchant_code: deque(maxlen=remembered_refs) for m in self.merchants}
+        self._lock = threading.Lock()
+
+    def _phone(self):
+        return self.phone_prefix + "".join(str(self.rng.randrange(10)) for _ in range(13 - len(self.phone_prefix)))
+
+    def _merchant_ref(self, merchant):
+        sent = self._sent[merchant.merchant_code]
+        if sent and self.rng.random() < self.duplicate_ratio:
+            return sent[self.rng.randrange(len(sent))], True
+        ref = f"LT{uuid.uuid4().hex[:20]}"
+        sent.append(ref)
+        return ref, False
+
+    def next_request(self):
+        """-> (endpoint, merchant, method, params, body, duplicate)"""
+        with self._lock:
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            merchant = self.merchants[self.rng.randrange(len(self.merchants))]
+            if endpoint == "vendAirtime":
+                ref, duplicate = self._merchant_ref(merchant)
+                body = {
+                    "product_code": self.rng.choice(self.airtime_products),
+                    "amount": self.amount,
+                    "phone_number": self._phone(),
+                    "merchant_ref": ref,
+                }
+                return endpoint, merchant, "POST", None, body, duplicate
+            if endpoint == "vendData":
+                ref, duplicate = self._merchant_ref(merchant)
+                product_code, data_code = self.rng.choice(self.data_products)
+                body = {
+                    "product_code": product_code,
+                    "data_code": data_code,
+                    "phone_number": self._phone(),
+                    "merchant_ref": ref,
+                }
+                return endpoint, merchant, "POST", None, body, duplicate
+            if endpoint == "getDataBundle":
+                return endpoint, merchant, "GET", {"product_code": self.rng.choice(self.data_products)[0]}, None, False
+            sent = self._sent[merchant.merchant_code]
+            ref = sent[self.rng.randrange(len(sent))] if sent else f"LT{uuid.uuid4().hex[:20]}"
+            return endpoint, merchant, "POST", None, {"merchant_ref": ref}, False
+
+
+#================ ARRIVALS ====
+def arrival_offsets(process, rate, duration, rng, burst_size=50):
+    """Yields send offsets (seconds from start) for an open-loop process."""
+    if process == "constant":
+        for i in range(int(rate * duration)):
+            yield i / rate
+    elif process == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            yield t
+            t += rng.expovariate(rate)
+    elif process == "burst":
+        period = burst_size / rate
+        t = 0.0
+        while t < duration:
+            for _ in range(burst_size):
+                yield t
+            t += period
+    else:
+        raise ValueError(f"not an open-loop arrival process: {process}")
+
+
+#================ RESULTS ====
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Thread-safe collection of per-request samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {name: [] for name in ENDPOINTS}
+        self.service = {name: [] for name in ENDPOINTS}
+        self.outcomes = {name: Counter() for name in ENDPOINTS}
+        self.duplicates = Counter()
+        self.late = 0  # open loop: sends that started >1s after their slot
+
+    def record_late(self):
+        with self._lock:
+            self.late += 1
+
+    def record(self, endpoint, latency, service, outcome, duplicate=False):
+        with self._lock:
+            self.latency[endpoint].append(latency)
+            self.service[endpoint].append(service)
+            self.outcomes[endpoint][outcome] += 1
+            if duplicate:
+                self.duplicates[outcome] += 1
+
+    def summary(self, elapsed):
+        def stats(latencies, services, outcomes):
+            latencies, services = sorted(latencies), sorted(services)
+            count = len(latencies)
+            errors = sum(n for outcome, n in outcomes.items() if not outcome.startswith("2"))
+            # error_rate is HTTP/transport failures only; business codes are in ``outcomes``
+            row = {
+                "requests": count,
+                "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+                "error_rate": round(errors / count, 4) if count else 0.0,
+            }
+            for pct in PERCENTILES:
+                value = percentile(latencies, pct)
+                row[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+            row["max_ms"] = round(latencies[-1] * 1000, 2) if latencies else None
+            value = percentile(services, 50)
+            row["service_p50_ms"] = round(value * 1000, 2) if value is not None else None
+            value = percentile(services, 99)
+            row["service_p99_ms"] = round(value * 1000, 2) if value is not None else None
+            row["outcomes"] = dict(sorted(outcomes.items()))
+            return row
+
+        with self._lock:
+            endpoints = {
+                name: stats(self.latency[name], self.service[name], self.outcomes[name])
+                for name in ENDPOINTS if self.latency[name]
+            }
+            overall = stats(
+                [v for name in ENDPOINTS for v in self.latency[name]],
+                [v for name in ENDPOINTS for v in self.service[name]],
+                sum(self.outcomes.values(), Counter()),
+            )
+            duplicates = dict(sorted(self.duplicates.items()))
+        return {"overall": overall, "endpoints": endpoints, "duplicate_outcomes": duplicates}
+
+
+def classify(response):
+    """'<http status>/<responseCode>' for API answers, the exception name for transport errors."""
+    try:
+        code = response.json().get("responseCode", "-")
+    except ValueError:
+        code = "non-json"
+    return f"{response.status_code}/{code}"
+
+
+#================ DB LOCK WAITS ====
+LOCK_WAIT_SQL = """
+    SELECT a.pid, l.locktype, l.mode, EXTRACT(EPOCH FROM (now() - a.state_change))
+      FROM pg_stat_activity a
+      JOIN pg_locks l ON l.pid = a.pid AND NOT l.granted
+     WHERE a.datname = current_database() AND a.wait_event_type = 'Lock'
+"""
+
+
+class LockWaitSampler(threading.Thread):
+    """
+    Polls Postgres for sessions waiting on a lock. Each sample is the number
+    of waiting sessions and the longest current wait; lock types/modes are
+    tallied across samples.
+    """
+
+    def __init__(self, interval=0.5, using="default"):
+        super().__init__(name="lock-wait-sampler", daemon=True)
+        self.interval = interval
+        self.using = using
+        self._stopping = threading.Event()
+        self.samples = []
+        self.locks = Counter()
+        self.error = None
+
+    def run(self):
+        from django.db import connections
+
+        connection = connections[self.using]
+        try:
+            while not self._stopping.is_set():
+                with connection.cursor() as cursor:
+                    cursor.execute(LOCK_WAIT_SQL)
+                    rows = cursor.fetchall()
+                pids = {row[0] for row in rows}
+                longest = max((float(row[3] or 0) for row in rows), default=0.0)
+                self.samples.append((len(pids), longest))
+                for row in rows:
+                    self.locks[f"{row[1]}:{row[2]}"] += 1
+                self._stopping.wait(self.interval)
+        except Exception as e:  # the run is still useful without lock stats
+            self.error = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            logger.warning("LOCK WAIT SAMPLER STOPPED:: %s", e)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=5)
+
+    def summary(self):
+        waiting = [n for n, _ in self.samples]
+        return {
+            "samples": len(self.samples),
+            "interval_s": self.interval,
+            "samples_with_waiters": sum(1 for n in waiting if n),
+            "mean_waiting_sessions": round(sum(waiting) / len(waiting), 3) if waiting else 0.0,
+            "max_waiting_sessions": max(waiting, default=0),
+            "max_wait_ms": round(max((w for _, w in self.samples), default=0.0) * 1000, 1),
+            "lock_types": dict(self.locks.most_common()),
+            "error": self.error,
+        }
+
+
+#================ RUNNER ====
+class LoadTest:
+    def __init__(self, base_url, workload, arrival="poisson", rate=50.0, duration=60.0,
+                 concurrency=32, burst_size=50, warmup=0.0, timeout=30.0, seed=None):
+        if arrival not in ARRIVALS:
+            raise ValueError(f"arrival must be one of {', '.join(ARRIVALS)}")
+        if arrival != "closed" and rate <= 0:
+            raise ValueError("rate must be positive for open-loop arrivals")
+        self.base_url = base_url.rstrip("/")
+        self.workload = workload
+        self.arrival = arrival
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.burst_size = burst_size
+        self.warmup = warmup
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+
+    def _session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _send(self, session, scheduled, started_at):
+        endpoint, merchant, method, params, body, duplicate = self.workload.next_request()
+        sent = time.perf_counter()
+        try:
+            response = session.request(
+                method, f"{self.base_url}/api/product/{endpoint}",
+                params=params, json=body, headers=sign_headers(merchant), timeout=self.timeout,
+            )
+            outcome = classify(response)
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        done = time.perf_counter()
+        if scheduled - started_at >= self.warmup:
+            self.recorder.record(endpoint, done - scheduled, done - sent, outcome, duplicate)
+
+    def _closed_worker(self, started_at, deadline):
+        session = self._session()
+        while time.perf_counter() < deadline:
+            self._send(session, time.perf_counter(), started_at)
+
+    def _open_worker(self, jobs, started_at):
+        session = self._session()
+        while True:
+            scheduled = jobs.get()
+            if scheduled is None:
+                return
+            if time.perf_counter() - scheduled > 1.0:
+                self.recorder.record_late()
+            self._send(session, scheduled, started_at)
+
+    def run(self):
+        started_at = time.perf_counter()
+        total = self.duration + self.warmup
+        if self.arrival == "closed":
+            workers = [
+                threading.Thread(target=self._closed_worker, args=(started_at, started_at + total), daemon=True)
+                for _ in range(self.concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+        else:
+            jobs = queue.Queue()
+            workers = [
+                threading.Thread(target=self._open_worker, args=(jobs, started_at), daemon=True)
+                for _ in range(self.concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+            for offset in arrival_offsets(self.arrival, self.rate, total, self.rng, self.burst_size):
+                delay = started_at + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                jobs.put(started_at + offset)
+            for _ in workers:
+                jobs.put(None)
+        for worker in workers:
+            worker.join()
+        measured = time.perf_counter() - started_at - self.warmup
+        return self.recorder.summary(measured), measured
+
+
+#================ REPORTS ====
+def git_revision(cwd=None):
+    """(sha, dirty); GIT_SHA in the environment wins for images built without .git."""
+    sha = os.environ.get("GIT_SHA")
+    if sha:
+        return sha, False
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def build_report(options, results, elapsed, db_stats=None, late=0):
+    sha, dirty = git_revision()
+    return {
+        "version": 1,
+        "git_sha": sha,
+        "git_dirty": dirty,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "options": options,
+        "elapsed_s": round(elapsed, 3),
+        "late_sends": late,
+        "results": results,
+        "db_lock_waits": db_stats,
+    }
+
+
+COMPARED = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def compare_reports(baseline, current):
+    """Rows of (scope, metric, baseline, current, change %) for the headline numbers."""
+    rows = []
+    scopes = [("overall", baseline["results"]["overall"], current["results"]["overall"])]
+    for name in ENDPOINTS:
+        before = baseline["results"]["endpoints"].get(name)
+        after = current["results"]["endpoints"].get(name)
+        if before and after:
+            scopes.append((name, before, after))
+    for scope, before, after in scopes:
+        for metric in COMPARED:
+            a, b = before.get(metric), after.get(metric)
+            change = round((b - a) / a * 100, 1) if a and b is not None else None
+            rows.append((scope, metric, a, b, change))
+    return rows
+
+
+def load_report(path):
+    with open(path) as fh:
+        return json.load(fh)
@@ -0,0 +1,122 @@
+import json
+import logging
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from config.log_pipeline import JsonFormatter, NonBlockingQueueHandler, RedactingFormatter, SamplingFilter
+
+SOAP_PAYLOAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="no"?><soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<soapenv:Body><xsd:vend><xsd:origMsisdn>2348030000000</xsd:origMsisdn><xsd:destMsisdn>2348031234567</xsd:destMsisdn>'
+    '<xsd:amount>10000</xsd:amount><xsd:sequence>REF123456789</xsd:sequence></xsd:vend></soapenv:Body></soapenv:Envelope>'
+) * 8
+
+
+class SlowSink:
+    """File-like sink that costs ``delay`` seconds per write, like a backed-up stdout pipe."""
+
+    def __init__(self, path, delay):
+        self.file = open(path, "a")
+        self.delay = delay
+
+    def write(self, data):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+def emit_vend(log, raw_payloads):
+    """Roughly the lines a single vend writes on its way through auth, view and provider."""
+    log.info("Authentication successful for merchant: %s, user id: %s", "MRC0001", 17)
+    log.info("REQUEST PRODUCT %s:: DISCOUNT_TYPE=%s, DISCOUNT_VALUE=%s ::MERCHANT %s", "MTNVTU", "percent", "2.5", 4)
+    log.info("Transaction limit updated for merchant %s: count=%s/%s, date=%s", 4, 120, 5000, "2024-01-01")
+    log.info("%s RESPONSE TIME: %s seconds", "VEND::VTU::BEFORE::MTN::PROVIDER::CALL::TIME", 0.0123)
+    log.info("%s VEND VTU REQUEST:: MSISDN=%s, AMOUNT=%s, PRODUCTCODE=%s", "MTNVTU", "2348031234567", 100, "MTNVTU")
+    if raw_payloads:
+        log.info("RAW %s REQUEST PAYLOAD:::%s :::: URL::%s", "MTNN", SOAP_PAYLOAD, "https://provider/vend")
+    log.info("%s RESPONSE:: URL=%s HTTP STATUS=%s BYTES=%s", "MTNN", "https://provider/vend", 200, len(SOAP_PAYLOAD))
+    if raw_payloads:
+        log.info("RAW %s RESPONSE:::%s :::: HEADERS::%s", "MTNN", SOAP_PAYLOAD, {"Authorization": "Basic c2VjcmV0"})
+        log.info("JSON FORMATTED %s RESPONSE :::%s", "MTNN", {"statusId": "0", "txRefId": "X1", "origBalance": "1000"})
+    log.info("%s RESPONSE TIME: %s seconds", "MTN PROVIDER::VEND::VTU::RESPONSE::TIME", 0.84)
+    log.info("TRANSACTION UPDATED:: REF=%s STATUS=%s", "REF123456789", "Success")
+
+
+class Command(BaseCommand):
+    help = "Measure per-request logging overhead: synchronous console handler vs the async pipeline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=2000, help="Simulated vends per thread")
+        parser.add_argument("--sink", default="/dev/null", help="Where log lines are written")
+        parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="Added cost per write, to mimic a slow stdout")
+        parser.add_argument("--raw-payloads", action="store_true", help="Include raw provider bodies (the old default)")
+        parser.add_argument("--sample-rate", type=float, default=1.0, help="INFO keep ratio for the async run")
+        parser.add_argument("--queue-size", type=int, default=10000)
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        sink = SlowSink(options["sink"], options["sink_delay_ms"] / 1000.0)
+
+        sync_handler = logging.StreamHandler(sink)
+        sync_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(module)s: %(message)s'))
+
+        async_handler = NonBlockingQueueHandler(maxsize=options["queue_size"], stream=sink)
+        async_handler.setFormatter(JsonFormatter())
+        async_handler.addFilter(SamplingFilter(default_rate=options["sample_rate"]))
+
+        redacting_sync = logging.StreamHandler(sink)
+        redacting_sync.setFormatter(RedactingFormatter('%(asctime)s [%(levelname)s] %(module)s: %(message)s'))
+
+        report = {"options": {k: options[k] for k in ("threads", "requests", "sink_delay_ms", "raw_payloads", "sample_rate", "queue_size")}}
+        for name, handler in (("sync", sync_handler), ("sync_redacting", redacting_sync), ("async", async_handler)):
+            report[name] = self._run(name, handler, options)
+        async_handler.flush_and_stop()
+        report["async"]["dropped"] = async_handler.dropped
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name in ("sync", "sync_redacting", "async"):
+            r = report[name]
+            self.stdout.write(
+                f"{name:15} vends/s={r['throughput']:>10.1f}  p50={r['p50_us']:>8.1f}us  "
+                f"p99={r['p99_us']:>9.1f}us  max={r['max_us']:>10.1f}us"
+                + (f"  dropped={r['dropped']}" if "dropped" in r else "")
+            )
+
+    def _run(self, name, handler, options):
+        log = logging.getLogger(f"bench_logging.{name}")
+        log.handlers = [handler]
+        log.setLevel(logging.INFO)
+        log.propagate = False
+
+        per_thread = [[] for _ in range(options["threads"])]
+
+        def worker(samples):
+            for _ in range(options["requests"]):
+                start = time.perf_counter()
+                emit_vend(log, options["raw_payloads"])
+                samples.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=worker, args=(samples,)) for samples in per_thread]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        samples = sorted(s for thread_samples in per_thread for s in thread_samples)
+        return {
+            "throughput": len(samples) / elapsed,
+            "p50_us": statistics.median(samples) * 1e6,
+            "p99_us": samples[int(len(samples) * 0.99) - 1] * 1e6,
+            "max_us": samples[-1] * 1e6,
+        }
@@ -0,0 +1,68 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.perf import querybudget
+from apps.perf.loadgen import git_revision
+
+
+class Command(BaseCommand):
+    help = "Run the vend endpoints against a fresh test database and the provider simulator; fail if a query/lock budget is exceeded"
+
+    def add_arguments(self, parser):
+        parser.add_argument("endpoints", nargs="*", help=f"Subset of: {', '.join(querybudget.SCENARIOS)}")
+        parser.add_argument("--iterations", type=int, default=3, help="Measured calls per endpoint")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured calls per endpoint (cold caches)")
+        parser.add_argument("--budget", default=querybudget.BUDGET_PATH)
+        parser.add_argument("--output", help="Report path (default perf-reports/query-report-<sha>.json)")
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the test database if it exists")
+
+    def handle(self, *args, **options):
+        unknown = set(options["endpoints"]) - set(querybudget.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+        try:
+            budget = querybudget.load_budget(options["budget"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Unable to read budget: {e}")
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=options["verbosity"], autoclobber=True, keepdb=options["keepdb"])
+        try:
+            if options["keepdb"]:
+                # a kept database still holds the previous run's fixtures
+                from django.core.management import call_command
+                call_command("flush", interactive=False, verbosity=0)
+            results = querybudget.run_scenarios(options["endpoints"] or None, options["iterations"], options["warmup"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=options["verbosity"], keepdb=options["keepdb"])
+
+        violations = querybudget.check(results, budget)
+        sha, dirty = git_revision()
+        report = {
+            "git_sha": sha,
+            "git_dirty": dirty,
+            "database": connection.vendor,
+            "iterations": options["iterations"],
+            "warmup": options["warmup"],
+            "budget": budget,
+            "violations": violations,
+            "endpoints": results,
+        }
+        path = options["output"] or os.path.join("perf-reports", f"query-report-{(sha or 'nogit')[:10]}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+        for name, result in results.items():
+            steady = result["steady"]
+            limits = budget.get(name, {})
+            self.stdout.write(
+                f"{name:20} {steady['http_status']}/{steady['response_code']}  queries={steady['queries']}/{limits.get('max_queries', '-')}  "
+                f"max_lock={steady['max_lock_ms']}ms/{limits.get('max_lock_ms', '-')}ms  {steady['by_type']}"
+            )
+        self.stdout.write(f"report: {path}")
+        if violations:
+            raise CommandError("Query budget exceeded:\n  " + "\n  ".join(violations))
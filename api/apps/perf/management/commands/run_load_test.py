@@ -0,0 +1,164 @@
+import json
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.perf.loadgen import (
+    ARRIVALS, ENDPOINTS, LoadTest, LockWaitSampler, MerchantCredential, Workload,
+    build_report, compare_reports, load_report,
+)
+
+
+def parse_mix(raw):
+    """"vendAirtime=60,vendData=25,getDataBundle=10,requeryTransaction=5" -> weights dict"""
+    mix = {}
+    for item in raw.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError(f"Unknown endpoint '{name}', expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_data_products(raw):
+    """"MTNDATA:1000,GLODATA:G500" -> [(product_code, data_code)]"""
+    products = []
+    for item in raw.split(","):
+        product_code, _, data_code = item.partition(":")
+        if not data_code:
+            raise CommandError(f"Data product '{item}' must be PRODUCT_CODE:DATA_CODE")
+        products.append((product_code.strip(), data_code.strip()))
+    return products
+
+
+class Command(BaseCommand):
+    help = "Send signed vend/requery/bundle traffic at an API and write a throughput/latency/lock-wait report"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--merchants-file", help="JSON list of {merchant_code, api_key, api_secret}; default: active merchants from the DB")
+        parser.add_argument("--merchants", type=int, default=10, help="How many merchants to spread the load over")
+        parser.add_argument("--mix", default="vendAirtime=60,vendData=25,getDataBundle=10,requeryTransaction=5")
+        parser.add_argument("--airtime-products", default="MTNVTU", help="Comma separated product codes")
+        parser.add_argument("--data-products", default="MTNDATA:1000", help="Comma separated PRODUCT_CODE:DATA_CODE")
+        parser.add_argument("--amount", type=int, default=100)
+        parser.add_argument("--duplicate-ratio", type=float, default=0.0, help="Share of vends that reuse a merchant_ref")
+        parser.add_argument("--arrival", choices=ARRIVALS, default="poisson")
+        parser.add_argument("--rate", type=float, default=50.0, help="Mean requests/s for open-loop arrivals")
+        parser.add_argument("--burst-size", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=32, help="Client workers (closed-loop users)")
+        parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds")
+        parser.add_argument("--warmup", type=float, default=5.0, help="Seconds sent but left out of the report")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout per request")
+        parser.add_argument("--seed", type=int)
+        parser.add_argument("--no-db-stats", action="store_true", help="Skip pg_stat_activity lock-wait sampling")
+        parser.add_argument("--db-sample-interval", type=float, default=0.5)
+        parser.add_argument("--output", help="Report path (default perf-reports/loadtest-<sha>-<time>.json)")
+        parser.add_argument("--compare", help="Earlier report to compare against")
+
+    def _merchants(self, options):
+        if options["merchants_file"]:
+            try:
+                with open(options["merchants_file"]) as fh:
+                    rows = json.load(fh)
+                merchants = [MerchantCredential(r["merchant_code"], r["api_key"], r["api_secret"]) for r in rows]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise CommandError(f"Unable to read merchants file: {e}")
+        else:
+            from apps.merchant.models import Merchant
+
+            merchants = [
+                MerchantCredential(*row) for row in Merchant.objects.filter(
+                    is_active=True, api_key__isnull=False, api_secret__isnull=False,
+                ).exclude(api_key="").order_by("id").values_list("merchant_code", "api_key", "api_secret")
+            ]
+        merchants = merchants[:options["merchants"]]
+        if not merchants:
+            raise CommandError("No merchants with API credentials to send as")
+        return merchants
+
+    def handle(self, *args, **options):
+        if not 0 <= options["duplicate_ratio"] <= 1:
+            raise CommandError("--duplicate-ratio must be between 0 and 1")
+        merchants = self._merchants(options)
+        workload = Workload(
+            merchants, parse_mix(options["mix"]),
+            airtime_products=[p.strip() for p in options["airtime_products"].split(",")],
+            data_products=parse_data_products(options["data_products"]),
+            amount=options["amount"], duplicate_ratio=options["duplicate_ratio"], seed=options["seed"],
+        )
+        try:
+            test = LoadTest(
+                options["base_url"], workload, arrival=options["arrival"], rate=options["rate"],
+                duration=options["duration"], concurrency=options["concurrency"], burst_size=options["burst_size"],
+                warmup=options["warmup"], timeout=options["timeout"], seed=options["seed"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        sampler = None
+        if not options["no_db_stats"]:
+            sampler = LockWaitSampler(interval=options["db_sample_interval"])
+            sampler.start()
+        self.stdout.write(
+            f"{options['arrival']} load against {options['base_url']}: {len(merchants)} merchants, "
+            f"{options['duration']}s (+{options['warmup']}s warmup)"
+        )
+        try:
+            results, elapsed = test.run()
+        finally:
+            if sampler:
+                sampler.stop()
+
+        recorded = {k: options[k] for k in (
+            "base_url", "mix", "airtime_products", "data_products", "amount", "duplicate_ratio", "arrival",
+            "rate", "burst_size", "concurrency", "duration", "warmup", "timeout", "seed",
+        )}
+        recorded["merchants"] = len(merchants)
+        report = build_report(recorded, results, elapsed, sampler.summary() if sampler else None, test.recorder.late)
+
+        path = options["output"]
+        if not path:
+            stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+            path = os.path.join("perf-reports", f"loadtest-{(report['git_sha'] or 'nogit')[:10]}-{stamp}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+        self._print(report)
+        self.stdout.write(f"report: {path}")
+        if options["compare"]:
+            try:
+                baseline = load_report(options["compare"])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Unable to read baseline report: {e}")
+            if baseline.get("options", {}).get("arrival") != recorded["arrival"] or baseline.get("options", {}).get("rate") != recorded["rate"]:
+                self.stdout.write(self.style.WARNING("baseline was run with a different arrival process or rate"))
+            self.stdout.write(f"vs {options['compare']} ({(baseline.get('git_sha') or 'nogit')[:10]}):")
+            for scope, metric, before, after, change in compare_reports(baseline, report):
+                delta = f"{change:+.1f}%" if change is not None else "n/a"
+                self.stdout.write(f"  {scope:20} {metric:15} {before!s:>10} -> {after!s:>10}  {delta}")
+
+    def _print(self, report):
+        results = report["results"]
+        rows = [("overall", results["overall"])] + list(results["endpoints"].items())
+        for name, r in rows:
+            self.stdout.write(
+                f"{name:20} n={r['requests']:>7}  rps={r['throughput_rps']:>8.1f}  p50={r['p50_ms']!s:>8}ms  "
+                f"p95={r['p95_ms']!s:>8}ms  p99={r['p99_ms']!s:>8}ms  errors={r['error_rate']:.2%}"
+            )
+        for outcome, count in results["overall"]["outcomes"].items():
+            self.stdout.write(f"  {outcome:30} {count}")
+        if results["duplicate_outcomes"]:
+            self.stdout.write(f"duplicate refs: {results['duplicate_outcomes']}")
+        if report["late_sends"]:
+            self.stdout.write(self.style.WARNING(f"{report['late_sends']} sends started >1s late; raise --concurrency"))
+        db = report["db_lock_waits"]
+        if db:
+            self.stdout.write(
+                f"lock waits: {db['samples_with_waiters']}/{db['samples']} samples, "
+                f"max {db['max_waiting_sessions']} sessions, longest {db['max_wait_ms']}ms {db['lock_types'] or ''}"
+                + (f" (sampler error: {db['error']})" if db["error"] else "")
+            )
@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.perf import microbench
+
+
+class Command(BaseCommand):
+    help = "Time the hot vend-path functions and compare them against the stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Only these benchmarks (default: all)")
+        parser.add_argument("--list", action="store_true", help="List benchmarks and exit")
+        parser.add_argument("--repeat", type=int, default=15)
+        parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per repeat")
+        parser.add_argument("--baseline", default=microbench.BASELINE_PATH)
+        parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+        parser.add_argument("--allow-dirty", action="store_true", help="Save a baseline even with uncommitted changes")
+        parser.add_argument("--threshold", type=float, default=0.20, help="Relative slowdown counted as a regression (0.20 = 20%%)")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        available = microbench.registered()
+        if options["list"]:
+            for name in available:
+                self.stdout.write(name)
+            return
+        unknown = set(options["names"]) - set(available)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+        if options["save_baseline"] and not options["allow_dirty"] and microbench.environment()["git_dirty"]:
+            raise CommandError("Uncommitted changes: a baseline must be recorded from a clean checkout (or pass --allow-dirty)")
+
+        results, calibration = microbench.run(options["names"] or None, repeat=options["repeat"], min_time=options["min_time"])
+
+        if options["save_baseline"]:
+            saved = results
+            if options["names"]:
+                # keep the other entries of a partial run, brought to this run's calibration
+                try:
+                    merged = microbench.rescale(microbench.load_baseline(options["baseline"]), calibration)
+                except (OSError, ValueError):
+                    merged = {}
+                saved = {**merged, **results}
+            microbench.save_baseline(saved, calibration, options["baseline"])
+            self.stdout.write(f"baseline written to {options['baseline']}")
+
+        try:
+            baseline = microbench.load_baseline(options["baseline"])
+        except (OSError, ValueError):
+            baseline = None
+        rows = microbench.compare(baseline, results, options["threshold"], calibration) if baseline and not options["save_baseline"] else []
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"calibration_us": calibration, "results": results, "comparison": rows}, indent=2))
+        else:
+            recorded = baseline.get("calibration_us") if baseline else None
+            scale = f", baseline machine {recorded:.3f}us" if recorded else ""
+            self.stdout.write(f"{'calibration':30} {calibration:>12.3f}us{scale}")
+            verdicts = {name: (before, change, verdict) for name, before, _, change, verdict in rows}
+            for name, r in results.items():
+                line = f"{name:30} {r['min_us']:>12.3f}us  (median {r['median_us']:.3f}, sd {r['stdev_us']:.3f}, loops {r['loops']})"
+                if name in verdicts and verdicts[name][1] is not None:
+                    before, change, verdict = verdicts[name]
+                    line += f"  baseline {before:.3f}us {change:+.1%} {verdict}"
+                    if verdict == "regression":
+                        line = self.style.ERROR(line)
+                    elif verdict == "improvement":
+                        line = self.style.SUCCESS(line)
+                self.stdout.write(line)
+
+        regressions = [row[0] for row in rows if row[4] == "regression"]
+        if regressions:
+            raise CommandError(f"Regressed beyond {options['threshold']:.0%}: {', '.join(regressions)}")
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.perf.simulator import OUTCOMES, PROVIDERS, ProviderSimulator, build_profiles
+
+
+def parse_outcomes(raw):
+    """"success=93,failed=3,pending=2,invalid_msisdn=1,timeout=1" -> weights dict"""
+    outcomes = {}
+    for item in raw.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OUTCOMES:
+            raise CommandError(f"Unknown outcome '{name}', expected one of {', '.join(OUTCOMES)}")
+        outcomes[name] = float(weight)
+    return outcomes
+
+
+class Command(BaseCommand):
+    help = "Run a local simulator for MTN, GLO, Airtel, 9mobile, Payvantage and CreditSwitch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=9100)
+        parser.add_argument("--profile", help="JSON file: {\"default\": {...}, \"MTN\": {...}} (see apps/perf/simulator.py)")
+        parser.add_argument("--median-ms", type=float, help="Median latency for every provider")
+        parser.add_argument("--p99-ms", type=float, help="p99 latency for every provider")
+        parser.add_argument("--outcomes", help="Outcome weights for every provider, e.g. success=95,failed=3,timeout=2")
+        parser.add_argument("--balance", type=float, help="Starting float balance per provider")
+        parser.add_argument("--timeout-s", type=float, help="How long a 'timeout' outcome hangs before dropping the connection")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options["profile"]:
+            try:
+                with open(options["profile"]) as fh:
+                    overrides = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Unable to read profile: {e}")
+        unknown = set(overrides) - set(PROVIDERS) - {"default"}
+        if unknown:
+            raise CommandError(f"Unknown provider(s) in profile: {', '.join(sorted(unknown))}")
+
+        default = overrides.setdefault("default", {})
+        latency = default.setdefault("latency", {})
+        if options["median_ms"] is not None:
+            latency["median_ms"] = options["median_ms"]
+        if options["p99_ms"] is not None:
+            latency["p99_ms"] = options["p99_ms"]
+        if options["outcomes"]:
+            default["outcomes"] = parse_outcomes(options["outcomes"])
+        if options["balance"] is not None:
+            default["balance"] = options["balance"]
+        if options["timeout_s"] is not None:
+            default["timeout_s"] = options["timeout_s"]
+
+        server = ProviderSimulator((options["host"], options["port"]), build_profiles(overrides))
+        base_url = f"http://{'localhost' if options['host'] == '0.0.0.0' else options['host']}:{options['port']}"
+        self.stdout.write(f"Provider simulator listening on {base_url}")
+        self.stdout.write("Point the API at it with:")
+        self.stdout.write("  PROVIDER_BASE_URL_OVERRIDES='" + json.dumps({name: base_url for name in PROVIDERS}) + "'")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(json.dumps(server.stats(), indent=2))
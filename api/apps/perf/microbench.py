@@ -0,0 +1,449 @@
+"""
+Microbenchmarks for the functions every vend goes through.
+
+Each benchmark is a setup function registered with ``@benchmark(name)`` that
+builds its inputs once and returns the zero-argument callable to time. The
+runner calibrates a loop count so one repeat takes at least ``min_time``
+seconds, then runs ``repeat`` rounds of one repeat of every benchmark, so a
+slow spell of the machine costs each benchmark a repeat rather than one
+benchmark all of them. The garbage collector is off while timing (as in
+``timeit``), and the fastest repeat is what gets compared against a stored
+baseline: slower repeats are mostly other processes, the minimum is the code.
+
+Absolute timings only mean something on the machine that took them, so every
+run also times a fixed pure-Python workload (``calibrate``) in the same rounds
+and the baseline stores it next to the results. A comparison first scales the baseline by the
+ratio of the two calibrations, i.e. it compares each benchmark relative to
+what this machine does with the same interpreter work. That absorbs CPU
+speed, not everything (cache sizes, a different Python): for a close call,
+regenerate the baseline (``--save-baseline``) on the machine being compared.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "microbench.json")
+
+_registry = {}
+
+
+def benchmark(name):
+    def register(setup):
+        _registry[name] = setup
+        return setup
+    return register
+
+
+def registered():
+    return dict(_registry)
+
+
+#================ FIXTURES ====
+def _provider_account(provider_code, config=None):
+    from apps.provider.models import Provider, ProviderAccount
+
+    provider = Provider(name=provider_code, provider_code=provider_code)
+    return ProviderAccount(provider=provider, account_name=f"{provider_code}-BENCH", vending_sim="08030000000", config=config or {})
+
+
+def _profile():
+    from apps.perf.simulator import ProviderProfile
+
+    return ProviderProfile("BENCH", {"outcomes": {"success": 1}, "balance": 10 ** 12})
+
+
+#================ BENCHMARKS ====
+@benchmark("format_msisdn")
+def bench_format_msisdn():
+    from config.helper import format_msisdn
+
+    numbers = ["+2348031234567", "2348031234567", "08031234567", "+2347061234567"]
+
+    def run():
+        for number in numbers:
+            format_msisdn(number)
+    return run
+
+
+@benchmark("request_signature_check")
+def bench_request_signature_check():
+    from config.helper import request_signature, verify_request_signature
+
+    secret, api_key, timestamp = "s" * 64, "k" * 48, "2024-01-01T10:00:00Z"
+    received = request_signature(secret, timestamp, api_key)
+
+    def run():
+        verify_request_signature(secret, timestamp, api_key, received)
+    return run
+
+
+@benchmark("calculate_discounted_amount")
+def bench_calculate_discounted_amount():
+    from apps.product.views import ProductApiView
+
+    view = ProductApiView()
+    percent = SimpleNamespace(_discount_type="percentage", _discount_value="2.5")
+    fixed = SimpleNamespace(_discount_type="fixed", _discount_value="10")
+    amount = Decimal("1000")
+
+    def run():
+        view._calculate_discounted_amount(percent, amount)
+        view._calculate_discounted_amount(fixed, amount)
+    return run
+
+
+@benchmark("mtn_payload")
+def bench_mtn_payload():
+    from apps.provider.services._mtn import MTNNProviderService
+
+    service = MTNNProviderService(_provider_account("MTN"), merchant_ref="REF1234567890", receiver_phone="08031234567",
+                                  amount=100, product_code="MTNVTU")
+
+    def run():
+        service._generate_payload()
+    return run
+
+
+@benchmark("glo_payload")
+def bench_glo_payload():
+    from apps.provider.services._glo import GloProviderService
+
+    service = GloProviderService(_provider_account("GLO", {"user_id": "u", "password": "p", "reseller_id": "r", "client_id": "c"}),
+                                 merchant_ref="REF1234567890", receiver_phone="08051234567", amount=100, product_code="GLOVTU")
+
+    def run():
+        service._generate_payload(service.receiver_phone, service.amount, service.data_code, service.product_code)
+    return run
+
+
+@benchmark("mtn_response_parse")
+def bench_mtn_response_parse():
+    import xmltodict
+
+    from apps.perf.simulator import mtn_vend
+    from apps.provider.services._mtn import MTNNProviderService
+
+    service = MTNNProviderService(_provider_account("MTN"), merchant_ref="REF1234567890", receiver_phone="08031234567",
+                                  amount=100, product_code="MTNVTU")
+    _, _, body = mtn_vend(_profile(), service._generate_payload())
+    body = body.encode()
+
+    def run():
+        service._map_response(xmltodict.parse(body))
+    return run
+
+
+@benchmark("glo_response_parse")
+def bench_glo_response_parse():
+    import xmltodict
+
+    from apps.perf.simulator import glo_vend
+
+    _, _, body = glo_vend(_profile(), "<value>100</value><clientReference>1234567890</clientReference>")
+    body = body.encode()
+
+    def run():
+        parsed = xmltodict.parse(body)
+        parsed["soap:Envelope"]["soap:Body"]["ns2:requestTopupResponse"]["return"]["resultCode"]
+    return run
+
+
+@benchmark("creditswitch_checksum")
+def bench_creditswitch_checksum():
+    from apps.provider.services._creditswitch import CreditswitchProviderService
+
+    service = CreditswitchProviderService(_provider_account("CREDITSWITCH", {"login_id": "123", "private_key": "p" * 32}),
+                                          merchant_ref="REF1234567890", receiver_phone="08031234567", amount=100, product_code="MTNVTU")
+    payload = service._payload_airtime()
+
+    def run():
+        service._generate_checksum(payload)
+    return run
+
+
+@benchmark("transaction_history_render")
+def bench_transaction_history_render():
+    from apps.product.models import Product, Transaction
+    from apps.product.serializers import TransactionSerializer
+    from config.helper import JsonResponse
+
+    product = Product(product_code="MTNVTU")
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    transactions = [
+        Transaction(amount=Decimal("100.00"), description="MTN VTU 100", beneficiary_account="08031234567", product=product,
+                    merchant_ref=f"REF{i:010d}", status="Success", balance_after=Decimal("99000.00"), created_at=now)
+        for i in range(50)
+    ]
+
+    def run():
+        _render(JsonResponse(data=TransactionSerializer(transactions, many=True).data))
+    return run
+
+
+def _render(response):
+    from rest_framework.settings import api_settings
+
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    response.accepted_renderer = renderer
+    response.accepted_media_type = renderer.media_type
+    response.renderer_context = {}
+    return response.render()
+
+
+@benchmark("catalog_render")
+def bench_catalog_render():
+    """getDataBundle served from cache: 200 bundles through JsonResponse."""
+    from config.helper import JsonResponse
+
+    bundles = [
+        {"product_code": "MTNDATA", "data_code": f"{1000 + i}", "amount": f"{100 * (i % 40 + 1)}.00",
+         "description": f"MTN {i % 40 + 1}GB 30 days plan", "duration": "30 days", "value": f"{i % 40 + 1}GB"}
+        for i in range(200)
+    ]
+
+    def run():
+        _render(JsonResponse(data=bundles))
+    return run
+
+
+@benchmark("catalog_prebuilt_serve")
+def bench_catalog_prebuilt_serve():
+    """getDataBundle from the prebuilt catalog entry: same 200 bundles, gzip negotiated."""
+    from apps.product.catalog import build_entry, serve
+
+    entry = build_entry([
+        {"product_code": "MTNDATA", "data_code": f"{1000 + i}", "amount": f"{100 * (i % 40 + 1)}.00",
+         "description": f"MTN {i % 40 + 1}GB 30 days plan", "duration": "30 days", "value": f"{i % 40 + 1}GB"}
+        for i in range(200)
+    ])
+    request = SimpleNamespace(META={"HTTP_ACCEPT_ENCODING": "gzip, deflate, br"})
+
+    def run():
+        serve(request, entry)
+    return run
+
+
+@benchmark("cache_near_hit")
+def bench_cache_near_hit():
+    """A tagged product lookup answered by the per-worker tier."""
+    from config.cache import get_or_compute
+
+    product = _provider_account("MTN")
+    tags = ("catalog", "product:MTNVTU")
+    get_or_compute("bench_product_MTNVTU", lambda: product, 3600, "bench", tags=tags)
+
+    def run():
+        get_or_compute("bench_product_MTNVTU", lambda: product, 3600, "bench", tags=tags)
+    return run
+
+
+@benchmark("cache_product_record_decode")
+def bench_cache_product_record_decode():
+    """A cached product read from Redis: msgpack payload -> Product with account and provider."""
+    from apps.product.models import Product, ProductCategory
+    from apps.product.records import PRODUCT_RECORD
+    from config import cachecodec
+
+    product = Product(id=1, product_code="MTNVTU", description="MTN airtime", is_active=True,
+                      category=ProductCategory(id=1, category_code="AIRTIME"),
+                      preferred_provider_account=_provider_account("MTN", {"url": "https://example.com", "token": "t" * 32}))
+    product.preferred_provider_account.id = 1
+    product.preferred_provider_account.provider.id = 1
+    payload = cachecodec.dumps((PRODUCT_RECORD.dump(product), 0.0, 0.0))
+
+    def run():
+        PRODUCT_RECORD.load(cachecodec.loads(payload)[0])
+    return run
+
+
+@benchmark("vend_response_render")
+def bench_vend_response_render():
+    from apps.product.models import Product, Transaction
+    from apps.product.serializers import TransactionSerializer
+    from config.helper import JsonResponse
+
+    txn = Transaction(amount=Decimal("100.00"), description="Airtime vending N100 for 08031234567", beneficiary_account="08031234567",
+                      product=Product(product_code="MTNVTU"), merchant_ref="REF1234567890", status="Success",
+                      balance_after=Decimal("99000.00"), created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    def run():
+        _render(JsonResponse(code="00", data=TransactionSerializer(txn).data, msg="Transaction Successful"))
+    return run
+
+
+@benchmark("vend_request_parse")
+def bench_vend_request_parse():
+    import io
+
+    from rest_framework.settings import api_settings
+
+    parser = api_settings.DEFAULT_PARSER_CLASSES[0]()
+    body = json.dumps({"product_code": "MTNVTU", "amount": 100, "phone_number": "08031234567", "merchant_ref": "REF1234567890"}).encode()
+
+    def run():
+        parser.parse(io.BytesIO(body), "application/json", {})
+    return run
+
+
+@benchmark("vend_command_decode")
+def bench_vend_command_decode():
+    from apps.product.commands import VendAirtimeCommand, decode_command
+
+    request = SimpleNamespace(body=json.dumps({
+        "product_code": "MTNVTU", "amount": 100, "phone_number": "+2348031234567", "merchant_ref": "REF-1234567890",
+    }).encode())
+
+    def run():
+        decode_command(request, VendAirtimeCommand)
+    return run
+
+
+#================ CALIBRATION ====
+def _calibration_workload():
+    """Interpreter-bound work in the same mix as the benchmarks: dicts, strings, Decimal, json."""
+    payload = {"product_code": "MTNVTU", "amount": "100.00", "phone_number": "08031234567", "merchant_ref": "REF1234567890"}
+
+    def run():
+        total = Decimal("0")
+        for i in range(20):
+            item = dict(payload, index=i)
+            total += Decimal(item["amount"]) * Decimal("0.97")
+            "|".join(f"{key}={value}" for key, value in sorted(item.items()))
+        json.loads(json.dumps(item))
+        return total
+    return run
+
+
+def calibrate(repeat=7, min_time=0.2):
+    """Fastest per-call microseconds of the calibration workload on this machine."""
+    _, timings = measure(_calibration_workload(), repeat=repeat, min_time=min_time)
+    return round(min(timings) * 1e6, 3)
+
+
+def rescale(baseline, calibration):
+    """Baseline results as they would read on a machine whose calibration is ``calibration``."""
+    results = baseline.get("results", {})
+    recorded = baseline.get("calibration_us")
+    if not recorded or not calibration:
+        return results  # older baseline without a calibration: absolute timings
+    factor = calibration / recorded
+    return {
+        name: {**r, "min_us": round(r["min_us"] * factor, 3), "median_us": round(r["median_us"] * factor, 3)}
+        for name, r in results.items()
+    }
+
+
+#================ RUNNER ====
+_CALIBRATION = "__calibration__"
+
+
+def _time(func, loops):
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return time.perf_counter() - started
+
+
+def measure_all(funcs, repeat=7, min_time=0.2):
+    """name -> (loops, per-call seconds of each repeat), one repeat of every func per round."""
+    for func in funcs.values():
+        func()  # warm imports and caches
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        loop_counts, timings = {}, {}
+        for name, func in funcs.items():
+            loops = 1
+            while True:
+                elapsed = _time(func, loops)
+                if elapsed >= min_time:
+                    break
+                loops = max(loops * 2, int(loops * min_time / elapsed) + 1) if elapsed else loops * 10
+            loop_counts[name], timings[name] = loops, [elapsed / loops]
+        for _ in range(repeat - 1):
+            for name, func in funcs.items():
+                timings[name].append(_time(func, loop_counts[name]) / loop_counts[name])
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {name: (loop_counts[name], timings[name]) for name in funcs}
+
+
+def measure(func, repeat=7, min_time=0.2):
+    """Per-call seconds for each of ``repeat`` repeats."""
+    return measure_all({"": func}, repeat=repeat, min_time=min_time)[""]
+
+
+def run(names=None, repeat=7, min_time=0.2):
+    """-> (results, calibration_us); the calibration workload is timed in the same rounds as the benchmarks."""
+    funcs = {name: setup() for name, setup in _registry.items() if not names or name in names}
+    funcs[_CALIBRATION] = _calibration_workload()
+    measured = measure_all(funcs, repeat=repeat, min_time=min_time)
+    _, calibration = measured.pop(_CALIBRATION)
+    results = {
+        name: {
+            "loops": loops,
+            "median_us": round(statistics.median(timings) * 1e6, 3),
+            "min_us": round(min(timings) * 1e6, 3),
+            "stdev_us": round(statistics.pstdev(timings) * 1e6, 3),
+        }
+        for name, (loops, timings) in measured.items()
+    }
+    return results, round(min(calibration) * 1e6, 3)
+
+
+def environment():
+    from apps.perf.loadgen import git_revision
+
+    sha, dirty = git_revision()
+    return {
+        "git_sha": sha,
+        "git_dirty": dirty,
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(baseline, results, threshold, calibration=None):
+    """
+    -> rows of (name, baseline_us, current_us, change, verdict) where verdict is
+    'regression' / 'improvement' beyond ``threshold`` (a fraction), else 'ok'.
+    ``baseline_us`` is the baseline rescaled to this run's ``calibration``.
+    """
+    expected = rescale(baseline, calibration)
+    rows = []
+    for name, current in results.items():
+        before = expected.get(name)
+        if not before:
+            rows.append((name, None, current["min_us"], None, "new"))
+            continue
+        change = (current["min_us"] - before["min_us"]) / before["min_us"]
+        verdict = "regression" if change > threshold else "improvement" if change < -threshold else "ok"
+        rows.append((name, before["min_us"], current["min_us"], change, verdict))
+    return rows
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_baseline(results, calibration, path=BASELINE_PATH):
+    # read the git state before truncating the (tracked) baseline file
+    baseline = {"environment": environment(), "calibration_us": calibration, "results": results}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(baseline, fh, indent=2, sort_keys=True)
+        fh.write("\n")
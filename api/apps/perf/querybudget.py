@@ -0,0 +1,274 @@
+"""
+Query and row-lock budget for the vend endpoints.
+
+``QueryRecorder`` hooks every database connection (``execute_wrapper``) plus
+``commit``/``rollback`` and records, per request:
+
+    - every statement, its type (SELECT, SELECT FOR UPDATE, INSERT, UPDATE,
+      DELETE, SAVEPOINT, OTHER) and duration; BEGIN/COMMIT that some
+      backends send as statements are listed but not counted as queries
+    - lock windows: from the first row-locking statement (SELECT FOR UPDATE,
+      UPDATE, DELETE) inside a transaction until that transaction commits or
+      rolls back; outside a transaction the statement itself is the window
+
+``run_scenarios`` seeds a merchant, products, bundles and provider account in
+the (test) database, points the provider at the in-process simulator and
+drives each endpoint through the full middleware/auth stack with a signed
+request. Steady-state numbers (after ``warmup`` calls) are checked against
+``apps/perf/baselines/query_budget.json``.
+
+Lock hold times are only meaningful on PostgreSQL; other backends drop
+FOR UPDATE and serialise writes differently.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.db import connections
+
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "baselines", "query_budget.json")
+
+_FIRST_WORD = re.compile(r"^\s*(\w+)")
+_FOR_UPDATE = re.compile(r"\bFOR\s+(NO\s+KEY\s+)?UPDATE\b", re.I)
+_LOCKED_TABLE = re.compile(r'^\s*(?:UPDATE|DELETE\s+FROM)\s+"?(\w+)"?|\bFROM\s+"?(\w+)"?', re.I)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_type(sql):
+    match = _FIRST_WORD.match(sql)
+    word = match.group(1).upper() if match else ""
+    if word == "SELECT":
+        return "SELECT FOR UPDATE" if _FOR_UPDATE.search(sql) else "SELECT"
+    if word in ("INSERT", "UPDATE", "DELETE"):
+        return word
+    if word == "ROLLBACK" and "SAVEPOINT" not in sql.upper():
+        return "TRANSACTION"
+    if word in ("SAVEPOINT", "RELEASE", "ROLLBACK"):
+        return "SAVEPOINT"
+    if word in ("BEGIN", "COMMIT"):
+        return "TRANSACTION"
+    return "OTHER"
+
+
+def normalize(sql):
+    """Strip literals so the same statement with different values groups together."""
+    return _LITERALS.sub("?", " ".join(sql.split()))
+
+
+def locked_table(sql):
+    match = _LOCKED_TABLE.search(sql)
+    return (match.group(1) or match.group(2)) if match else "?"
+
+
+#================ RECORDER ====
+class QueryRecorder:
+    def __init__(self):
+        self.statements = []  # (alias, type, normalized sql, duration seconds)
+        self.lock_windows = []  # {"alias", "tables", "hold_ms", "outcome"}
+        self._open = {}  # alias -> {"started", "tables"}
+
+    def _execute(self, execute, sql, params, many, context):
+        connection = context["connection"]
+        kind = statement_type(sql)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            finished = time.perf_counter()
+            self.statements.append((connection.alias, kind, normalize(sql), finished - started))
+            if kind in ("SELECT FOR UPDATE", "UPDATE", "DELETE"):
+                table = locked_table(sql)
+                if connection.in_atomic_block:
+                    window = self._open.setdefault(connection.alias, {"started": started, "tables": []})
+                    if table not in window["tables"]:
+                        window["tables"].append(table)
+                else:
+                    self.lock_windows.append({
+                        "alias": connection.alias, "tables": [table],
+                        "hold_ms": round((finished - started) * 1000, 3), "outcome": "autocommit",
+                    })
+
+    def _closer(self, connection, outcome, original):
+        def close(*args, **kwargs):
+            try:
+                return original(*args, **kwargs)
+            finally:
+                window = self._open.pop(connection.alias, None)
+                if window:
+                    self.lock_windows.append({
+                        "alias": connection.alias, "tables": window["tables"],
+                        "hold_ms": round((time.perf_counter() - window["started"]) * 1000, 3), "outcome": outcome,
+                    })
+        return close
+
+    @contextmanager
+    def __call__(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                connection = connections[alias]
+                stack.enter_context(connection.execute_wrapper(self._execute))
+                # instance attributes shadow the methods atomic() calls on exit
+                connection.commit = self._closer(connection, "commit", connection.commit)
+                connection.rollback = self._closer(connection, "rollback", connection.rollback)
+                stack.callback(connection.__dict__.pop, "commit", None)
+                stack.callback(connection.__dict__.pop, "rollback", None)
+            yield self
+
+    def summary(self):
+        by_type = Counter(kind for _, kind, _, _ in self.statements)
+        statements = Counter(sql for _, _, sql, _ in self.statements)
+        holds = [w["hold_ms"] for w in self.lock_windows]
+        return {
+            "queries": len(self.statements) - by_type.get("TRANSACTION", 0),
+            "query_ms": round(sum(d for _, _, _, d in self.statements) * 1000, 3),
+            "by_type": dict(sorted(by_type.items())),
+            "lock_windows": self.lock_windows,
+            "max_lock_ms": max(holds, default=0.0),
+            "total_lock_ms": round(sum(holds), 3),
+            "statements": [{"count": n, "sql": sql} for sql, n in statements.most_common()],
+        }
+
+
+#================ FIXTURES ====
+API_KEY = "qb-api-key"
+API_SECRET = "qb-api-secret"
+
+
+def seed(provider_code="MTN"):
+    """Minimal catalog and a funded merchant; returns the merchant."""
+    from apps.merchant.models import Merchant, MerchantDiscount, User
+    from apps.product.models import DataPackage, DataPackageProvider, Product, ProductCategory
+    from apps.provider.models import Provider, ProviderAccount
+
+    provider = Provider.objects.create(name=provider_code, provider_code=provider_code)
+    account = ProviderAccount.objects.create(provider=provider, account_name=f"{provider_code}-QB", vending_sim="08030000000")
+    airtime = ProductCategory.objects.create(name="Airtime", category_code="AIRTIME")
+    data = ProductCategory.objects.create(name="Data", category_code="DATA")
+    vtu = Product.objects.create(product_name="MTN VTU", product_code="MTNVTU", description="MTN airtime",
+                                 category=airtime, preferred_provider_account=account)
+    bundle_product = Product.objects.create(product_name="MTN Data", product_code="MTNDATA", description="MTN data",
+                                            category=data, preferred_provider_account=account)
+    bundle = DataPackage.objects.create(product=bundle_product, data_code="1000", amount=Decimal("300"), description="1GB 30 days")
+    DataPackageProvider.objects.create(datapackage=bundle, provider=provider, provider_code="1000")
+
+    user = User.objects.create(email="querybudget@example.com", username="querybudget", first_name="Query")
+    merchant = Merchant.objects.create(
+        business_name="Query Budget", user=user, current_balance=Decimal("100000000"),
+        daily_tranx_limit="100000000", api_key=API_KEY, api_secret=API_SECRET,
+    )
+    MerchantDiscount.objects.create(product=vtu, merchant=merchant, discount_type="percentage", discount_value=2.5)
+    return merchant
+
+
+def _headers(merchant):
+    from config.helper import request_signature
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "HTTP_X_MERCHANT_CODE": merchant.merchant_code,
+        "HTTP_X_API_KEY": API_KEY,
+        "HTTP_X_TIMESTAMP": timestamp,
+        "HTTP_X_SIGNATURE": request_signature(API_SECRET, timestamp, API_KEY),
+    }
+
+
+def _ref():
+    return f"QB{uuid.uuid4().hex[:20]}"
+
+
+SCENARIOS = {
+    "vendAirtime": lambda state: ("post", "/api/product/vendAirtime",
+                                  {"product_code": "MTNVTU", "amount": 100, "phone_number": "08031234567", "merchant_ref": state.new_ref()}),
+    "vendData": lambda state: ("post", "/api/product/vendData",
+                               {"product_code": "MTNDATA", "data_code": "1000", "phone_number": "08031234567", "merchant_ref": state.new_ref()}),
+    "requeryTransaction": lambda state: ("post", "/api/product/requeryTransaction", {"merchant_ref": state.last_ref}),
+    "getDataBundle": lambda state: ("get", "/api/product/getDataBundle", {"product_code": "MTNDATA"}),
+}
+
+
+class _State:
+    def __init__(self):
+        self.last_ref = None
+
+    def new_ref(self):
+        self.last_ref = _ref()
+        return self.last_ref
+
+
+def run_scenarios(names=None, iterations=3, warmup=1):
+    """-> {endpoint: {"iterations": [summary, ...], "steady": worst measured summary}}"""
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from apps.perf.simulator import run_in_thread
+
+    merchant = seed()
+    server = run_in_thread(overrides={"default": {
+        "latency": {"distribution": "fixed", "fixed_ms": 1}, "outcomes": {"success": 1},
+    }})
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = Client(REMOTE_ADDR="127.0.0.1")
+    state = _State()
+    results = {}
+    try:
+        with override_settings(PROVIDER_BASE_URL_OVERRIDES={code: base_url for code in ("MTN", "GLO", "AIRTEL", "9MOBILE", "PAYVANTAGE", "CREDITSWITCH")}):
+            for name, build in SCENARIOS.items():
+                if names and name not in names:
+                    continue
+                runs = []
+                for i in range(warmup + iterations):
+                    method, path, payload = build(state)
+                    recorder = QueryRecorder()
+                    with recorder():
+                        if method == "get":
+                            response = client.get(path, payload, **_headers(merchant))
+                        else:
+                            response = client.post(path, payload, content_type="application/json", **_headers(merchant))
+                    summary = recorder.summary()
+                    summary["http_status"] = response.status_code
+                    try:
+                        summary["response_code"] = json.loads(response.content).get("responseCode")
+                    except ValueError:
+                        summary["response_code"] = None
+                    if i >= warmup:
+                        runs.append(summary)
+                steady = max(runs, key=lambda r: (r["queries"], r["max_lock_ms"]))
+                results[name] = {"iterations": runs, "steady": steady}
+    finally:
+        server.shutdown()
+    return results
+
+
+#================ BUDGETS ====
+def load_budget(path=BUDGET_PATH):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def check(results, budget):
+    """-> list of human readable violations."""
+    violations = []
+    for name, result in results.items():
+        limits = budget.get(name)
+        steady = result["steady"]
+        if not limits:
+            violations.append(f"{name}: no budget defined")
+            continue
+        if steady["response_code"] not in limits.get("expect_codes", [steady["response_code"]]):
+            violations.append(f"{name}: unexpected response {steady['http_status']}/{steady['response_code']}")
+        if steady["queries"] > limits["max_queries"]:
+            violations.append(f"{name}: {steady['queries']} queries > budget {limits['max_queries']}")
+        for kind, limit in limits.get("max_by_type", {}).items():
+            if steady["by_type"].get(kind, 0) > limit:
+                violations.append(f"{name}: {steady['by_type'][kind]} {kind} > budget {limit}")
+        if "max_lock_ms" in limits and steady["max_lock_ms"] > limits["max_lock_ms"]:
+            violations.append(f"{name}: row locks held {steady['max_lock_ms']}ms > budget {limits['max_lock_ms']}ms")
+        if "max_lock_windows" in limits and len(steady["lock_windows"]) > limits["max_lock_windows"]:
+            violations.append(f"{name}: {len(steady['lock_windows'])} lock windows > budget {limits['max_lock_windows']}")
+    return violations
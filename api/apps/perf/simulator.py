@@ -0,0 +1,401 @@
+"""
+Provider simulator.
+
+One HTTP server that answers on the real paths of every provider we integrate
+with and in the provider's own wire format, so the vend path can be load
+tested end to end without touching a telco:
+
+    MTN         POST /axis2/services/HostIFService                       HostIF SOAP
+    GLO         POST /topupservice/service                               ERS SOAP
+    AIRTEL      POST /pretups/C2SReceiver                                PreTUPS XML COMMAND
+    9MOBILE     POST /EVC/SinglePointFulfilment/EVCPinlessInterfaceEndpoint  SDF SOAP
+    PAYVANTAGE  POST /service/api/single_{airtime,data}_direct_vending, check_transaction_status
+    CREDITSWITCH POST /api/v1/mvend, /api/v1/dvend; GET /api/v1/requery
+
+Point the services at it with PROVIDER_BASE_URL_OVERRIDES (or ``base_url`` in
+a provider account config). Each provider has its own profile: a latency
+distribution, an outcome mix (success, failed, pending, invalid_msisdn,
+timeout) and a float balance that is drawn down by successful vends and
+answers "insufficient balance" once depleted.
+
+    GET  /_sim/stats   counters and balances
+    POST /_sim/reset   restore balances, clear counters and stored transactions
+"""
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import xmltodict
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("MTN", "GLO", "AIRTEL", "9MOBILE", "PAYVANTAGE", "CREDITSWITCH")
+OUTCOMES = ("success", "failed", "pending", "invalid_msisdn", "timeout")
+
+DEFAULT_PROFILE = {
+    "latency": {"distribution": "lognormal", "median_ms": 250, "p99_ms": 2000},
+    "outcomes": {"success": 0.93, "failed": 0.03, "pending": 0.02, "invalid_msisdn": 0.01, "timeout": 0.01},
+    "timeout_s": 15,  # how long a "timeout" outcome hangs; longer than the client timeout (10s)
+    "balance": 1_000_000_000,
+}
+MAX_STORED_TRANSACTIONS = 200_000
+
+
+#================ PROFILES ====
+class LatencyModel:
+    """fixed | uniform (min_ms..max_ms) | lognormal (median_ms, p99_ms)."""
+
+    def __init__(self, distribution="lognormal", median_ms=250, p99_ms=2000, min_ms=0, max_ms=None, fixed_ms=None):
+        self.distribution = distribution
+        self.median = median_ms / 1000.0
+        self.min = min_ms / 1000.0
+        self.max = (max_ms if max_ms is not None else p99_ms) / 1000.0
+        self.fixed = (fixed_ms if fixed_ms is not None else median_ms) / 1000.0
+        # lognormal sigma from the ratio of p99 to median (z(0.99) = 2.326)
+        self.sigma = math.log(max(p99_ms, median_ms) / median_ms) / 2.326 if median_ms > 0 else 0.0
+
+    def sample(self):
+        if self.distribution == "fixed":
+            return self.fixed
+        if self.distribution == "uniform":
+            return random.uniform(self.min, self.max)
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.sigma * random.gauss(0.0, 1.0))
+
+
+class ProviderProfile:
+    def __init__(self, name, config):
+        self.name = name
+        self.latency = LatencyModel(**config.get("latency", {}))
+        outcomes = config.get("outcomes", {})
+        self.outcomes = [o for o in OUTCOMES if outcomes.get(o, 0) > 0] or ["success"]
+        self.weights = [outcomes.get(o, 1) for o in self.outcomes]
+        self.timeout_s = config.get("timeout_s", DEFAULT_PROFILE["timeout_s"])
+        self.initial_balance = float(config.get("balance", DEFAULT_PROFILE["balance"]))
+        self.balance = self.initial_balance
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.transactions = OrderedDict()  # reference -> (outcome, provider_ref)
+
+    def decide(self, amount):
+        """Pick an outcome for a vend of ``amount``; debits the balance on success."""
+        outcome = random.choices(self.outcomes, self.weights)[0]
+        with self.lock:
+            if outcome == "success":
+                if amount > self.balance:
+                    outcome = "insufficient_balance"
+                else:
+                    self.balance -= amount
+            self.stats[outcome] += 1
+            return outcome, self.balance
+
+    def remember(self, reference, outcome, provider_ref):
+        if not reference:
+            return
+        with self.lock:
+            self.transactions[reference] = (outcome, provider_ref)
+            while len(self.transactions) > MAX_STORED_TRANSACTIONS:
+                self.transactions.popitem(last=False)
+
+    def lookup(self, reference):
+        with self.lock:
+            return self.transactions.get(reference)
+
+    def reset(self):
+        with self.lock:
+            self.balance = self.initial_balance
+            self.stats.clear()
+            self.transactions.clear()
+
+
+def build_profiles(overrides=None):
+    """``overrides``: {"default": {...}, "MTN": {...}}, merged over DEFAULT_PROFILE."""
+    overrides = overrides or {}
+    base = _merge(DEFAULT_PROFILE, overrides.get("default", {}))
+    return {name: ProviderProfile(name, _merge(base, overrides.get(name, {}))) for name in PROVIDERS}
+
+
+def _merge(base, extra):
+    merged = dict(base)
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            # outcome mixes replace rather than merge, so weights can be dropped
+            merged[key] = dict(value) if key == "outcomes" else {**merged[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def _ref():
+    return uuid.uuid4().hex[:16].upper()
+
+
+def _xml_text(body, tag):
+    match = re.search(rf"<(?:\w+:)?{tag}>([^<]*)</(?:\w+:)?{tag}>", body)
+    return match.group(1).strip() if match else ""
+
+
+def _xml_path(body, *tags):
+    """Text of ``tags[-1]`` inside the nested ``tags[:-1]`` elements (first match at each level)."""
+    for tag in tags[:-1]:
+        match = re.search(rf"<(?:\w+:)?{tag}>(.*?)</(?:\w+:)?{tag}>", body, re.S)
+        if not match:
+            return ""
+        body = match.group(1)
+    return _xml_text(body, tags[-1])
+
+
+#================ WIRE FORMATS ====
+def mtn_vend(profile, body):
+    amount = float(_xml_text(body, "amount") or 0)
+    outcome, balance = profile.decide(amount)
+    status, message = {
+        "success": ("0", "Successful"),
+        "invalid_msisdn": ("1004", "Invalid destination MSISDN"),
+        "insufficient_balance": ("1003", "Insufficient funds"),
+        "pending": ("1001", "System busy"),
+    }.get(outcome, ("1010", "Transaction failed"))
+    tx_ref = _ref()
+    profile.remember(_xml_text(body, "sequence"), outcome, tx_ref)
+    return outcome, "text/xml", xmltodict.unparse({"SOAP-ENV:Envelope": {
+        "@xmlns:SOAP-ENV": "http://schemas.xmlsoap.org/soap/envelope/",
+        "SOAP-ENV:Body": {"xsd:vendResponse": {
+            "@xmlns:xsd": "http://hostif.vtm.prism.co.za/xsd",
+            "xsd:sequence": _xml_text(body, "sequence"),
+            "xsd:statusId": status,
+            "xsd:txRefId": tx_ref,
+            "xsd:origBalance": f"{balance:.2f}",
+            "xsd:responseMessage": message,
+        }},
+    }})
+
+
+def glo_vend(profile, body):
+    # <value> also appears in transactionProperties (GLODATA), so read amount/value
+    amount = float(_xml_path(body, "amount", "value") or 0)
+    outcome, balance = profile.decide(amount)
+    code, description = {
+        "success": ("0", "SUCCESS"),
+        "invalid_msisdn": ("94", "Topup account is not valid"),
+        "insufficient_balance": ("11", "Insufficient reseller balance"),
+        "pending": ("1", "Request is being processed"),
+    }.get(outcome, ("99", "Topup failed"))
+    ers_ref = _ref()
+    profile.remember(_xml_text(body, "clientReference"), outcome, ers_ref)
+    return outcome, "text/xml", xmltodict.unparse({"soap:Envelope": {
+        "@xmlns:soap": "http://schemas.xmlsoap.org/soap/envelope/",
+        "soap:Body": {"ns2:requestTopupResponse": {
+            "@xmlns:ns2": "http://external.interfaces.ers.seamless.com/",
+            "return": {
+                "ersReference": ers_ref,
+                "resultCode": code,
+                "resultDescription": description,
+                "senderPrincipal": {"accounts": {"account": {"balance": {"currency": "NGN", "value": f"{balance:.2f}"}}}},
+            },
+        }},
+    }})
+
+
+def airtel_command(profile, body):
+    request_type = _xml_text(body, "TYPE")
+    reference = _xml_text(body, "EXTREFNUM")
+    if request_type == "EXUSRBALREQ":
+        response = {"TYPE": "EXUSRBALRESP", "TXNSTATUS": "200", "BALANCE": f"{profile.balance:.2f}", "MESSAGE": "Balance enquiry successful"}
+        return "balance", "text/xml", xmltodict.unparse({"COMMAND": response})
+    if request_type == "EXRCSTATREQ":
+        known = profile.lookup(reference)
+        status = {"success": "200", "pending": "205"}.get(known[0], "206") if known else "17001"
+        response = {"TYPE": "EXRCSTATRESP", "TXNSTATUS": status, "TXNID": known[1] if known else "", "EXTREFNUM": reference, "MESSAGE": "Status enquiry"}
+        return "requery", "text/xml", xmltodict.unparse({"COMMAND": response})
+
+    amount = float(_xml_text(body, "AMOUNT") or _xml_text(body, "AMT") or 0)
+    outcome, balance = profile.decide(amount)
+    status, message = {
+        "success": ("200", f"Transaction successful. Your balance is {balance:.2f} NGN"),
+        "invalid_msisdn": ("17017", "Receiver MSISDN is not valid"),
+        "insufficient_balance": ("7003", f"Insufficient balance, your balance is {balance:.2f} NGN"),
+        "pending": ("205", "Transaction is under process"),
+    }.get(outcome, ("206", "Transaction failed"))
+    txn_id = f"R{_ref()}"
+    profile.remember(reference, outcome, txn_id)
+    response = {"TYPE": "EXRCTRFRESP" if request_type == "EXRCTRFREQ" else "VASSELLRESP",
+                "TXNSTATUS": status, "DATE": time.strftime("%d/%m/%Y %H:%M:%S"),
+                "EXTREFNUM": reference, "TXNID": txn_id, "MESSAGE": message}
+    return outcome, "text/xml", xmltodict.unparse({"COMMAND": response})
+
+
+def etisalat_vend(profile, body):
+    amount_kobo = float(re.search(r'name="Amount">(\d+)<', body).group(1)) if 'name="Amount"' in body else 0
+    outcome, _ = profile.decide(amount_kobo / 100)
+    code, description = {
+        "success": ("0", "Successful"),
+        "invalid_msisdn": ("2", "Invalid MSISDN"),
+        "insufficient_balance": ("2", "Insufficient Funds"),
+        "pending": ("1", "Request in progress"),
+    }.get(outcome, ("3", "Recharge failed"))
+    instance_id = _ref()
+    profile.remember(_xml_text(body, "externalReference"), outcome, instance_id)
+    return outcome, "text/xml", xmltodict.unparse({"soapenv:Envelope": {
+        "@xmlns:soapenv": "http://schemas.xmlsoap.org/soap/envelope/",
+        "soapenv:Body": {"com:SDF_Data": {
+            "@xmlns:com": "http://sdf.cellc.net/commonDataModel",
+            "com:result": {"com:instanceId": instance_id, "com:statusCode": code, "com:errorDescription": description},
+        }},
+    }})
+
+
+def payvantage(profile, path, payload):
+    reference = payload.get("transaction_id")
+    if path.endswith("check_transaction_status"):
+        known = profile.lookup(reference)
+        if not known:
+            return "requery", "application/json", json.dumps({"status_code": "404", "message": "Transaction not found"})
+        result_code = {"success": "200", "pending": "501"}.get(known[0], "400")
+        return "requery", "application/json", json.dumps({"status_code": "200", "message": "Transaction found",
+                                                          "result": {"status_code": result_code, "reference": known[1]}})
+    outcome, _ = profile.decide(float(payload.get("amount") or 0))
+    status, message = {
+        "success": ("200", "Transaction successful"),
+        "pending": ("501", "Transaction pending"),
+        "invalid_msisdn": ("400", "Invalid phone number"),
+        "insufficient_balance": ("402", "Insufficient wallet balance"),
+    }.get(outcome, ("400", "Transaction failed"))
+    provider_ref = _ref()
+    profile.remember(reference, outcome, provider_ref)
+    return outcome, "application/json", json.dumps({"status_code": status, "message": message, "reference": provider_ref})
+
+
+def creditswitch(profile, path, payload, query):
+    if path.endswith("/requery"):
+        reference = (query.get("requestId") or [""])[0]
+        known = profile.lookup(reference)
+        if not known:
+            return "requery", "application/json", json.dumps({"statusCode": "C011", "statusDescription": "Transaction not found"})
+        code = {"success": "00", "pending": "C001"}.get(known[0], "C007")
+        return "requery", "application/json", json.dumps({"statusCode": code, "statusDescription": "Requery", "tranxReference": known[1]})
+    outcome, balance = profile.decide(float(payload.get("amount") or 0))
+    code, description = {
+        "success": ("00", "Successful"),
+        "pending": ("C001", "Transaction pending"),
+        "invalid_msisdn": ("C006", "Invalid recipient"),
+        "insufficient_balance": ("C005", "Insufficient balance"),
+    }.get(outcome, ("C007", "Transaction failed"))
+    provider_ref = _ref()
+    profile.remember(payload.get("requestId"), outcome, provider_ref)
+    return outcome, "application/json", json.dumps({
+        "statusCode": code, "statusDescription": description, "tranxReference": provider_ref,
+        "balance": f"{balance:.2f}", "mReference": payload.get("requestId"),
+    })
+
+
+ROUTES = (
+    ("/axis2/services/HostIFService", "MTN"),
+    ("/topupservice/service", "GLO"),
+    ("/pretups/C2SReceiver", "AIRTEL"),
+    ("/EVC/SinglePointFulfilment/EVCPinlessInterfaceEndpoint", "9MOBILE"),
+    ("/service/api/", "PAYVANTAGE"),
+    ("/api/v1/", "CREDITSWITCH"),
+)
+
+
+#================ SERVER ====
+class SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ProviderSimulator/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("SIMULATOR:: " + format, *args)
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        if url.path == "/_sim/stats":
+            return self._reply(200, "application/json", json.dumps(self.server.stats()))
+        if url.path == "/_sim/reset":
+            for profile in self.server.profiles.values():
+                profile.reset()
+            return self._reply(200, "application/json", '{"reset": true}')
+
+        provider = next((name for prefix, name in ROUTES if url.path.startswith(prefix)), None)
+        if provider is None:
+            return self._reply(404, "text/plain", "unknown path")
+        profile = self.server.profiles[provider]
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+
+        delay = profile.latency.sample()
+        try:
+            outcome, content_type, body = self._respond(provider, profile, url, raw)
+        except Exception as e:
+            logger.warning("SIMULATOR BAD REQUEST:: PROVIDER=%s REASON=%s", provider, e)
+            return self._reply(400, "text/plain", f"bad request: {e}")
+
+        if outcome == "timeout":
+            # hang past the client's timeout, then drop the connection
+            time.sleep(profile.timeout_s)
+            self.close_connection = True
+            return
+        time.sleep(delay)
+        self._reply(200, content_type, body)
+
+    def _respond(self, provider, profile, url, raw):
+        if provider == "MTN":
+            return mtn_vend(profile, raw)
+        if provider == "GLO":
+            return glo_vend(profile, raw)
+        if provider == "AIRTEL":
+            return airtel_command(profile, raw)
+        if provider == "9MOBILE":
+            return etisalat_vend(profile, raw)
+        payload = json.loads(raw) if raw else {}
+        if provider == "PAYVANTAGE":
+            return payvantage(profile, url.path, payload)
+        return creditswitch(profile, url.path, payload, parse_qs(url.query))
+
+    def _reply(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ProviderSimulator(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, profiles):
+        super().__init__(address, SimulatorHandler)
+        self.profiles = profiles
+        self.started_at = time.time()
+
+    def stats(self):
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "providers": {
+                name: {"balance": round(p.balance, 2), "outcomes": dict(p.stats), "stored_transactions": len(p.transactions)}
+                for name, p in self.profiles.items()
+            },
+        }
+
+
+def run_in_thread(host="127.0.0.1", port=0, overrides=None):
+    """Start a simulator in a background thread (for scripts); returns the server."""
+    server = ProviderSimulator((host, port), build_profiles(overrides))
+    threading.Thread(target=server.serve_forever, name="provider-simulator", daemon=True).start()
+    return server
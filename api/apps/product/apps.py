@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProductConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.product'
+
+    def ready(self):
+        from apps.product import signals  # noqa: F401
@@ -1,69 +1,67 @@
 """
-Cache utility functions for product app.
-Provides cache invalidation helpers for when data changes.
+Cache tags and invalidation helpers for the product app.
+
+Every cached product-app entry is read through ``config.cache.get_or_compute``
+with tags naming the data it was built from:
+
+    catalog             every product-app entry (``clear_all_product_caches``)
+    categories          the active category list
+    products            the per-category product lists
+    product:<code>      one product, its data bundles and provider mappings
+    provider:<code>     bundle mappings of one provider
+    merchant:<code>     a merchant's principal and discounts
+
+Invalidating a tag bumps its version, which orphans every entry carrying it.
+The signal handlers in ``apps.product.signals`` call these after commit.
 """
-from django.core.cache import cache
 import logging
 
+from config.cache import invalidate_tags
+from config.principal import merchant_tag
+
 logger = logging.getLogger(__name__)
 
+CATALOG_TAG = "catalog"
+CATEGORIES_TAG = "categories"
+PRODUCTS_TAG = "products"
+
+
+def product_tag(product_code):
+    return f"product:{product_code}"
 
-def invalidate_product_cache(product_code):
-    """Invalidate product cache when product is updated"""
-    cache_key = f"product_{product_code}"
-    cache.delete(cache_key)
-    logger.info(f"Invalidated product cache for: {product_code}")
 
+def provider_tag(provider_code):
+    return f"provider:{provider_code}"
 
-def invalidate_product_category_cache():
-    """Invalidate product categories cache"""
-    cache.delete("product_categories_active")
+
+def invalidate_product_cache(*product_codes):
+    """Invalidate products (validation lookups, bundles) and the product lists"""
+    invalidate_tags(PRODUCTS_TAG, *(product_tag(code) for code in product_codes))
+    logger.info(f"Invalidated product cache for: {','.join(product_codes)}")
+
+
+def invalidate_product_category_cache(*product_codes):
+    """Invalidate the category list, product lists and the products of changed categories"""
+    invalidate_tags(CATEGORIES_TAG, PRODUCTS_TAG, *(product_tag(code) for code in product_codes))
     logger.info("Invalidated product categories cache")
 
 
-def invalidate_product_list_cache(category_code=None):
-    """Invalidate product list cache for a category or all categories"""
-    if category_code:
-        cache_key = f"products_category_{category_code}"
-        cache.delete(cache_key)
-        logger.info(f"Invalidated product list cache for category: {category_code}")
-    else:
-        # Invalidate all product list caches (use pattern matching if available)
-        # For simplicity, we'll just log - in production you might want to track keys
-        logger.info("Invalidated all product list caches")
-
-
-def invalidate_data_package_cache(product_code=None, data_code=None):
-    """Invalidate data package cache"""
-    if product_code and data_code:
-        cache_key = f"data_package_{product_code}_{data_code}"
-        cache.delete(cache_key)
-        logger.info(f"Invalidated data package cache: {product_code}_{data_code}")
-    elif product_code:
-        # Invalidate all data bundles for a product
-        cache_key = f"data_bundles_{product_code}"
-        cache.delete(cache_key)
-        logger.info(f"Invalidated data bundles cache for product: {product_code}")
-
-
-def invalidate_merchant_discount_cache(user_id=None, product_code=None):
-    """Invalidate merchant discount cache"""
-    if user_id and product_code:
-        cache_key = f"merchant_discount_{user_id}_{product_code}"
-        cache.delete(cache_key)
-        logger.info(f"Invalidated merchant discount cache: {user_id}_{product_code}")
-    elif user_id:
-        # Invalidate all discount caches for a merchant
-        # Note: This is a simplified approach. In production, you might want to track keys
-        logger.info(f"Invalidated all merchant discount caches for user: {user_id}")
+def invalidate_data_package_cache(product_code, provider_code=None):
+    """Invalidate the data bundles of a product (and a provider's mappings)"""
+    tags = [product_tag(product_code)]
+    if provider_code:
+        tags.append(provider_tag(provider_code))
+    invalidate_tags(*tags)
+    logger.info(f"Invalidated data package cache for product: {product_code}")
 
 
-def clear_all_product_caches():
-    """Clear all product-related caches (use with caution)"""
-    # This is a nuclear option - clears all caches with our prefix
-    # In production, you might want to be more selective
-    logger.warning("Clearing all product-related caches")
-    # Note: Django cache doesn't support pattern deletion by default
-    # You'd need Redis with django-redis for pattern-based deletion
-    # For now, this is a placeholder
+def invalidate_merchant_discount_cache(merchant_code):
+    """Invalidate everything cached for a merchant"""
+    invalidate_tags(merchant_tag(merchant_code))
+    logger.info(f"Invalidated merchant discount cache for: {merchant_code}")
+
 
+def clear_all_product_caches():
+    """Clear all product-related caches"""
+    invalidate_tags(CATALOG_TAG)
+    logger.warning("Cleared all product-related caches")
@@ -0,0 +1,123 @@
+"""
+Prebuilt catalog responses.
+
+Categories, product lists and data bundles change a few times a day but are
+read on every merchant integration start-up. Instead of caching serializer
+output and rendering it on every hit, the final response body is built once
+per change: the JSON envelope bytes, a gzip and (when the brotli
+package is installed) a brotli variant, and a strong ETag over the body.
+
+Entries carry the cache tags of the data they were built from (see
+``cache_utils``), so model signals invalidate exactly the bodies a change
+affects.
+
+Bodies are always built from the primary, never inside ``reads()``: a rebuild
+right after an invalidation is stored under the new tag version for the full
+TTL, and a replica still replaying the change would pin the old rows there.
+
+A hit costs two cache reads (tag versions, entry) and no DB or serializer work;
+a matching ``If-None-Match`` gets a 304 with no body at all. Entries go
+through ``config.cache`` so an expiring catalog is rebuilt by one request.
+"""
+import gzip
+import hashlib
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.http.response import HttpResponseBase
+
+from config.cache import get_or_compute
+from config.renderers import render_json
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MIN_COMPRESS_SIZE = 512  # below this the headers outweigh the saving
+CONTENT_TYPE = "application/json"
+
+
+#================ ENTRIES ====
+def build_entry(data):
+    """Serialized ``responseData`` -> {"etag", "identity", "gzip", "br"}."""
+    from config.helper import JsonResponse
+
+    body = render_json(JsonResponse(data=data).data)
+    entry = {"etag": hashlib.sha256(body).hexdigest()[:32], "identity": body, "gzip": None, "br": None}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        entry["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            entry["br"] = brotli.compress(body, mode=brotli.MODE_TEXT)
+    return entry
+
+
+def _accepted(header):
+    """Accept-Encoding -> set of codings with a non-zero q."""
+    codings = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+def _not_modified(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        # the per-coding suffix still names the same content
+        if tag.strip('"').split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def serve(request, entry):
+    """Pick the representation for ``request``; 304 when the client already has it."""
+    codings = _accepted(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if entry["br"] is not None and "br" in codings:
+        coding = "br"
+    elif entry["gzip"] is not None and ("gzip" in codings or "*" in codings):
+        coding = "gzip"
+    else:
+        coding = "identity"
+    etag = f'"{entry["etag"]}"' if coding == "identity" else f'"{entry["etag"]}-{coding}"'
+
+    if _not_modified(request.META.get("HTTP_IF_NONE_MATCH"), entry["etag"]):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry[coding], content_type=CONTENT_TYPE)
+        if coding != "identity":
+            response["Content-Encoding"] = coding
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def respond(request, name, key, build, timeout, tags):
+    """
+    Serve the prebuilt ``name``/``key`` body, building it on a miss.
+
+    ``build()`` returns the serialized ``responseData`` to cache, or a
+    response (an error envelope) to return as-is without caching.
+    """
+    error = []
+
+    def compute():
+        data = build()
+        if isinstance(data, HttpResponseBase):
+            error.append(data)
+            return None
+        return build_entry(data)
+
+    entry = get_or_compute(f"catalog:{name}:{key}", compute, timeout, name, tags=tags)
+    if entry is None:
+        return error[0]
+    return serve(request, entry)
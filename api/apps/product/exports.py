@@ -0,0 +1,62 @@
+"""
+Streaming encoders for transaction exports.
+
+Rows arrive as tuples straight from ``values_list(...).iterator()`` and are
+encoded one at a time, so an export never holds more than a single database
+chunk in memory.
+"""
+import csv
+import datetime
+import json
+
+from django.utils import timezone
+
+
+EXPORT_FIELDS = (
+    "id", "created_at", "merchant_ref", "product__product_code", "beneficiary_account",
+    "amount", "discount_amount", "balance_before", "balance_after", "status",
+    "is_reverse", "provider_ref", "description",
+)
+EXPORT_HEADERS = (
+    "id", "created_at", "merchant_ref", "product_code", "beneficiary_account",
+    "amount", "discount_amount", "balance_before", "balance_after", "status",
+    "is_reverse", "provider_ref", "description",
+)
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return str(value)
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_HEADERS, row)), default=_plain) + "\n"
+
+
+def start_of_day(value):
+    """Parse ``YYYY-MM-DD`` into an aware datetime at local midnight."""
+    day = datetime.date.fromisoformat(value)
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
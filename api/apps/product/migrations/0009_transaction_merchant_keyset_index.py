@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_alter_datapackageprovider_provider_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['merchant', 'created_at', 'id'], name='vas_txn_merchant_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0009_transaction_merchant_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['updated_at'], name='vas_txn_updated_at_idx'),
+        ),
+    ]
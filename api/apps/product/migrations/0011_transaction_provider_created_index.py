@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0010_transaction_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['provider_account', 'created_at'], name='vas_txn_provider_created_idx'),
+        ),
+    ]
@@ -145,6 +145,12 @@ class Transaction(models.Model):
         db_table = 'vas_transactions'
         indexes = [
             models.Index(fields=['beneficiary_account','status','product','provider_ref','merchant_ref','created_at','product_category','amount']),
+            # keyset pagination for merchant history/export: WHERE merchant_id = ? ORDER BY created_at, id
+            models.Index(fields=['merchant','created_at','id'], name='vas_txn_merchant_created_idx'),
+            # watermark scans for the daily rollup refresh
+            models.Index(fields=['updated_at'], name='vas_txn_updated_at_idx'),
+            # settlement reconciliation: one provider account's vends over a statement period
+            models.Index(fields=['provider_account','created_at'], name='vas_txn_provider_created_idx'),
         ]
 
   
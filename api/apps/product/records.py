@@ -0,0 +1,88 @@
+"""
+Cache records for the product models read on the vend path.
+
+Each record keeps exactly the columns ``ProductApiView`` loads with
+``.only()`` and rebuilds the instances with ``Model.from_db``, so a cached
+product behaves like one fresh from the query: same loaded fields, same
+deferred ones, usable as a foreign key.
+"""
+from decimal import Decimal
+
+from django.db.models.base import DEFERRED
+
+from apps.product.models import DataPackage, DataPackageProvider, Product, ProductCategory
+from apps.provider.models import Provider, ProviderAccount
+from config.cache import Record
+
+
+_attnames = {}
+
+
+def _instance(model, **values):
+    """Instance with ``values`` loaded and every other concrete field deferred."""
+    attnames = _attnames.get(model)
+    if attnames is None:
+        attnames = _attnames[model] = [f.attname for f in model._meta.concrete_fields]
+    return model.from_db("default", attnames, [values.get(name, DEFERRED) for name in attnames])
+
+
+def _relate(instance, field_name, related):
+    # what select_related does: fill the relation cache, the *_id is already set
+    instance._meta.get_field(field_name).set_cached_value(instance, related)
+
+
+class ProductRecord(Record):
+    """Product + category code + preferred provider account and provider."""
+
+    version = 1
+
+    def fields(self, product):
+        account = product.preferred_provider_account
+        return [
+            product.id, product.product_code, product.description, product.is_active,
+            product.category.id, product.category.category_code,
+            account.id if account else None,
+            account.account_name if account else None,
+            account.vending_sim if account else None,
+            account.config if account else None,
+            account.provider.id if account else None,
+            account.provider.provider_code if account else None,
+        ]
+
+    def build(self, product_id, product_code, description, is_active, category_id, category_code,
+              account_id, account_name, vending_sim, config, provider_id, provider_code):
+        product = _instance(Product, id=product_id, product_code=product_code, description=description,
+                            is_active=is_active, category_id=category_id, preferred_provider_account_id=account_id)
+        _relate(product, "category", _instance(ProductCategory, id=category_id, category_code=category_code))
+        if account_id is not None:
+            account = _instance(ProviderAccount, id=account_id, provider_id=provider_id, account_name=account_name,
+                                vending_sim=vending_sim, config=config)
+            _relate(account, "provider", _instance(Provider, id=provider_id, provider_code=provider_code))
+            _relate(product, "preferred_provider_account", account)
+        return product
+
+
+class DataPackageRecord(Record):
+    """Data package + its active provider mappings (``active_mapping``)."""
+
+    version = 1
+
+    def fields(self, package):
+        return [
+            package.id, package.product_id, package.data_code, str(package.amount), package.description,
+            [[m.id, m.provider_id, m.provider_code] for m in package.active_mapping],
+        ]
+
+    def build(self, package_id, product_id, data_code, amount, description, mappings):
+        package = _instance(DataPackage, id=package_id, product_id=product_id, data_code=data_code,
+                            amount=Decimal(amount), description=description)
+        package.active_mapping = [
+            _instance(DataPackageProvider, id=mapping_id, datapackage_id=package_id, provider_id=provider_id,
+                      provider_code=provider_code)
+            for mapping_id, provider_id, provider_code in mappings
+        ]
+        return package
+
+
+PRODUCT_RECORD = ProductRecord()
+DATA_PACKAGE_RECORD = DataPackageRecord()
@@ -26,16 +26,3 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ['amount','description', 'beneficiary_account', 'product_code','merchant_ref','status','balance_after','is_reverse','created_at']
-
-
-class ValidateVendDataSerializer(serializers.Serializer):
-    product_code = serializers.CharField(max_length=100)
-    data_code = serializers.CharField(max_length=100)
-    phone_number = serializers.CharField(max_length=15)
-    merchant_ref = serializers.CharField(max_length=250)
-
-class ValidateVendVtuSerializer(serializers.Serializer):
-    product_code = serializers.CharField(max_length=100)
-    amount = serializers.IntegerField()
-    phone_number = serializers.CharField(max_length=15)
-    merchant_ref = serializers.CharField(max_length=250)
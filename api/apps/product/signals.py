@@ -0,0 +1,90 @@
+"""
+Product signal handlers.
+
+Keep the product caches coherent: whenever catalog data changes, the cache
+tags of everything built from it are invalidated once the write has
+committed (see apps.product.cache_utils). Lookups for the affected codes run
+here, on the admin write path, so the read path never has to.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.product import cache_utils
+from apps.product.models import DataPackage, DataPackageProvider, Product, ProductCategory
+from apps.provider.models import Provider, ProviderAccount
+
+logger = logging.getLogger(__name__)
+
+# written by balance syncs; nothing cached depends on them
+PROVIDER_ACCOUNT_BALANCE_FIELDS = {'available_balance', 'balance_at_provider', 'updated_at'}
+
+
+def _after_commit(func, *args):
+    transaction.on_commit(lambda: func(*args))
+
+
+def _product_code(product_id):
+    return Product.objects.filter(pk=product_id).values_list('product_code', flat=True).first()
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def category_changed(sender, instance, **kwargs):
+    # cached products carry their category code
+    codes = list(Product.objects.filter(category_id=instance.pk).values_list('product_code', flat=True))
+    _after_commit(cache_utils.invalidate_product_category_cache, *codes)
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    # entries cached under the code being renamed away from must go too
+    instance._stored_product_code = _product_code(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    codes = {instance.product_code, getattr(instance, '_stored_product_code', None)} - {None}
+    _after_commit(cache_utils.invalidate_product_cache, *sorted(codes))
+
+
+@receiver(post_save, sender=DataPackage)
+@receiver(post_delete, sender=DataPackage)
+def data_package_changed(sender, instance, **kwargs):
+    product_code = _product_code(instance.product_id)
+    if product_code is None:
+        # deleted along with its product, which invalidated already
+        return
+    _after_commit(cache_utils.invalidate_data_package_cache, product_code)
+
+
+@receiver(post_save, sender=DataPackageProvider)
+@receiver(post_delete, sender=DataPackageProvider)
+def data_package_provider_changed(sender, instance, **kwargs):
+    product_code = (
+        DataPackage.objects.filter(pk=instance.datapackage_id)
+        .values_list('product__product_code', flat=True)
+        .first()
+    )
+    if product_code is None:
+        return
+    provider_code = Provider.objects.filter(pk=instance.provider_id).values_list('provider_code', flat=True).first()
+    _after_commit(cache_utils.invalidate_data_package_cache, product_code, provider_code)
+
+
+@receiver(post_save, sender=ProviderAccount)
+@receiver(post_delete, sender=ProviderAccount)
+def provider_account_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= PROVIDER_ACCOUNT_BALANCE_FIELDS:
+        return
+    # products cache their provider account (credentials, vending sim)
+    codes = list(
+        Product.objects.filter(Q(preferred_provider_account_id=instance.pk) | Q(backup_provider_account_id=instance.pk))
+        .values_list('product_code', flat=True)
+    )
+    if codes:
+        _after_commit(cache_utils.invalidate_product_cache, *codes)
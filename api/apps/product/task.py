@@ -1,24 +1,37 @@
 from .models import DataPackage , Transaction, Product
 from apps.provider.models import Provider
 from apps.provider import ProviderServiceManager
+from apps.provider.throttle import Throttled, provider_slot
 from apps.merchant.models import Merchant
 from django.db import transaction as db_transaction
 import datetime
+import random
 from django.db.models import  F
 import logging
 from celery import shared_task
+from celery.exceptions import Retry
 from django.core.cache import cache 
 from celery.utils.log import get_task_logger
 from django.utils import timezone
 from datetime import timedelta
 from config.response_codes import SUCCESS, PENDING, FAILED, INVALID_MSISDN, RESPONSE_MESSAGES
-from config.helper import measure_response_time
-import time
 #logger = get_task_logger(__name__)
 
 logger = logging.getLogger(__name__)
 
 LOCK_EXPIRE = 60  # seconds
+# priority steps of the requery queue (0 most urgent, see CELERY_BROKER_TRANSPORT_OPTIONS):
+# a first requery goes ahead of retries piling up behind a failing provider
+REQUERY_PRIORITY = 3
+REQUERY_RETRY_PRIORITY = 6
+RETRY_BACKOFF_BASE = 20  # seconds, doubled per retry
+RETRY_BACKOFF_MAX = 300
+
+
+def _retry_countdown(retries):
+    delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** retries)
+    return delay * random.uniform(0.8, 1.2)
+
 #******************************************************#
 #======= Requery pending transactions from provider =====#
 #******************************************************#
@@ -31,8 +44,10 @@ def trigger_provider_requery_task(self, transaction_id: int):
         transaction_id: The ID of the transaction to requery
         
     Retries:
-        - Up to 3 times with 60 seconds delay between retries
+        - Up to 3 times, backing off exponentially (20s, 40s, 80s, jittered)
         - If still pending after retries, transaction remains in Processing status
+        - Calls are rate limited per provider account (apps.provider.throttle); a
+          throttled requery is put back on the queue without using up a retry
     """
     
     lock_id = f"requery-lock-{transaction_id}"
@@ -42,7 +57,6 @@ def trigger_provider_requery_task(self, transaction_id: int):
         logger.warning(f"Task already running for transaction {transaction_id}, skipping...")
         return
     
-    start_time = time.time()
     try:
         txn = Transaction.objects.select_related(
             'product__preferred_provider_account__provider',
@@ -63,11 +77,22 @@ def trigger_provider_requery_task(self, transaction_id: int):
         product_code = txn.product.product_code    
         # Requery the provider
         logger.info(f"Requerying transaction {transaction_id} with provider {provider_account.provider.provider_code}")
-        response = ProviderServiceManager.requery(
-            provider_account=provider_account,
-            merchant_ref=txn.merchant_ref,
-            product_code=product_code
-        )
+        try:
+            with provider_slot(provider_account):
+                response = ProviderServiceManager.requery(
+                    provider_account=provider_account,
+                    merchant_ref=txn.merchant_ref,
+                    product_code=product_code
+                )
+        except Throttled as e:
+            logger.info(f"Requery of transaction {transaction_id} deferred: {e}")
+            trigger_provider_requery_task.apply_async(
+                args=[transaction_id],
+                countdown=e.retry_after * random.uniform(1, 1.5),
+                retries=self.request.retries,
+                priority=REQUERY_RETRY_PRIORITY,
+            )
+            return
         
         response_code = response.get("responseCode")
         response_message = response.get("responseMessage", "")
@@ -89,7 +114,7 @@ def trigger_provider_requery_task(self, transaction_id: int):
                 # Still pending, retry if we have retries left
                 if self.request.retries < self.max_retries:
                     logger.info(f"Transaction {transaction_id} still pending, retrying... (attempt {self.request.retries + 1}/{self.max_retries})")
-                    raise self.retry(countdown=20)  # Retry after 60 seconds
+                    raise self.retry(countdown=_retry_countdown(self.request.retries), priority=REQUERY_RETRY_PRIORITY)
                 else:
                     # Max retries reached, keep as Processing
                     txn.provider_desc = f"{response_message} (Max retries reached)"
@@ -100,9 +125,9 @@ def trigger_provider_requery_task(self, transaction_id: int):
                 # Transaction failed or error occurred
                 # Refund merchant if not already reversed
                 if not txn.is_reverse:
-                    merchant = Merchant.objects.select_for_update().get(id=txn.merchant.id)
-                    merchant.credit_balance(txn.discount_amount)
-                    merchant.save()
+                    # credit_balance locks and updates the merchant row itself; saving a
+                    # copy loaded before it would write the old balance back
+                    txn.merchant.credit_balance(txn.discount_amount, transaction_id=txn.id)
                 
                 txn.status = "Failed"
                 txn.provider_desc = response_message
@@ -114,16 +139,21 @@ def trigger_provider_requery_task(self, transaction_id: int):
                     'reversed_at', 'updated_at'
                 ])
                 logger.info(f"Transaction {transaction_id} updated to Failed: {response_message}")
-            measure_response_time(start_time,"TRIGGER PROVIDER REQUERY TASK")
     except Transaction.DoesNotExist:
         logger.error(f"Transaction {transaction_id} not found")
+    except Retry:
+        # already scheduled by self.retry(); retrying it again would queue a duplicate
+        raise
     except Exception as e:
         logger.error(f"Error requerying transaction {transaction_id}: {str(e)}", exc_info=True)
         # Retry on exception if we have retries left
         if self.request.retries < self.max_retries:
-            raise self.retry(exc=e, countdown=20)
+            raise self.retry(exc=e, countdown=_retry_countdown(self.request.retries), priority=REQUERY_RETRY_PRIORITY)
         else:
             logger.error(f"Max retries reached for transaction {transaction_id}")
+    finally:
+        # the retry is already queued with a countdown; holding the lock would make it skip
+        cache.delete(lock_id)
             
             
 
@@ -156,9 +186,7 @@ def cron_reverse_timeout_unreversed_transaction(self):
                     logger.info(f"SKIPPED already handled {tx_locked.id}")
                     continue
 
-                merchant = Merchant.objects.select_for_update().get(id=tx_locked.merchant.id)
-                merchant.credit_balance(tx_locked.discount_amount or 0)
-                merchant.save()
+                merchant = tx_locked.merchant.credit_balance(tx_locked.discount_amount or 0, transaction_id=tx_locked.id)
 
                 logger.info(f"CRON MERCHANT SAVED:: {merchant.id} :: BALANCE={merchant.current_balance}")
 
@@ -10,6 +10,8 @@ urlpatterns = [
     path('vendAirtime', ProductApiView.as_view({'post':'vend_vtu'}),name="vendAirtime"),
     path('vendData', ProductApiView.as_view({'post':'vend_data'}),name="vendData"),
     path('requeryTransaction', ProductApiView.as_view({'post':'get_transaction_by_client_ref'}),name="requeryTransaction"),
+    path('getTransactionHistory', ProductApiView.as_view({'get':'get_transaction_history'}),name="getTransactionHistory"),
+    path('exportTransactions', ProductApiView.as_view({'get':'export_transactions'}),name="exportTransactions"),
 
     #==================== CRON JOB =========================
     path('cronReverseTimeoutUnreversedTransaction', ProductApiView.as_view({'get':'cron_reverse_timeout_unreversed_transaction'}),name="cronReverseTimeoutUnreversedTransaction"),
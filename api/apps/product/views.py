@@ -1,14 +1,25 @@
-from django.db import IntegrityError
-from apps.product.serializers import DataPackageSerializer, TransactionSerializer, ValidateVendDataSerializer, ValidateVendVtuSerializer, ProductCategorySerializer, ProductSerializer
+from django.db import IntegrityError, connections
+from apps.product.serializers import DataPackageSerializer, TransactionSerializer, ProductCategorySerializer, ProductSerializer
+from apps.product import catalog
+from apps.product.cache_utils import CATALOG_TAG, CATEGORIES_TAG, PRODUCTS_TAG, product_tag, provider_tag
+from apps.product.records import DATA_PACKAGE_RECORD, PRODUCT_RECORD
+from apps.product.commands import InvalidCommand, VendAirtimeCommand, VendDataCommand, decode_command
 from apps.product.models import DataPackage , Transaction, ProductCategory, Product, DataPackageProvider
 from apps.merchant.models import Merchant
+from apps.ledger.postings import DEBIT, post as post_ledger
 from rest_framework import viewsets
 from django.db import transaction as db_transaction
 from apps.provider import ProviderServiceManager
-from apps.product.task import trigger_provider_requery_task
+from apps.product.task import REQUERY_PRIORITY, trigger_provider_requery_task
+from apps.product.exports import EXPORT_FIELDS, EXPORT_CONTENT_TYPES, EXPORT_CHUNK_SIZE, stream_csv, stream_ndjson, start_of_day
 from django.db.models import Case, When, CharField, Value, Max, F, FloatField
 from django.utils import timezone   
-from config.helper import CustomAuthentication, JsonResponse, format_msisdn, measure_response_time
+from django.http import StreamingHttpResponse
+from config.helper import CustomAuthentication, JsonResponse, format_msisdn
+from config.cache import get_or_compute
+from config.db_router import pin_primary, reads, replica_alias
+from config.metrics import StageTimer
+from config.pagination import InvalidCursor, decode_cursor, keyset_page, keyset_rows, parse_page_size, seek
 from config.response_codes import (
     SUCCESS, INVALID_PAYLOAD, NO_DATA_FOUND, EXCEPTION_ERROR,
     DAILY_LIMIT_EXCEEDED, PROCESSING_ERROR, INVALID_MSISDN, PENDING,
@@ -17,18 +28,17 @@ from config.response_codes import (
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.core.cache import cache
 import logging
-import re
 from django.db.models import Prefetch
 from decimal import Decimal
-import time
+from datetime import timedelta
 logger = logging.getLogger(__name__)
 
-# Cache TTL constants (in seconds)
-CACHE_TTL_PRODUCT = 3600  # 1 hour - products rarely change
-CACHE_TTL_PRODUCT_CATEGORY = 7200  # 2 hours - categories rarely change
-CACHE_TTL_DATA_PACKAGE = 3600  # 1 hour - data packages rarely change
+# Cache TTL constants (in seconds); model signals invalidate by tag (see cache_utils)
+CACHE_TTL_PRODUCT = 86400  # 24 hours
+CACHE_TTL_PRODUCT_CATEGORY = 86400  # 24 hours
+CACHE_TTL_DATA_PACKAGE = 86400  # 24 hours
 CACHE_TTL_MERCHANT_DISCOUNT = 300  # 5 minutes - discounts can change more frequently
-CACHE_TTL_PRODUCT_LIST = 1800  # 30 minutes - product lists
+CACHE_TTL_PRODUCT_LIST = 86400  # 24 hours
 # Create your views here.
 
 
@@ -40,25 +50,15 @@ class ProductApiView(viewsets.ViewSet):
     #======= get product categories =======================#
     #******************************************************#
     def get_product_cats(self, request):
-        start_time = time.time()
         try:
-            cache_key = "product_categories_active"
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is not None:
-                return JsonResponse(data=cached_data)
-            
-            queryset = ProductCategory.objects.filter(is_active=True)
-            serializer = ProductCategorySerializer(queryset, many=True)
-            data = serializer.data
-            
-            # Cache for 2 hours
-            cache.set(cache_key, data, CACHE_TTL_PRODUCT_CATEGORY)
-            measure_response_time(start_time,"GET PRODUCT CATS")
-            return JsonResponse(data=data)
+            def build():
+                queryset = ProductCategory.objects.filter(is_active=True)
+                return ProductCategorySerializer(queryset, many=True).data
+
+            return catalog.respond(request, "product_categories", "active", build, CACHE_TTL_PRODUCT_CATEGORY,
+                                   tags=(CATALOG_TAG, CATEGORIES_TAG))
         except Exception as e:
             logger.error(f"GET PRODUCT CAT  FAILED:: REASON ={e}")
-            measure_response_time(start_time,"GET PRODUCT CATS")
             return JsonResponse(code=PROCESSING_ERROR, msg="Unable to retrieve categories, please try again")
 
     
@@ -66,32 +66,21 @@ class ProductApiView(viewsets.ViewSet):
     #======= get products ================================#
     #******************************************************#
     def get_products(self, request):
-        start_time = time.time()
         try:
             category_code = request.query_params.get("category_code")
             if not category_code:
                 return JsonResponse(code=INVALID_PAYLOAD, msg="category_code is required")   
             
-            cache_key = f"products_category_{category_code}"
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is not None:
-                return JsonResponse(data=cached_data)
-            
-            queryset = Product.objects.filter(category__category_code=category_code, is_active=True)
-            if len(queryset) == 0:
-                return JsonResponse(code=NO_DATA_FOUND, msg="No products found")
-            
-            serializer = ProductSerializer(queryset, many=True)
-            data = serializer.data
-            
-            # Cache for 30 minutes
-            cache.set(cache_key, data, CACHE_TTL_PRODUCT_LIST)
-            measure_response_time(start_time,"GET PRODUCTS")
-            return JsonResponse(data=data)
+            def build():
+                queryset = Product.objects.filter(category__category_code=category_code, is_active=True)
+                if len(queryset) == 0:
+                    return JsonResponse(code=NO_DATA_FOUND, msg="No products found")
+                return ProductSerializer(queryset, many=True).data
+
+            return catalog.respond(request, "products", category_code, build, CACHE_TTL_PRODUCT_LIST,
+                                   tags=(CATALOG_TAG, PRODUCTS_TAG))
         except Exception as e:
             logger.error(f"GET PRODUCTS  FAILED:: REASON ={e}")
-            measure_response_time(start_time,"GET PRODUCTS")
             return JsonResponse(code=PROCESSING_ERROR, msg="Unable to retrieve products, please try again")
     
     
@@ -99,49 +88,31 @@ class ProductApiView(viewsets.ViewSet):
     #==================== GET LIST OF DATA BUNDLE =========#
     #******************************************************#
     def get_data_bundle(self, request):
-        start_time = time.time()
         try:
             product_code = request.query_params.get("product_code")
             if not product_code:
                 return JsonResponse(code=INVALID_PAYLOAD, msg="product_code is required")  
             
-            product = Product.objects.select_related('preferred_provider_account__provider').get(product_code=product_code,is_active=True)
+            product = self._active_product(product_code)
             if product is None:
                 return JsonResponse(code=NO_DATA_FOUND, msg="Invalid product code or product not active")
-           
-            measure_response_time(start_time,"GET DATA PRODUCT")
             provider = product.preferred_provider_account.provider
-            
-            cache_key = f"data_bundles_{product_code}_{provider.provider_code}"
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is not None:
-                measure_response_time(start_time,"GET DATA BUNDLE-CACHED")
-                return JsonResponse(code=SUCCESS, data=cached_data)
-            
-            bundles = DataPackage.objects.filter(
-                product=product,
-                is_active=True,
-                data_packages_provider__provider_id=provider.id,
-                data_packages_provider__is_active=True,
-            ).select_related('product')
-           
-            #bundles = DataPackage.objects.select_related('product').filter(
-            #    product__product_code=product_code, is_active=True
-            #)
-            if len(bundles) == 0:
-                return JsonResponse(code=NO_DATA_FOUND, msg="No data bundle found")
-            
-            serializer = DataPackageSerializer(bundles, many=True)
-            data = serializer.data
-            
-            # Cache for 1 hour
-            cache.set(cache_key, data, CACHE_TTL_DATA_PACKAGE)
-            measure_response_time(start_time,"GET DATA BUNDLE")
-            return JsonResponse(code=SUCCESS, data=data)
+
+            def build():
+                bundles = DataPackage.objects.filter(
+                    product_id=product.id,
+                    is_active=True,
+                    data_packages_provider__provider_id=provider.id,
+                    data_packages_provider__is_active=True,
+                ).select_related('product')
+                if len(bundles) == 0:
+                    return JsonResponse(code=NO_DATA_FOUND, msg="No data bundle found")
+                return DataPackageSerializer(bundles, many=True).data
+
+            return catalog.respond(request, "data_bundles", f"{product_code}_{provider.provider_code}", build, CACHE_TTL_DATA_PACKAGE,
+                                   tags=(CATALOG_TAG, product_tag(product_code), provider_tag(provider.provider_code)))
         except Exception as e:
             logger.error(f"FAILE GETTING BUNDLES AS::={e}")
-            measure_response_time(start_time,"GET DATA BUNDLE")
             return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid payload")
 
 
@@ -150,27 +121,17 @@ class ProductApiView(viewsets.ViewSet):
     #=============== VEND VTU =============================#
     #******************************************************#
     def vend_vtu(self, request):
-        start_time = time.time()
+        stages = StageTimer()
         try:
-            # Validate request
-            validation_result = self._validate_vend_request(request, ValidateVendVtuSerializer)
-            if validation_result:
-                return validation_result
-            
-            # Extract data
-            product_code = request.data.get("product_code")
-            phone_number = format_msisdn(request.data.get("phone_number"))
-            merchant_ref = request.data.get("merchant_ref")
-            amount = Decimal(request.data.get("amount"))
-            
-            # Validate merchant_ref
-            validation_result = self._validate_merchant_ref(merchant_ref)
-            if validation_result:
-                return validation_result
+            # Decode and validate request (MSISDN normalized, amount bounded, merchant_ref checked)
+            command = self._decode_vend_command(request, VendAirtimeCommand)
+            if isinstance(command, JsonResponse):
+                return command
             
-            # Validate amount
-            if amount <= 0:
-                return JsonResponse(code=INVALID_PAYLOAD, msg="Amount must be greater than 0")
+            product_code = command.product_code
+            phone_number = command.phone_number
+            merchant_ref = command.merchant_ref
+            amount = command.decimal_amount
             
             # Validate product
             product_result = self._validate_product(product_code, "AIRTIME")
@@ -199,6 +160,7 @@ class ProductApiView(viewsets.ViewSet):
             if validation_result:
                 return validation_result
             
+            stages.mark("preflight")
             # Debit and create transaction
             txn_result = self._debit_and_create_transaction(
                 merchant, 
@@ -214,10 +176,9 @@ class ProductApiView(viewsets.ViewSet):
                 return txn_result
             txn = txn_result
             
-            measure_response_time(start_time,f"VEND::VTU::BEFORE::{provider_account.account_name}::PROVIDER::CALL::TIME")
-            start_time_provider = time.time()
+            stages.mark("debit")
             # Send for vending
-            logger.info(f"{product_code} VEND VTU REQUEST:: MSISDN={phone_number}, AMOUNT={amount}, PRODUCTCODE={product_code}")
+            logger.info("%s VEND VTU REQUEST:: MSISDN=%s, AMOUNT=%s, PRODUCTCODE=%s", product_code, phone_number, amount, product_code)
             response = ProviderServiceManager.vend(
                 provider_account, 
                 merchant_ref, 
@@ -225,10 +186,12 @@ class ProductApiView(viewsets.ViewSet):
                 amount, 
                 product_code
             )
-            measure_response_time(start_time_provider,f"{provider_account.account_name} PROVIDER::VEND::VTU::RESPONSE::TIME")
+            stages.mark("provider_call")
             
             # Handle response
-            return self._handle_provider_response(response, txn, merchant)
+            result = self._handle_provider_response(response, txn, merchant)
+            stages.mark("finalize")
+            return result
             
         except Exception as e:
             logger.error(f"VEND VTU FAILED:: REASON={e}", exc_info=True)
@@ -242,23 +205,17 @@ class ProductApiView(viewsets.ViewSet):
     #=================== VEND DATA ========================#
     #******************************************************#
     def vend_data(self, request):
-        start_time = time.time()    
+        stages = StageTimer()
         try:
-            # Validate request
-            validation_result = self._validate_vend_request(request, ValidateVendDataSerializer)
-            if validation_result:
-                return validation_result
+            # Decode and validate request (MSISDN normalized, merchant_ref checked)
+            command = self._decode_vend_command(request, VendDataCommand)
+            if isinstance(command, JsonResponse):
+                return command
             
-            # Extract data
-            product_code = request.data.get("product_code")
-            phone_number = format_msisdn(request.data.get("phone_number"))
-            merchant_ref = request.data.get("merchant_ref")
-            data_code = request.data.get("data_code")
-            
-            # Validate merchant_ref
-            validation_result = self._validate_merchant_ref(merchant_ref)
-            if validation_result:
-                return validation_result
+            product_code = command.product_code
+            phone_number = command.phone_number
+            merchant_ref = command.merchant_ref
+            data_code = command.data_code
             
             # Validate product
             product_result = self._validate_product(product_code, "DATA")
@@ -276,11 +233,10 @@ class ProductApiView(viewsets.ViewSet):
             
             # Check data bundle (with caching)
             cache_key = f"data_package_{product.product_code}_{data_code}_{provider_code}"
-            databundle = cache.get(cache_key)
             
-            if not databundle:
+            def load_databundle():
                 try:
-                    databundle = DataPackage.objects.prefetch_related(
+                    return DataPackage.objects.prefetch_related(
                         Prefetch(
                             "data_packages_provider",
                             queryset=DataPackageProvider.objects.filter(
@@ -296,10 +252,14 @@ class ProductApiView(viewsets.ViewSet):
                         data_packages_provider__provider_id=provider.id,
                         data_packages_provider__is_active=True,
                     )
-                    # Cache for 1 hour
-                    #cache.set(cache_key, databundle, CACHE_TTL_DATA_PACKAGE)
                 except DataPackage.DoesNotExist:
-                    return JsonResponse(code=NO_DATA_FOUND, msg="No data bundle found")
+                    return None
+            
+            databundle = get_or_compute(cache_key, load_databundle, CACHE_TTL_DATA_PACKAGE, "data_package",
+                                        tags=(CATALOG_TAG, product_tag(product.product_code), provider_tag(provider_code)),
+                                        record=DATA_PACKAGE_RECORD)
+            if databundle is None:
+                return JsonResponse(code=NO_DATA_FOUND, msg="No data bundle found")
             
             data_code = databundle.active_mapping[0].provider_code
             bundle_amount = Decimal(databundle.amount)
@@ -320,6 +280,7 @@ class ProductApiView(viewsets.ViewSet):
             
            
                 
+            stages.mark("preflight")
             # Debit and create transaction
             txn_result = self._debit_and_create_transaction(
                 merchant, 
@@ -337,12 +298,11 @@ class ProductApiView(viewsets.ViewSet):
             
             # Send for vending
             logger.info(
-                f"VEND DATA REQUEST:: MSISDN={phone_number}, AMOUNT={bundle_amount}, "
-                f"PRODUCTCODE={product_code}, DATACODE={databundle.data_code}, PROVIDER={provider_code}"
+                "VEND DATA REQUEST:: MSISDN=%s, AMOUNT=%s, PRODUCTCODE=%s, DATACODE=%s, PROVIDER=%s",
+                phone_number, bundle_amount, product_code, databundle.data_code, provider_code,
             )
 
-            measure_response_time(start_time,f"VEND::DATA::BEFORE::{provider_account.account_name}::PROVIDER::CALL::TIME")
-            start_time_provider = time.time()
+            stages.mark("debit")
             response = ProviderServiceManager.vend(
                 provider_account, 
                 merchant_ref, 
@@ -351,10 +311,12 @@ class ProductApiView(viewsets.ViewSet):
                 product_code, 
                 data_code
             )
-            measure_response_time(start_time_provider,f"{provider_account.account_name} PROVIDER::VEND::DATA::RESPONSE::TIME")
+            stages.mark("provider_call")
 
             # Handle response
-            return self._handle_provider_response(response, txn, merchant)
+            result = self._handle_provider_response(response, txn, merchant)
+            stages.mark("finalize")
+            return result
             
         except Exception as e:
             logger.error(f"VEND DATA FAILED:: REASON={e}", exc_info=True)
@@ -367,58 +329,45 @@ class ProductApiView(viewsets.ViewSet):
     #========= Common Helper Methods for Vending ==========#
     #******************************************************#
     
-    def _validate_vend_request(self, request, serializer_class):
-        """Validate vend request payload"""
-        serializer = serializer_class(data=request.data)
-        if not serializer.is_valid():
-            return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid request payload", data=serializer.errors, status=400)
-        return None
-    
-    def _validate_merchant_ref(self, merchant_ref):
-        """Validate merchant_ref is alphanumeric with hyphens only"""
-        if not merchant_ref:
-            return JsonResponse(code=INVALID_PAYLOAD, msg="merchant_ref is required", status=400)
-        
-        # Allow alphanumeric characters and hyphens only
-        if not re.match(r'^[a-zA-Z0-9-]+$', merchant_ref):
-            return JsonResponse(code=INVALID_PAYLOAD, msg="merchant_ref must contain only alphanumeric characters and hyphens", status=400)
-        return None
+    def _decode_vend_command(self, request, command_type):
+        """Decode the vend payload into a typed command, or the 400 response"""
+        try:
+            return decode_command(request, command_type)
+        except InvalidCommand as e:
+            return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid request payload", data=e.errors, status=400)
     
     
-    def _validate_product(self, product_code, expected_category):
-        """Validate product exists, is active, and matches expected category"""
-        cache_key = f"product_{product_code}"
-        cached_product = cache.get(cache_key)
-        
-        if 1==2:#cached_product:
-            # Handle both tuple (old cache format) and product object (new format)
-            if isinstance(cached_product, tuple):
-                product, product_category_code = cached_product
-            else:
-                product = cached_product
-                product_category_code = product.category.category_code
-        else:
-            product = Product.objects.filter(
+    def _active_product(self, product_code):
+        """Active product with its category and preferred provider, from the cache"""
+        def load_product():
+            return Product.objects.filter(
                 product_code=product_code,
                 is_active=True
             ).select_related(
                 "category", 
                 "preferred_provider_account__provider"
             ).only(
-                "id", "description", "is_active", 
+                "id", "product_code", "description", "is_active", 
                 "category__category_code",
                 "preferred_provider_account__id",
+                # read by BaseProvider; deferring them costs a query each per vend
+                "preferred_provider_account__account_name",
+                "preferred_provider_account__vending_sim",
+                "preferred_provider_account__config",
                 "preferred_provider_account__provider__id",
                 "preferred_provider_account__provider__provider_code"
             ).first()
-            
-            if not product:
-                return JsonResponse(code=INVALID_PAYLOAD, msg=f"Product {product_code} is not active")
-            
-            product_category_code = product.category.category_code
-            # Cache product data for 1 hour (store only product object)
-            cache.set(cache_key, product, CACHE_TTL_PRODUCT)
         
+        return get_or_compute(f"product_{product_code}", load_product, CACHE_TTL_PRODUCT, "product",
+                              tags=(CATALOG_TAG, product_tag(product_code)), record=PRODUCT_RECORD)
+
+    def _validate_product(self, product_code, expected_category):
+        """Validate product exists, is active, and matches expected category"""
+        product = self._active_product(product_code)
+        if not product:
+            return JsonResponse(code=INVALID_PAYLOAD, msg=f"Product {product_code} is not active")
+        
+        product_category_code = product.category.category_code
         logger.info(f"REQUEST PRODUCT CATEGORY:: {product_category_code}")
         
         if product_category_code != expected_category:
@@ -471,9 +420,8 @@ class ProductApiView(viewsets.ViewSet):
             #cache.set(cache_key, merchant, CACHE_TTL_MERCHANT_DISCOUNT)
         
         logger.info(
-            f"REQUEST PRODUCT {product_code}:: "
-            f"DISCOUNT_TYPE={merchant._discount_type}, "
-            f"DISCOUNT_VALUE={merchant._discount_value} ::MERCHANT {merchant}"
+            "REQUEST PRODUCT %s:: DISCOUNT_TYPE=%s, DISCOUNT_VALUE=%s ::MERCHANT %s",
+            product_code, merchant._discount_type, merchant._discount_value, merchant.id,
         )
         
         return merchant
@@ -505,12 +453,11 @@ class ProductApiView(viewsets.ViewSet):
         
         # If transaction limit was reset (new day), invalidate merchant discount cache
         if old_tranx_date != merchant.today_tranx_date:
-            logger.info(f"Transaction limit reset for merchant {merchant.id}, cache will refresh on next request")
+            logger.info("Transaction limit reset for merchant %s, cache will refresh on next request", merchant.id)
         
         logger.info(
-            f"Transaction limit updated for merchant {merchant.id}: "
-            f"count={merchant.today_tranx_count}/{merchant.daily_tranx_limit}, "
-            f"date={merchant.today_tranx_date}"
+            "Transaction limit updated for merchant %s: count=%s/%s, date=%s",
+            merchant.id, merchant.today_tranx_count, merchant.daily_tranx_limit, merchant.today_tranx_date,
         )
         
         return merchant
@@ -559,6 +506,10 @@ class ProductApiView(viewsets.ViewSet):
                     merchant=merchant,
                     provider_account=provider_account
                 )
+                post_ledger(DEBIT, merchant.id, discounted_amount, transaction_id=txn.id,
+                            created_at=merchant_obj.last_updated_balance_at)
+                # the merchant will poll for this transaction right away
+                db_transaction.on_commit(lambda: pin_primary(merchant.id))
                 return txn
         except ValueError as e:
             logger.error(f"FAILED TO DEBIT MERCHANT BALANCE:: REASON={e}")
@@ -591,9 +542,9 @@ class ProductApiView(viewsets.ViewSet):
                 status_message = RESPONSE_MESSAGES[PENDING]
                 txn.status = "Processing"
                 # Trigger requery task in background after 30 seconds
-                trigger_provider_requery_task.apply_async(args=[txn.id], countdown=30)
+                trigger_provider_requery_task.apply_async(args=[txn.id], countdown=30, priority=REQUERY_PRIORITY)
             else:
-                merchant.credit_balance(txn.discount_amount)
+                merchant.credit_balance(txn.discount_amount, transaction_id=txn.id)
                 txn.status = "Failed"
                 txn.is_reverse = True
                 txn.reversed_at = timezone.now()
@@ -616,13 +567,14 @@ class ProductApiView(viewsets.ViewSet):
     #******************************************************#
     def get_transaction_by_client_ref(self, request):
         try:
-            merchant = request.user.merchant
+            merchant_id = request.auth.merchant_id
             merchant_ref = request.data.get("merchant_ref")
             if not merchant_ref:
                 return JsonResponse(code=INVALID_PAYLOAD, msg="merchant_ref is required")
-            tranx = Transaction.objects.select_related('product').filter(
-                merchant_ref=merchant_ref, merchant_id=merchant.id
-            ).first()
+            with reads(merchant_id):
+                tranx = Transaction.objects.select_related('product').filter(
+                    merchant_ref=merchant_ref, merchant_id=merchant_id
+                ).first()
             if not tranx:
                 return JsonResponse(code=NO_DATA_FOUND, msg="No record found")
             serializer = TransactionSerializer(tranx)
@@ -632,6 +584,100 @@ class ProductApiView(viewsets.ViewSet):
             return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid payload")
 
 
+    #******************************************************#
+    #======= transaction history (keyset paginated) =======#
+    #******************************************************#
+    def get_transaction_history(self, request):
+        try:
+            queryset = self._filter_merchant_transactions(request)
+            if isinstance(queryset, JsonResponse):
+                return queryset
+
+            cursor = request.query_params.get("cursor")
+            try:
+                cursor = decode_cursor(cursor) if cursor else None
+            except InvalidCursor:
+                return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid cursor", status=400)
+
+            page_size = parse_page_size(request.query_params.get("page_size"))
+            with reads(request.auth.merchant_id):
+                rows, next_cursor = keyset_page(queryset.select_related('product'), cursor, page_size)
+            if not rows and cursor is None:
+                return JsonResponse(code=NO_DATA_FOUND, msg="No record found")
+
+            serializer = TransactionSerializer(rows, many=True)
+            return JsonResponse(code=SUCCESS, data=serializer.data, nextCursor=next_cursor)
+        except Exception as e:
+            logger.error(f"FAILED GETTING TRANSACTION HISTORY AS:: {str(e)}")
+            return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid payload")
+
+
+    #******************************************************#
+    #======= transaction export (streamed CSV/NDJSON) =====#
+    #******************************************************#
+    def export_transactions(self, request):
+        try:
+            export_format = (request.query_params.get("format") or "csv").lower()
+            if export_format not in EXPORT_CONTENT_TYPES:
+                return JsonResponse(code=INVALID_PAYLOAD, msg="format must be csv or ndjson", status=400)
+
+            queryset = self._filter_merchant_transactions(request)
+            if isinstance(queryset, JsonResponse):
+                return queryset
+            # rows are read after the view returns, so pin the database on the queryset
+            queryset = queryset.using(replica_alias(request.auth.merchant_id))
+
+            # values_list + iterator() streams rows through a server-side cursor,
+            # so memory stays flat however wide the requested date range is;
+            # without them (pgbouncer) the rows are fetched in keyset batches
+            if connections[queryset.db].settings_dict.get("DISABLE_SERVER_SIDE_CURSORS"):
+                rows = keyset_rows(queryset, EXPORT_FIELDS, EXPORT_CHUNK_SIZE)
+            else:
+                rows = seek(queryset, None).values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            response = StreamingHttpResponse(
+                stream_csv(rows) if export_format == "csv" else stream_ndjson(rows),
+                content_type=EXPORT_CONTENT_TYPES[export_format],
+            )
+            filename = f"transactions-{timezone.now():%Y%m%d%H%M%S}.{export_format}"
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+        except Exception as e:
+            logger.error(f"FAILED EXPORTING TRANSACTIONS AS:: {str(e)}")
+            return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid payload")
+
+
+    def _filter_merchant_transactions(self, request):
+        """Build the merchant scoped transaction queryset from query params"""
+        params = request.query_params
+        queryset = Transaction.objects.filter(merchant_id=request.auth.merchant_id)
+
+        status = params.get("status")
+        if status:
+            if status not in dict(Transaction._STATUS):
+                return JsonResponse(code=INVALID_PAYLOAD, msg="Invalid status", status=400)
+            queryset = queryset.filter(status=status)
+
+        product_code = params.get("product_code")
+        if product_code:
+            queryset = queryset.filter(product__product_code=product_code)
+
+        beneficiary = params.get("beneficiary")
+        if beneficiary:
+            queryset = queryset.filter(beneficiary_account=format_msisdn(beneficiary))
+
+        try:
+            start_date = params.get("start_date")
+            if start_date:
+                queryset = queryset.filter(created_at__gte=start_of_day(start_date))
+            end_date = params.get("end_date")
+            if end_date:
+                queryset = queryset.filter(created_at__lt=start_of_day(end_date) + timedelta(days=1))
+        except ValueError:
+            return JsonResponse(code=INVALID_PAYLOAD, msg="Dates must be in YYYY-MM-DD format", status=400)
+
+        return queryset
+
+
 
 
 
@@ -646,10 +692,10 @@ class ProductApiView(viewsets.ViewSet):
             try:
                 with db_transaction.atomic():
                     if not tx.is_reverse:
-                        merchant = Merchant.objects.select_for_update().get(id=tx.merchant.id)
-                        merchant.credit_balance(tx.discount_amount or 0)
-                        merchant.save()
-                        logger.info(f"CRON MERCHANT SAVED:: {merchant.id} :: BALANCE={merchant.current_balance} :: PREV BAL={merchant.previous_balance} :: DISCOUNT={tx.discount_amount} :: REF={tx.tranx_ref}")
+                        # credit_balance locks and updates the row itself; saving a copy loaded
+                        # before it would write the old balance back
+                        merchant = tx.merchant.credit_balance(tx.discount_amount or 0, transaction_id=tx.id)
+                        logger.info(f"CRON MERCHANT SAVED:: {merchant.id} :: BALANCE={merchant.current_balance} :: PREV BAL={merchant.balance_before} :: DISCOUNT={tx.discount_amount} :: REF={tx.merchant_ref}")
                     tx.status = "Failed"
                     tx.provider_desc = "Transaction timed out"
                     tx.is_reverse = True
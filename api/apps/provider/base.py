@@ -2,7 +2,12 @@ import abc
 import logging
 import random
 import base64
+from urllib.parse import urlsplit, urlunsplit
+
 import requests
+from django.conf import settings
+
+from config.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +22,8 @@ class BaseProvider(abc.ABC):
         self.vend_sim = provider_account.vending_sim or ''
         self.timeout = 10 #self.config.get('timeout', 10)
         self.verify_ssl = self.config.get('verify_ssl', False)
+        # full request/response bodies are only logged when switched on for the account
+        self.log_raw_payloads = bool(self.config.get('log_raw_payloads', False))
         self.session = requests.Session()
 
     def generate_sequence(self):
@@ -32,45 +39,75 @@ class BaseProvider(abc.ABC):
         """Get a value from config with optional default."""
         return self.config.get(key, default)
 
+    def provider_url(self, default_url):
+        """
+        The provider endpoint, re-pointed at another host when configured:
+        ``base_url`` in the account config, else PROVIDER_BASE_URL_OVERRIDES
+        (by provider code). Path and query of ``default_url`` are kept, so a
+        simulator only has to serve the real paths.
+        """
+        base = self.config.get('base_url') or settings.PROVIDER_BASE_URL_OVERRIDES.get(self.account.provider.provider_code)
+        if not base:
+            return default_url
+        default, override = urlsplit(default_url), urlsplit(base)
+        return urlunsplit((override.scheme, override.netloc, override.path.rstrip('/') + default.path, default.query, default.fragment))
+
+    def log_raw(self, msg, *args):
+        """Log a raw provider payload, only if ``log_raw_payloads`` is set in the account config."""
+        if self.log_raw_payloads:
+            logger.info(msg, *args)
+
+    def _http_span(self, url, method):
+        """Client span around one provider HTTP call (recorded only inside a trace)."""
+        return start_span("provider.http", kind="client", root=False, attributes={
+            "http.url": url.split("?", 1)[0], "http.method": method.upper(), "provider.account": self.account.account_name,
+        })
+
     def _send_json(self, url: str, payload: dict = None, method: str = "POST", headers: dict = None, log_prefix: str = "PROVIDER"):
         """Send JSON request. Returns parsed JSON or error dict."""
         try:
-            logger.info(f"RAW {log_prefix} REQUEST PAYLOAD:::{payload} :::: URL::{url} :::: HEADERS::{headers}")
-
-            if method.upper() == "GET":
-                resp = self.session.get(url, headers=headers, verify=True, timeout=self.timeout)
-            else:
-                resp = self.session.post(url, json=payload, headers=headers, verify=True, timeout=self.timeout)
+            self.log_raw("RAW %s REQUEST PAYLOAD:::%s :::: URL::%s :::: HEADERS::%s", log_prefix, payload, url, headers)
+
+            with self._http_span(url, method) as span:
+                if method.upper() == "GET":
+                    resp = self.session.get(url, headers=headers, verify=True, timeout=self.timeout)
+                else:
+                    resp = self.session.post(url, json=payload, headers=headers, verify=True, timeout=self.timeout)
+                span.set_attribute("http.status_code", resp.status_code)
             
-            logger.info(f"RAW {log_prefix} RESPONSE:::{resp.text}")
+            logger.info("%s RESPONSE:: URL=%s HTTP STATUS=%s BYTES=%s", log_prefix, url, resp.status_code, len(resp.content))
+            self.log_raw("RAW %s RESPONSE:::%s", log_prefix, resp.text)
             return resp.json()
 
         except requests.Timeout:
-            logger.error(f"FAILED {log_prefix} REQUEST TIMEOUT")
+            logger.error("FAILED %s REQUEST TIMEOUT", log_prefix)
             return {"status_code": "80", "message": f"Request timeout after {self.timeout} seconds"}
 
         except Exception as e:
-            logger.exception(f"FAILED {log_prefix} REQUEST:, REASON::{e}")
+            logger.exception("FAILED %s REQUEST:, REASON::%s", log_prefix, e)
             return {"status_code": "90", "message": str(e)}
 
     def _send_xml(self, url: str, payload: str, headers: dict = None, log_prefix: str = "PROVIDER"):
         """Send XML request. Returns full parsed XML dict or None on error."""
         try:
-            logger.info(f"RAW {log_prefix} REQUEST PAYLOAD:::{payload} :::: URL::{url}")
+            self.log_raw("RAW %s REQUEST PAYLOAD:::%s :::: URL::%s", log_prefix, payload, url)
 
-            resp = self.session.post(url, data=payload, headers=headers, verify=self.verify_ssl, timeout=self.timeout)
-            logger.info(f"RAW {log_prefix} RESPONSE:::{resp.content} :::: HEADERS::{headers}")
+            with self._http_span(url, "POST") as span:
+                resp = self.session.post(url, data=payload, headers=headers, verify=self.verify_ssl, timeout=self.timeout)
+                span.set_attribute("http.status_code", resp.status_code)
+            logger.info("%s RESPONSE:: URL=%s HTTP STATUS=%s BYTES=%s", log_prefix, url, resp.status_code, len(resp.content))
+            self.log_raw("RAW %s RESPONSE:::%s :::: HEADERS::%s", log_prefix, resp.content, headers)
             
             import xmltodict
             parsed = xmltodict.parse(resp.content)
             return parsed
 
         except requests.Timeout:
-            logger.error(f"FAILED {log_prefix} REQUEST TIMEOUT")
+            logger.error("FAILED %s REQUEST TIMEOUT", log_prefix)
             return None
 
         except Exception as e:
-            logger.exception(f"FAILED {log_prefix} REQUEST:, REASON::{e}")
+            logger.exception("FAILED %s REQUEST:, REASON::%s", log_prefix, e)
             return None
 
     @abc.abstractmethod
@@ -4,6 +4,7 @@ Provider Service Manager
 Simple manager that maps provider codes and product codes to their respective services.
 """
 import logging
+import time
 
 from apps.provider.services import (
     MTNNProviderService,
@@ -14,6 +15,9 @@ from apps.provider.services import (
     CreditswitchProviderService,
 )
 
+from config.metrics import observe_provider_call
+from config.tracing import start_span
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,7 +56,12 @@ class ProviderServiceManager:
                 return {"responseCode": "99", "responseMessage": "Provider code doesn't match", "provider_ref": None, "provider_avail_bal": "0"}
             
             service = service(provider_account, merchant_ref=merchant_ref, receiver_phone=receiver_phone, amount=amount, product_code=product_code, data_code=data_code)
-            return service.send_request()
+            with start_span("provider.vend", attributes={"provider.account": provider_account.account_name, "merchant_ref": merchant_ref}) as span:
+                started = time.perf_counter()
+                response = service.send_request()
+                observe_provider_call(provider_account.account_name, "vend", started, response)
+                span.set_attribute("provider.response_code", response.get("responseCode"))
+            return response
             
         except Exception as e:
             logger.error(f"Error vending via {provider_account.provider.provider_code}: {e}", exc_info=True)
@@ -74,7 +83,12 @@ class ProviderServiceManager:
                 logger.warning(f"No provider service found for provider_code={provider_code}")
                 return {"responseCode": "99", "responseMessage": "Provider code doesn't match", "provider_ref": None, "provider_avail_bal": "0"}
             service = service(provider_account, merchant_ref=merchant_ref, product_code=product_code)
-            return service.requery()
+            with start_span("provider.requery", attributes={"provider.account": provider_account.account_name, "merchant_ref": merchant_ref}) as span:
+                started = time.perf_counter()
+                response = service.requery()
+                observe_provider_call(provider_account.account_name, "requery", started, response)
+                span.set_attribute("provider.response_code", response.get("responseCode"))
+            return response
         except Exception as e:
             logger.error(f"Error requerying via {provider_account.provider.provider_code}: {e}", exc_info=True)
             return {
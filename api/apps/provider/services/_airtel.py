@@ -21,7 +21,7 @@ class AirtelProviderService(BaseProvider):
     def __init__(self, provider_account, merchant_ref=None, receiver_phone=None, amount=None, product_code=None, data_code=None):
         super().__init__(provider_account)
         #self.url = "https://172.24.4.21:4443/pretups/C2SReceiver?REQUEST_GATEWAY_CODE=TELKO&REQUEST_GATEWAY_TYPE=EXTGW&LOGIN=pretups&PASSWORD=908cff993002341304d8c732b614ffc0&SOURCE_TYPE=EXTGW&SERVICE_PORT=191"
-        self.url = "https://pretupsapi.airtel.com.ng:4443/pretups/C2SReceiver?REQUEST_GATEWAY_CODE=TELKO&REQUEST_GATEWAY_TYPE=EXTGW&LOGIN=pretups&PASSWORD=908cff993002341304d8c732b614ffc0&SOURCE_TYPE=EXTGW&SERVICE_PORT=191"
+        self.url = self.provider_url("https://pretupsapi.airtel.com.ng:4443/pretups/C2SReceiver?REQUEST_GATEWAY_CODE=TELKO&REQUEST_GATEWAY_TYPE=EXTGW&LOGIN=pretups&PASSWORD=908cff993002341304d8c732b614ffc0&SOURCE_TYPE=EXTGW&SERVICE_PORT=191")
         self.login_pin = self.get_config_value('login_pin', '')
         self.login_id = self.get_config_value('login_id', '')
         self.password = self.get_config_value('password', '')
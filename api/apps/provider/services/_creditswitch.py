@@ -24,7 +24,7 @@ class CreditswitchProviderService(BaseProvider):
         self.login_id = self.get_config_value('login_id', '')
         self.public_key = self.get_config_value('public_key', '')
         self.private_key = self.get_config_value('private_key', '')
-        self.base_url = "https://portal.creditswitch.com"
+        self.base_url = self.provider_url("https://portal.creditswitch.com")
         self.receiver_phone = receiver_phone
         self.amount = amount
         self.product_code = product_code
@@ -67,14 +67,17 @@ class CreditswitchProviderService(BaseProvider):
     def _send_json(self, url: str, payload: dict = None, method: str = "POST", headers: dict = None, log_prefix: str = "PROVIDER"):
         """Override to return Creditswitch-specific error format."""
         try:
-            logger.info(f"RAW CREDITSWITCH REQUEST PAYLOAD:::{payload} :::: URL::{url}")
-
-            if method.upper() == "GET":
-                resp = self.session.get(url, headers=headers, verify=self.verify_ssl, timeout=self.timeout)
-            else:
-                resp = self.session.post(url, json=payload, headers=headers, verify=self.verify_ssl, timeout=self.timeout)
+            self.log_raw("RAW CREDITSWITCH REQUEST PAYLOAD:::%s :::: URL::%s", payload, url)
+
+            with self._http_span(url, method) as span:
+                if method.upper() == "GET":
+                    resp = self.session.get(url, headers=headers, verify=self.verify_ssl, timeout=self.timeout)
+                else:
+                    resp = self.session.post(url, json=payload, headers=headers, verify=self.verify_ssl, timeout=self.timeout)
+                span.set_attribute("http.status_code", resp.status_code)
             
-            logger.info(f"RAW CREDITSWITCH RESPONSE:::{resp.text}")
+            logger.info("CREDITSWITCH RESPONSE:: URL=%s HTTP STATUS=%s BYTES=%s", url, resp.status_code, len(resp.content))
+            self.log_raw("RAW CREDITSWITCH RESPONSE:::%s", resp.text)
             return resp.json()
 
         except requests.Timeout:
@@ -19,9 +19,9 @@ to the  provider
 
 """
 class EtisalatProviderService(BaseProvider):
-    def __init__(self, provider_account, merchant_ref=None, receiver_phone=None, amount=None, product_code="9MOBILEVTU"):
+    def __init__(self, provider_account, merchant_ref=None, receiver_phone=None, amount=None, product_code="9MOBILEVTU", data_code=None):
         super().__init__(provider_account)
-        self.url = "https://10.158.8.33:9090/EVC/SinglePointFulfilment/EVCPinlessInterfaceEndpoint"
+        self.url = self.provider_url("https://10.158.8.33:9090/EVC/SinglePointFulfilment/EVCPinlessInterfaceEndpoint")
         self.username = self.get_config_value('username', '')
         self.password = self.get_config_value('password', '')
         self.auth_key = self.get_config_value('auth_key', '')
@@ -73,7 +73,7 @@ class EtisalatProviderService(BaseProvider):
                 response["provider_avail_bal"] = "0"
                 return response
 
-            logger.info(f"JSON FORMATTED 9MOBILE RESPONSE :::{json_resp}")
+            self.log_raw("JSON FORMATTED 9MOBILE RESPONSE :::%s", json_resp)
 
             body = json_resp["soapenv:Envelope"]["soapenv:Body"]["com:SDF_Data"]["com:result"]
             response["responseCode"] = body["com:statusCode"]
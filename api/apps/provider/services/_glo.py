@@ -21,7 +21,7 @@ to the  provider
 class GloProviderService(BaseProvider):
     def __init__(self, provider_account, merchant_ref=None, receiver_phone=None, amount=None, product_code=None, data_code=None):
         super().__init__(provider_account)
-        self.url = "http://41.203.65.10:8913/topupservice/service?wsdl"
+        self.url = self.provider_url("http://41.203.65.10:8913/topupservice/service?wsdl")
         self.userId = self.get_config_value('user_id', '')
         self.password = self.get_config_value('password', '')
         self.resellerId = self.get_config_value('reseller_id', '')
@@ -54,7 +54,7 @@ class GloProviderService(BaseProvider):
                 response["provider_avail_bal"] = "0"
                 return response
 
-            logger.info(f"JSON FORMATTED GLO RESPONSE :::{json_resp}")
+            self.log_raw("JSON FORMATTED GLO RESPONSE :::%s", json_resp)
 
             body = json_resp["soap:Envelope"]["soap:Body"]["ns2:requestTopupResponse"]["return"]
             response["responseCode"] = body["resultCode"]
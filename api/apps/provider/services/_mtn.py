@@ -20,7 +20,7 @@ to the provider
 class MTNNProviderService(BaseProvider):
     def __init__(self, provider_account, merchant_ref=None, receiver_phone=None, amount=None, product_code=None, data_code=None):
         super().__init__(provider_account)
-        self.url = "https://ershostif.mtn.ng/axis2/services/HostIFService"
+        self.url = self.provider_url("https://ershostif.mtn.ng/axis2/services/HostIFService")
         username = self.get_config_value('username', '')
         password = self.get_config_value('password', '')
         self.auth_token = f"{username}:{password}"
@@ -31,6 +31,30 @@ class MTNNProviderService(BaseProvider):
         self.merchant_ref = merchant_ref
 
 
+    # ------------------------------------------------------------------------
+    # Payload Builders
+    # ------------------------------------------------------------------------
+    def _generate_payload(self):
+        """Generate the HostIF vend payload."""
+        return f'''<?xml version="1.0" encoding="UTF-8" standalone="no"?><soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:xsd="http://hostif.vtm.prism.co.za/xsd"><soapenv:Header/><soapenv:Body><xsd:vend><xsd:origMsisdn>{self.vend_sim}</xsd:origMsisdn><xsd:destMsisdn>{self.receiver_phone}</xsd:destMsisdn><xsd:amount>{self.amount}</xsd:amount><xsd:sequence>{self.merchant_ref}</xsd:sequence><xsd:tariffTypeId>{self.data_code}</xsd:tariffTypeId><xsd:serviceproviderId>1</xsd:serviceproviderId></xsd:vend></soapenv:Body></soapenv:Envelope>'''
+
+    def _map_response(self, json_resp):
+        """Normalize a parsed HostIF vend response for the platform."""
+        response = {}
+        body = json_resp["SOAP-ENV:Envelope"]["SOAP-ENV:Body"]["xsd:vendResponse"]
+        response["responseCode"] = body["xsd:statusId"]
+        response["responseMessage"] = body["xsd:responseMessage"]
+        response["provider_ref"] = body.get("xsd:txRefId")
+        response["provider_avail_bal"] = body.get("xsd:origBalance", "0")
+
+        if body["xsd:statusId"] == "0":
+            response["responseCode"] = SUCCESS
+            response["responseMessage"] = RESPONSE_MESSAGES[SUCCESS]
+        elif body["xsd:statusId"] in ["1004", "202"]:  # Invalid phone number
+            response["responseCode"] = INVALID_MSISDN
+            response["responseMessage"] = RESPONSE_MESSAGES[INVALID_MSISDN]
+        return response
+
     # ------------------------------------------------------------------------
     # Main Methods
     # ------------------------------------------------------------------------
@@ -38,7 +62,7 @@ class MTNNProviderService(BaseProvider):
         """Send request to MTN provider."""
         response = {}
         try:
-            payload = f'''<?xml version="1.0" encoding="UTF-8" standalone="no"?><soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:xsd="http://hostif.vtm.prism.co.za/xsd"><soapenv:Header/><soapenv:Body><xsd:vend><xsd:origMsisdn>{self.vend_sim}</xsd:origMsisdn><xsd:destMsisdn>{self.receiver_phone}</xsd:destMsisdn><xsd:amount>{self.amount}</xsd:amount><xsd:sequence>{self.merchant_ref}</xsd:sequence><xsd:tariffTypeId>{self.data_code}</xsd:tariffTypeId><xsd:serviceproviderId>1</xsd:serviceproviderId></xsd:vend></soapenv:Body></soapenv:Envelope>'''
+            payload = self._generate_payload()
             
             header = {
                 "Authorization": f"Basic {self.encode_base64(self.auth_token)}",
@@ -57,23 +81,9 @@ class MTNNProviderService(BaseProvider):
                 response["provider_avail_bal"] = "0"
                 return response
 
-            logger.info(f"JSON FORMATTED MTNN RESPONSE :::{json_resp}")
+            self.log_raw("JSON FORMATTED MTNN RESPONSE :::%s", json_resp)
 
-            body = json_resp["SOAP-ENV:Envelope"]["SOAP-ENV:Body"]["xsd:vendResponse"]
-            response["responseCode"] = body["xsd:statusId"]
-            response["responseMessage"] = body["xsd:responseMessage"]
-            try: 
-                response["provider_ref"] = body["xsd:txRefId"]
-            except Exception:
-                response["provider_ref"] = None
-            response["provider_avail_bal"] = body.get("xsd:origBalance", "0")
-            
-            if body["xsd:statusId"] == "0":
-                response["responseCode"] = SUCCESS
-                response["responseMessage"] = RESPONSE_MESSAGES[SUCCESS]
-            elif body["xsd:statusId"] in ["1004", "202"]:  # Invalid phone number
-                response["responseCode"] = INVALID_MSISDN
-                response["responseMessage"] = RESPONSE_MESSAGES[INVALID_MSISDN]
+            response = self._map_response(json_resp)
                 
         except Exception as e:
             logger.error(f"FAILED MTNN REQUEST:, REASON::{e}", exc_info=True)
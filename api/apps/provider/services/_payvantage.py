@@ -20,7 +20,7 @@ class PayvantageProviderService(BaseProvider):
         super().__init__(provider_account)
         self.api_key = self.get_config_value('api_key', '')
         self.client_id = self.get_config_value('client_id', '')
-        self.base_url = "https://vend-prod.payvantageapi.com"
+        self.base_url = self.provider_url("https://vend-prod.payvantageapi.com")
         self.merchant_ref = merchant_ref
         self.receiver_phone = receiver_phone
         self.amount = amount
@@ -0,0 +1,136 @@
+"""
+Per provider account rate limit and concurrency cap, shared by every worker.
+
+Background calls to a provider (requery today) take a slot first::
+
+    try:
+        with provider_slot(provider_account):
+            response = ProviderServiceManager.requery(...)
+    except Throttled as e:
+        ...retry in e.retry_after seconds
+
+A slot needs a token from the account's bucket (``rate`` per second, up to
+``burst`` banked) and a free place under ``concurrency`` calls in flight.
+Defaults come from settings (``PROVIDER_RATE_LIMIT``, ``PROVIDER_BURST``,
+``PROVIDER_CONCURRENCY``); an account overrides them with ``rate_limit``,
+``burst`` and ``concurrency`` in its ``config``.
+
+State lives in Redis and is updated by one Lua script, so the limits hold
+across workers and containers. Calls in flight are a sorted set of call id ->
+deadline: each call is removed when it finishes, and one whose worker died
+mid-call is pruned once its own deadline passes. Without Redis (local
+development) every call is let through.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from config.localcache import get_redis_client
+from config.metrics import PROVIDER_THROTTLED
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = "throttle:provider_account:{}:bucket"
+# sorted set of call id -> deadline (ms); not the old in_flight counter key, which is a string
+IN_FLIGHT_KEY = "throttle:provider_account:{}:calls"
+# a call still registered after this long belonged to a worker killed mid-call
+IN_FLIGHT_TTL_MS = 120_000
+
+# KEYS: bucket, in_flight  ARGV: rate/s, burst, concurrency, now_ms, in_flight_ttl_ms, call id
+# returns {1, 0} when a slot was taken, else {0, retry_after_ms, reason}
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local concurrency = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZCARD', KEYS[2]) >= concurrency then
+    return {0, 1000, 'concurrency'}
+end
+
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or now)
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate / 1000)
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+    return {0, math.ceil((1 - tokens) / rate * 1000), 'rate'}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+redis.call('ZADD', KEYS[2], now + ttl, ARGV[6])
+-- only drops the key once every call in it is past its deadline anyway
+redis.call('PEXPIRE', KEYS[2], ttl)
+return {1, 0}
+"""
+
+# KEYS: in_flight  ARGV: call id
+RELEASE_SCRIPT = """
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+
+_scripts = {}
+
+
+class Throttled(Exception):
+    def __init__(self, provider_account_id, retry_after, reason):
+        super().__init__(f"provider account {provider_account_id} throttled ({reason}), retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def limits(provider_account):
+    """(rate per second, burst, concurrency) for ``provider_account``."""
+    config = provider_account.config or {}
+    rate = float(config.get("rate_limit", settings.PROVIDER_RATE_LIMIT))
+    burst = float(config.get("burst", settings.PROVIDER_BURST))
+    concurrency = int(config.get("concurrency", settings.PROVIDER_CONCURRENCY))
+    return max(rate, 0.01), max(burst, 1), concurrency
+
+
+def _script(client, source):
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = client.register_script(source)
+    return script
+
+
+@contextmanager
+def provider_slot(provider_account):
+    """Hold one rate-limited, concurrency-capped call slot; raises Throttled."""
+    client = get_redis_client()
+    if client is None:
+        yield
+        return
+
+    rate, burst, concurrency = limits(provider_account)
+    in_flight_key = IN_FLIGHT_KEY.format(provider_account.id)
+    call_id = uuid.uuid4().hex
+    try:
+        result = _script(client, ACQUIRE_SCRIPT)(
+            keys=[BUCKET_KEY.format(provider_account.id), in_flight_key],
+            args=[rate, burst, concurrency, int(time.time() * 1000), IN_FLIGHT_TTL_MS, call_id],
+        )
+    except Exception as e:
+        # a Redis outage must not stop requeries; the provider sees unthrottled traffic meanwhile
+        logger.warning("PROVIDER THROTTLE UNAVAILABLE:: account=%s reason=%s", provider_account.id, e)
+        yield
+        return
+
+    if not result[0]:
+        reason = result[2].decode() if isinstance(result[2], bytes) else result[2]
+        PROVIDER_THROTTLED.labels(provider_account.id, reason).inc()
+        raise Throttled(provider_account.id, result[1] / 1000, reason)
+    try:
+        yield
+    finally:
+        try:
+            _script(client, RELEASE_SCRIPT)(keys=[in_flight_key], args=[call_id])
+        except Exception as e:
+            logger.warning("PROVIDER THROTTLE RELEASE FAILED:: account=%s reason=%s", provider_account.id, e)
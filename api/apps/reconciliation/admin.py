@@ -0,0 +1,35 @@
+from django.contrib import admin
+
+from .models import BalanceCheckpoint, BalanceDiscrepancy, ReconciliationItem, ReconciliationRun
+# Register your models here.
+
+
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'provider_code', 'source_name', 'status', 'period_start', 'period_end', 'statement_rows', 'matched_rows', 'started_at')
+    list_filter = ('provider_code', 'status')
+    search_fields = ('source_name', 'source_sha256')
+    readonly_fields = [field.name for field in ReconciliationRun._meta.fields]
+
+
+@admin.register(ReconciliationItem)
+class ReconciliationItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'run', 'outcome', 'proposed_action', 'transaction_id', 'provider_ref', 'merchant_ref', 'provider_amount', 'our_amount', 'provider_status', 'our_status', 'applied_at')
+    list_filter = ('outcome', 'proposed_action', 'run__provider_code')
+    search_fields = ('provider_ref', 'merchant_ref', 'msisdn')
+    raw_id_fields = ('run', 'transaction')
+    readonly_fields = [field.name for field in ReconciliationItem._meta.fields]
+
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('merchant_id', 'expected_balance', 'difference', 'as_of', 'checked_at')
+    readonly_fields = [field.name for field in BalanceCheckpoint._meta.fields]
+
+
+@admin.register(BalanceDiscrepancy)
+class BalanceDiscrepancyAdmin(admin.ModelAdmin):
+    list_display = ('id', 'merchant_id', 'expected_balance', 'actual_balance', 'difference', 'previous_difference', 'created_at', 'resolved_at')
+    list_filter = ('resolved_at',)
+    raw_id_fields = ('merchant',)
+    readonly_fields = ('merchant', 'expected_balance', 'actual_balance', 'difference', 'previous_difference', 'window_start', 'window_end', 'offending', 'created_at')
@@ -0,0 +1,186 @@
+"""
+Internal balance reconciliation: does each merchant's current_balance still
+follow from its history?
+
+    expected = credited fundings (top-ups and reversals) - transaction debits
+
+Every merchant has a ``BalanceCheckpoint`` holding the expected balance up to
+``as_of``, so a check only aggregates the activity after it. One range of
+merchant ids is checked with a single grouped statement (correlated sums over
+the (merchant, created_at) indexes) inside a REPEATABLE READ transaction on a
+replica: the balance and the rows that moved it come from the same snapshot,
+since the vend and credit paths change both in one database transaction.
+
+The checkpoint only advances to activity older than ``SETTLE``; newer rows
+are counted for the comparison but read again next time, in case a row with
+an earlier created_at has not committed yet.
+
+A discrepancy is flagged when a merchant's difference changes, with the rows
+in the window that look wrong (``offending_rows``), and resolved when the
+difference returns to zero. Ranges are independent, so the Celery job checks
+them in parallel (``apps.reconciliation.task``).
+"""
+import datetime
+import logging
+from decimal import Decimal
+
+from django.db import connections, transaction as db_transaction
+from django.db.models import Count, DateTimeField, DecimalField, F, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.ledger.models import LedgerEntry
+from apps.ledger.postings import REVERSAL
+from apps.merchant.models import Merchant, MerchantFunding
+from apps.product.models import Transaction
+from apps.reconciliation.models import BalanceCheckpoint, BalanceDiscrepancy
+from config.db_router import replica_alias
+
+logger = logging.getLogger(__name__)
+
+RANGE_SIZE = 1000  # merchant ids per range task
+SETTLE = datetime.timedelta(minutes=2)
+OFFENDING_LIMIT = 100
+BEGINNING = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+ZERO = Decimal("0.00")
+
+
+def merchant_ranges(range_size=RANGE_SIZE):
+    """``(first_id, last_id)`` ranges covering every merchant."""
+    first = Merchant.objects.order_by('id').values_list('id', flat=True).first()
+    last = Merchant.objects.order_by('-id').values_list('id', flat=True).first()
+    if first is None:
+        return []
+    return [(start, min(start + range_size - 1, last)) for start in range(first, last + 1, range_size)]
+
+
+#================ SET-BASED TOTALS ====
+def _activity_sum(model, field, upper=None, **filters):
+    """Correlated SUM of ``field`` for the outer merchant after its checkpoint (and up to ``upper``)."""
+    queryset = model.objects.filter(
+        merchant_id=OuterRef('id'),
+        created_at__gt=Coalesce(OuterRef('checkpoint_as_of'), Value(BEGINNING, output_field=DateTimeField())),
+        **filters,
+    )
+    if upper is not None:
+        queryset = queryset.filter(created_at__lte=upper)
+    total = queryset.values('merchant_id').annotate(total=Sum(field)).values('total')
+    return Coalesce(Subquery(total), Value(ZERO), output_field=DecimalField(max_digits=16, decimal_places=2))
+
+
+def _balances(alias, first_id, last_id, upper):
+    checkpoint = BalanceCheckpoint.objects.filter(merchant_id=OuterRef('id'))
+    return list(
+        Merchant.objects.using(alias)
+        .filter(id__gte=first_id, id__lte=last_id)
+        .annotate(
+            checkpoint_balance=Subquery(checkpoint.values('expected_balance')),
+            checkpoint_as_of=Subquery(checkpoint.values('as_of')),
+            checkpoint_difference=Subquery(checkpoint.values('difference')),
+        )
+        .annotate(
+            settled_credits=_activity_sum(MerchantFunding, 'amount', upper, is_credited=True),
+            settled_debits=_activity_sum(Transaction, 'discount_amount', upper),
+            credits=_activity_sum(MerchantFunding, 'amount', is_credited=True),
+            debits=_activity_sum(Transaction, 'discount_amount'),
+        )
+        .values_list(
+            'id', 'current_balance', 'checkpoint_balance', 'checkpoint_as_of', 'checkpoint_difference',
+            'settled_credits', 'settled_debits', 'credits', 'debits',
+        )
+        .order_by('id')
+    )
+
+
+#================ OFFENDING ROWS ====
+def offending_rows(merchant_id, after=None, using=None, limit=OFFENDING_LIMIT):
+    """Rows of the merchant's activity after ``after`` that cannot be right."""
+    transactions = Transaction.objects.using(using).filter(merchant_id=merchant_id)
+    fundings = MerchantFunding.objects.using(using).filter(merchant_id=merchant_id, is_credited=True)
+    if after is not None:
+        transactions = transactions.filter(created_at__gt=after)
+        fundings = fundings.filter(created_at__gt=after)
+
+    rows = []
+    for txn_id in transactions.exclude(balance_after=F('balance_before') - F('discount_amount')).values_list('id', flat=True)[:limit]:
+        rows.append({"table": "vas_transactions", "id": txn_id, "reason": "balance_after != balance_before - discount_amount"})
+    for funding_ref in fundings.exclude(balance_after=F('balance_before') + F('amount')).values_list('funding_ref', flat=True)[:limit]:
+        rows.append({"table": "vas_merchant_funding", "id": str(funding_ref), "reason": "balance_after != balance_before + amount"})
+
+    # reversals are only checked against the ledger for transactions it has been recording
+    ledger_start = LedgerEntry.objects.using(using).filter(merchant_id=merchant_id).aggregate(first=Min('created_at'))['first']
+    if ledger_start is not None:
+        reversals = (
+            LedgerEntry.objects.filter(merchant_id=merchant_id, kind=REVERSAL, transaction_id=OuterRef('id'))
+            .values('transaction_id').annotate(count=Count('id')).values('count')
+        )
+        reversed_txns = (
+            transactions.filter(created_at__gte=ledger_start)
+            .filter(Q(is_reverse=True) | Q(reversed_at__isnull=False))
+            .annotate(reversals=Coalesce(Subquery(reversals), 0))
+        )
+        for txn_id in reversed_txns.filter(reversals=0).values_list('id', flat=True)[:limit]:
+            rows.append({"table": "vas_transactions", "id": txn_id, "reason": "marked reversed, merchant never refunded"})
+        for txn_id in reversed_txns.filter(reversals__gt=1).values_list('id', flat=True)[:limit]:
+            rows.append({"table": "vas_transactions", "id": txn_id, "reason": "refunded more than once"})
+    return rows[:limit]
+
+
+#================ RANGE CHECK ====
+def reconcile_range(first_id, last_id, settle=SETTLE):
+    """
+    Check merchants ``first_id``..``last_id`` and advance their checkpoints.
+    Returns ``(merchants checked, discrepancies flagged)``.
+    """
+    now = timezone.now()
+    upper = now - settle
+    alias = replica_alias()
+    flagged = []
+    # SET TRANSACTION has to be the first statement, so not when already inside a transaction
+    snapshot = connections[alias].vendor == "postgresql" and not connections[alias].in_atomic_block
+    with db_transaction.atomic(using=alias):
+        if snapshot:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        rows = _balances(alias, first_id, last_id, upper)
+
+        checkpoints = []
+        for (merchant_id, actual, balance, as_of, previous, settled_credits, settled_debits, credits, debits) in rows:
+            balance = balance or ZERO
+            previous = previous or ZERO
+            expected = balance + credits - debits
+            difference = actual - expected
+            checkpoints.append(BalanceCheckpoint(
+                merchant_id=merchant_id,
+                expected_balance=balance + settled_credits - settled_debits,
+                as_of=upper if as_of is None else max(as_of, upper),
+                difference=difference,
+            ))
+            if difference != previous and difference != 0:
+                flagged.append(BalanceDiscrepancy(
+                    merchant_id=merchant_id,
+                    expected_balance=expected,
+                    actual_balance=actual,
+                    difference=difference,
+                    previous_difference=previous,
+                    window_start=as_of,
+                    window_end=now,
+                    offending=offending_rows(merchant_id, as_of, using=alias),
+                ))
+        resolved = [checkpoint.merchant_id for checkpoint in checkpoints if checkpoint.difference == 0]
+
+    with db_transaction.atomic():
+        BalanceCheckpoint.objects.bulk_create(
+            checkpoints, update_conflicts=True, unique_fields=['merchant'],
+            update_fields=['expected_balance', 'as_of', 'difference', 'checked_at'],
+        )
+        BalanceDiscrepancy.objects.bulk_create(flagged)
+        BalanceDiscrepancy.objects.filter(merchant_id__in=resolved, resolved_at__isnull=True).update(resolved_at=now)
+
+    for discrepancy in flagged:
+        logger.warning(
+            f"BALANCE DISCREPANCY:: MERCHANT={discrepancy.merchant_id} EXPECTED={discrepancy.expected_balance} "
+            f"ACTUAL={discrepancy.actual_balance} DIFFERENCE={discrepancy.difference} OFFENDING={len(discrepancy.offending)}"
+        )
+    logger.info(f"BALANCE RECONCILIATION:: RANGE={first_id}-{last_id} MERCHANTS={len(rows)} FLAGGED={len(flagged)}")
+    return len(rows), len(flagged)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from apps.reconciliation.balances import RANGE_SIZE, merchant_ranges, reconcile_range
+from apps.reconciliation.task import reconcile_balance_range_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every merchant's current_balance against its fundings, debits and reversals "
+        "since its last checkpoint, and flag the discrepancies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--merchant", type=int, help="Only check this merchant")
+        parser.add_argument("--range-size", type=int, default=RANGE_SIZE, help="Merchant ids per range")
+        parser.add_argument("--async", dest="run_async", action="store_true",
+                            help="Queue one Celery task per range instead of checking here")
+
+    def handle(self, *args, **options):
+        if options["merchant"]:
+            ranges = [(options["merchant"], options["merchant"])]
+        else:
+            ranges = merchant_ranges(options["range_size"])
+
+        if options["run_async"]:
+            for first_id, last_id in ranges:
+                reconcile_balance_range_task.delay(first_id, last_id)
+            self.stdout.write(f"Queued {len(ranges)} range(s)")
+            return
+
+        checked = flagged = 0
+        for first_id, last_id in ranges:
+            merchants, discrepancies = reconcile_range(first_id, last_id)
+            checked += merchants
+            flagged += discrepancies
+        self.stdout.write(f"Checked {checked} merchant(s), flagged {flagged} discrepanc{'y' if flagged == 1 else 'ies'}")
@@ -0,0 +1,54 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.provider.models import ProviderAccount
+from apps.reconciliation.models import ReconciliationRun
+from apps.reconciliation.runs import MATCH_WINDOW, apply_proposals, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Match a provider settlement statement (CSV or XML) against vas_transactions and "
+        "record the discrepancies; --apply carries out the proposed status fixes and refunds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Statement file")
+        parser.add_argument("--provider", required=True, help="Provider code, selects the statement format")
+        parser.add_argument("--account", type=int, help="Only match this provider account's transactions")
+        parser.add_argument("--format", choices=["csv", "xml"], help="Defaults to the file extension")
+        parser.add_argument("--window-minutes", type=int, default=int(MATCH_WINDOW.total_seconds() // 60),
+                            help="Clock difference tolerated when matching on msisdn and amount")
+        parser.add_argument("--apply", action="store_true", help="Apply mark_success / mark_failed_and_reverse proposals")
+
+    def handle(self, *args, **options):
+        provider_code = options["provider"].upper()
+        account = None
+        if options["account"]:
+            account = ProviderAccount.objects.filter(id=options["account"]).first()
+            if account is None:
+                raise CommandError(f"Provider account {options['account']} not found")
+
+        run = reconcile(
+            options["path"], provider_code, provider_account=account, file_format=options["format"],
+            window=datetime.timedelta(minutes=options["window_minutes"]),
+        )
+        if run.status != "completed":
+            raise CommandError(f"Run {run.id} failed: {run.error}")
+        earlier = ReconciliationRun.objects.filter(status="completed", source_sha256=run.source_sha256).exclude(id=run.id)
+        if earlier.exists():
+            self.stderr.write(f"This statement was already reconciled in run(s) {', '.join(str(pk) for pk in earlier.values_list('id', flat=True))}")
+
+        self.stdout.write(
+            f"Run {run.id}: {run.statement_rows} statement rows, {run.transaction_rows} transactions, "
+            f"{run.matched_rows} matched ({run.period_start} - {run.period_end})"
+        )
+        for outcome, count in sorted(run.summary.get("outcome", {}).items()):
+            self.stdout.write(f"  {outcome}: {count}")
+        for action, count in sorted(run.summary.get("proposed_action", {}).items()):
+            self.stdout.write(f"  -> {action}: {count}")
+
+        if options["apply"]:
+            applied, skipped = apply_proposals(run)
+            self.stdout.write(f"Applied {applied} proposal(s), skipped {skipped} whose transaction changed since the run")
@@ -0,0 +1,177 @@
+"""
+Vectorised matching of a normalised statement against our transactions.
+
+Both sides are pandas frames (see ``statements`` and ``load_transactions``).
+Matching runs in passes, each a hash join over what the previous passes
+left, and every pass is one-to-one:
+
+    1. provider_ref
+    2. merchant_ref (the reference we sent the provider)
+    3. msisdn + amount, nearest in time within ``window`` (``merge_asof``)
+
+Statement rows repeating a provider_ref or merchant_ref are set aside first
+as duplicates. Matched pairs are compared on amount and status; whatever is
+left over is missing on one side. Every discrepancy gets a proposed action:
+
+    mark_success              provider succeeded, we still have it pending
+    mark_failed_and_reverse   provider failed or never saw it, we debited the merchant
+    investigate               anything a person has to look at (money already refunded
+                              for a vend the provider delivered, amount differences,
+                              duplicates, statement rows we know nothing about)
+"""
+import numpy as np
+import pandas as pd
+
+from apps.reconciliation.statements import normalize_msisdn, to_kobo
+
+MARK_SUCCESS = "mark_success"
+MARK_FAILED_AND_REVERSE = "mark_failed_and_reverse"
+INVESTIGATE = "investigate"
+
+TRANSACTION_FIELDS = ("id", "provider_ref", "merchant_ref", "beneficiary_account", "amount", "status", "is_reverse", "created_at")
+# our statuses in the statement vocabulary
+OUR_STATUS = {"Success": "Success", "Failed": "Failed", "Pending": "Pending", "Processing": "Pending"}
+
+
+#================ OUR SIDE ====
+def transactions_frame(rows):
+    """Frame of ``TRANSACTION_FIELDS`` tuples, normalised like a statement."""
+    raw = pd.DataFrame.from_records(rows, columns=TRANSACTION_FIELDS)
+    return pd.DataFrame({
+        "txn_id": raw["id"].astype("int64"),
+        "provider_ref": raw["provider_ref"].astype("string").str.strip().replace("", pd.NA),
+        "merchant_ref": raw["merchant_ref"].astype("string"),
+        "msisdn": normalize_msisdn(raw["beneficiary_account"].astype("string")),
+        "amount": to_kobo(raw["amount"].astype("string")),
+        "status": raw["status"].map(OUR_STATUS).fillna("Unknown").astype("string"),
+        "raw_status": raw["status"].astype("string"),
+        "is_reverse": raw["is_reverse"].astype(bool),
+        "created_at": pd.to_datetime(raw["created_at"], utc=True).astype("datetime64[ns, UTC]"),
+    })
+
+
+#================ MATCHING ====
+def _one_to_one(pairs):
+    return pairs.drop_duplicates("row").drop_duplicates("txn_id")
+
+
+def _key_pairs(statement, ours, key):
+    left = statement.loc[statement[key].notna(), ["row", key]]
+    right = ours.loc[ours[key].notna(), ["txn_id", key]]
+    pairs = left.merge(right, on=key, how="inner")[["row", "txn_id"]]
+    return _one_to_one(pairs).assign(matched_on=key)
+
+
+def _nearest_pairs(statement, ours, window):
+    keys = ["msisdn", "amount"]
+    left = statement.dropna(subset=keys + ["occurred_at"])[["row", "occurred_at"] + keys]
+    right = ours.dropna(subset=keys + ["created_at"])[["txn_id", "created_at"] + keys]
+    if left.empty or right.empty:
+        return pd.DataFrame({"row": pd.Series(dtype="int64"), "txn_id": pd.Series(dtype="int64"), "matched_on": pd.Series(dtype="object")})
+    pairs = pd.merge_asof(
+        left.sort_values("occurred_at"), right.sort_values("created_at"),
+        left_on="occurred_at", right_on="created_at", by=keys,
+        tolerance=pd.Timedelta(window), direction="nearest",
+    ).dropna(subset=["txn_id"])
+    # two statement rows may pick the same transaction: the closest in time keeps it
+    pairs = pairs.assign(gap=(pairs["occurred_at"] - pairs["created_at"]).abs()).sort_values("gap")
+    pairs = pairs.astype({"txn_id": "int64"})[["row", "txn_id"]]
+    return _one_to_one(pairs).assign(matched_on="msisdn_amount")
+
+
+def match(statement, ours, window="10min"):
+    """
+    Returns ``(pairs, discrepancies)``: the matched ``row``/``txn_id`` pairs and
+    one row per discrepancy with its outcome and proposed action.
+    ``ours`` carries ``in_period``: transactions outside the statement period
+    are only loaded to be matched, never reported missing.
+    """
+    duplicated = (
+        (statement["provider_ref"].notna() & statement.duplicated("provider_ref"))
+        | (statement["merchant_ref"].notna() & statement.duplicated("merchant_ref"))
+    )
+    duplicates = statement[duplicated]
+    remaining = statement[~duplicated]
+
+    passes = []
+    unmatched_ours = ours
+    for key in ("provider_ref", "merchant_ref"):
+        pairs = _key_pairs(remaining, unmatched_ours, key)
+        passes.append(pairs)
+        remaining = remaining[~remaining["row"].isin(pairs["row"])]
+        unmatched_ours = unmatched_ours[~unmatched_ours["txn_id"].isin(pairs["txn_id"])]
+    pairs = _nearest_pairs(remaining, unmatched_ours, window)
+    passes.append(pairs)
+    remaining = remaining[~remaining["row"].isin(pairs["row"])]
+    unmatched_ours = unmatched_ours[~unmatched_ours["txn_id"].isin(pairs["txn_id"])]
+    pairs = pd.concat(passes, ignore_index=True)
+
+    matched = (
+        pairs.merge(statement, on="row")
+        .merge(ours, on="txn_id", suffixes=("_provider", "_ours"))
+    )
+    discrepancies = pd.concat([
+        _compare(matched),
+        _missing_ours(remaining),
+        _missing_provider(unmatched_ours[unmatched_ours["in_period"]]),
+        _duplicates(duplicates),
+    ], ignore_index=True)
+    return pairs, discrepancies
+
+
+#================ DISCREPANCIES ====
+REPORT_COLUMNS = (
+    "outcome", "proposed_action", "statement_row", "transaction_id", "matched_on", "provider_ref",
+    "merchant_ref", "msisdn", "provider_amount", "our_amount", "provider_status", "our_status",
+)
+STATEMENT_SIDE = {"statement_row": "row", "provider_ref": "provider_ref", "merchant_ref": "merchant_ref",
+                  "msisdn": "msisdn", "provider_amount": "amount", "provider_status": "status"}
+OUR_SIDE = {"transaction_id": "txn_id", "provider_ref": "provider_ref", "merchant_ref": "merchant_ref",
+            "msisdn": "msisdn", "our_amount": "amount", "our_status": "raw_status"}
+MATCHED = {"statement_row": "row", "transaction_id": "txn_id", "matched_on": "matched_on",
+           "provider_ref": "provider_ref_provider", "merchant_ref": "merchant_ref_ours", "msisdn": "msisdn_provider",
+           "provider_amount": "amount_provider", "our_amount": "amount_ours",
+           "provider_status": "status_provider", "our_status": "raw_status"}
+
+
+def _report(frame, outcome, action, columns):
+    """One report row per row of ``frame``; ``columns`` maps report column -> frame column."""
+    report = pd.DataFrame({name: frame[source].to_numpy() for name, source in columns.items()}, index=range(len(frame)))
+    report["outcome"] = outcome
+    report["proposed_action"] = action
+    return report.reindex(columns=REPORT_COLUMNS)
+
+
+def _compare(matched):
+    provider_status, our_status = matched["status_provider"], matched["status_ours"]
+    amount_differs = matched["amount_provider"].ne(matched["amount_ours"]).fillna(False).astype(bool)
+    status_differs = (provider_status.ne(our_status) & provider_status.ne("Unknown")).fillna(False).astype(bool)
+
+    actions = np.select(
+        [
+            ((provider_status == "Success") & (our_status == "Pending")).fillna(False).astype(bool),
+            ((provider_status == "Failed") & ~matched["is_reverse"]).fillna(False).astype(bool),
+        ],
+        [MARK_SUCCESS, MARK_FAILED_AND_REVERSE],
+        default=INVESTIGATE,  # e.g. delivered by the provider but already refunded to the merchant
+    )
+    status_rows = (status_differs & ~amount_differs).to_numpy()
+    return pd.concat([
+        _report(matched[amount_differs], "amount_mismatch", INVESTIGATE, MATCHED),
+        _report(matched[status_rows], "status_mismatch", actions[status_rows], MATCHED),
+    ], ignore_index=True)
+
+
+def _missing_ours(rows):
+    return _report(rows, "missing_ours", INVESTIGATE, STATEMENT_SIDE)
+
+
+def _missing_provider(rows):
+    # a statement lists what the provider delivered or attempted; our failures being absent is expected
+    rows = rows[rows["status"] != "Failed"]
+    actions = np.where(rows["status"] == "Pending", MARK_FAILED_AND_REVERSE, INVESTIGATE)
+    return _report(rows, "missing_provider", actions, OUR_SIDE)
+
+
+def _duplicates(rows):
+    return _report(rows, "duplicate", INVESTIGATE, STATEMENT_SIDE)
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('provider', '0001_initial'),
+        ('product', '0011_transaction_provider_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_code', models.CharField(max_length=50)),
+                ('source_name', models.CharField(max_length=255)),
+                ('source_sha256', models.CharField(db_index=True, max_length=64)),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('period_end', models.DateTimeField(blank=True, null=True)),
+                ('statement_rows', models.PositiveIntegerField(default=0)),
+                ('transaction_rows', models.PositiveIntegerField(default=0)),
+                ('matched_rows', models.PositiveIntegerField(default=0)),
+                ('summary', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('provider_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reconciliation_runs', to='provider.provideraccount')),
+            ],
+            options={
+                'db_table': 'vas_reconciliation_runs',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('missing_ours', 'On statement, not in our transactions'), ('missing_provider', 'In our transactions, not on statement'), ('duplicate', 'Duplicate on statement'), ('status_mismatch', 'Status mismatch'), ('amount_mismatch', 'Amount mismatch')], max_length=30)),
+                ('proposed_action', models.CharField(choices=[('mark_success', 'Mark transaction successful'), ('mark_failed_and_reverse', 'Mark transaction failed and refund merchant'), ('investigate', 'Investigate')], max_length=30)),
+                ('statement_row', models.PositiveIntegerField(blank=True, null=True)),
+                ('matched_on', models.CharField(blank=True, default='', max_length=20)),
+                ('provider_ref', models.CharField(blank=True, default='', max_length=230)),
+                ('merchant_ref', models.CharField(blank=True, default='', max_length=230)),
+                ('msisdn', models.CharField(blank=True, default='', max_length=50)),
+                ('provider_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('our_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('provider_status', models.CharField(blank=True, default='', max_length=20)),
+                ('our_status', models.CharField(blank=True, default='', max_length=20)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='reconciliation.reconciliationrun')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reconciliation_items', to='product.transaction')),
+            ],
+            options={
+                'db_table': 'vas_reconciliation_items',
+                'indexes': [models.Index(fields=['run', 'outcome'], name='vas_recon_item_run_idx'), models.Index(fields=['run', 'proposed_action', 'applied_at'], name='vas_recon_item_action_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.1 on 2026-10-19 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchant', '0008_merchantfunding_merchant_created_index'),
+        ('reconciliation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_balance', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('as_of', models.DateTimeField()),
+                ('difference', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+                ('merchant', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, related_name='balance_checkpoint', to='merchant.merchant')),
+            ],
+            options={
+                'db_table': 'vas_balance_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceDiscrepancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_balance', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('actual_balance', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('difference', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('previous_difference', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('window_start', models.DateTimeField(blank=True, null=True)),
+                ('window_end', models.DateTimeField()),
+                ('offending', models.JSONField(blank=True, default=list)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='balance_discrepancies', to='merchant.merchant')),
+            ],
+            options={
+                'db_table': 'vas_balance_discrepancies',
+                'indexes': [models.Index(fields=['merchant', 'resolved_at'], name='vas_balance_disc_merchant_idx'), models.Index(fields=['created_at'], name='vas_balance_disc_created_idx')],
+            },
+        ),
+    ]
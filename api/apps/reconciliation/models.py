@@ -0,0 +1,129 @@
+from django.db import models
+
+from apps.provider.models import ProviderAccount
+
+# Create your models here.
+
+#=============================================#
+#********** Reconciliation Run ***************#
+#=============================================#
+class ReconciliationRun(models.Model):
+    """One provider settlement statement matched against vas_transactions."""
+    STATUS = [
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+    provider_code = models.CharField(max_length=50)
+    provider_account = models.ForeignKey(ProviderAccount, on_delete=models.DO_NOTHING, related_name='reconciliation_runs', null=True, blank=True)
+    source_name = models.CharField(max_length=255)
+    source_sha256 = models.CharField(max_length=64, db_index=True)
+    period_start = models.DateTimeField(null=True, blank=True)
+    period_end = models.DateTimeField(null=True, blank=True)
+    statement_rows = models.PositiveIntegerField(default=0)
+    transaction_rows = models.PositiveIntegerField(default=0)
+    matched_rows = models.PositiveIntegerField(default=0)
+    summary = models.JSONField(default=dict, blank=True)  # discrepancy counts by outcome and proposed action
+    status = models.CharField(max_length=20, choices=STATUS, default="running")
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "vas_reconciliation_runs"
+
+    def __str__(self):
+        return f"{self.provider_code} {self.source_name} ({self.status})"
+
+
+#=============================================#
+#********** Reconciliation Item **************#
+#=============================================#
+class ReconciliationItem(models.Model):
+    """A statement row and/or transaction that did not reconcile, with the fix we propose."""
+    OUTCOME = [
+        ("missing_ours", "On statement, not in our transactions"),
+        ("missing_provider", "In our transactions, not on statement"),
+        ("duplicate", "Duplicate on statement"),
+        ("status_mismatch", "Status mismatch"),
+        ("amount_mismatch", "Amount mismatch"),
+    ]
+    ACTION = [
+        ("mark_success", "Mark transaction successful"),
+        ("mark_failed_and_reverse", "Mark transaction failed and refund merchant"),
+        ("investigate", "Investigate"),
+    ]
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name='items')
+    outcome = models.CharField(max_length=30, choices=OUTCOME)
+    proposed_action = models.CharField(max_length=30, choices=ACTION)
+    transaction = models.ForeignKey('product.Transaction', on_delete=models.DO_NOTHING, related_name='reconciliation_items', null=True, blank=True)
+    statement_row = models.PositiveIntegerField(null=True, blank=True)  # 1-based record number in the source file
+    matched_on = models.CharField(max_length=20, blank=True, default="")
+    provider_ref = models.CharField(max_length=230, blank=True, default="")
+    merchant_ref = models.CharField(max_length=230, blank=True, default="")
+    msisdn = models.CharField(max_length=50, blank=True, default="")
+    provider_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    our_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    provider_status = models.CharField(max_length=20, blank=True, default="")
+    our_status = models.CharField(max_length=20, blank=True, default="")
+    applied_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "vas_reconciliation_items"
+        indexes = [
+            models.Index(fields=['run', 'outcome'], name='vas_recon_item_run_idx'),
+            models.Index(fields=['run', 'proposed_action', 'applied_at'], name='vas_recon_item_action_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.outcome} -> {self.proposed_action}"
+
+
+#=============================================#
+#********** Balance Checkpoint ***************#
+#=============================================#
+class BalanceCheckpoint(models.Model):
+    """
+    A merchant's expected wallet balance recomputed from vas_transactions and
+    vas_merchant_funding up to ``as_of``; the next balance check only reads
+    the activity after it.
+    """
+    merchant = models.OneToOneField('merchant.Merchant', on_delete=models.DO_NOTHING, related_name='balance_checkpoint')
+    expected_balance = models.DecimalField(max_digits=16, decimal_places=2)
+    as_of = models.DateTimeField()
+    difference = models.DecimalField(max_digits=16, decimal_places=2, default=0)  # current_balance - expected at the last check
+    checked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "vas_balance_checkpoints"
+
+    def __str__(self):
+        return f"{self.merchant_id} {self.expected_balance} @ {self.as_of}"
+
+
+#=============================================#
+#********** Balance Discrepancy **************#
+#=============================================#
+class BalanceDiscrepancy(models.Model):
+    """A merchant's current_balance stopped matching its history; ``offending`` lists the suspect rows."""
+    merchant = models.ForeignKey('merchant.Merchant', on_delete=models.DO_NOTHING, related_name='balance_discrepancies')
+    expected_balance = models.DecimalField(max_digits=16, decimal_places=2)
+    actual_balance = models.DecimalField(max_digits=16, decimal_places=2)
+    difference = models.DecimalField(max_digits=16, decimal_places=2)
+    previous_difference = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    window_start = models.DateTimeField(null=True, blank=True)  # activity checked: after window_start (all history when empty)
+    window_end = models.DateTimeField()
+    offending = models.JSONField(default=list, blank=True)  # [{"table", "id", "reason"}]
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "vas_balance_discrepancies"
+        indexes = [
+            models.Index(fields=['merchant', 'resolved_at'], name='vas_balance_disc_merchant_idx'),
+            models.Index(fields=['created_at'], name='vas_balance_disc_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.merchant_id} off by {self.difference}"
@@ -0,0 +1,182 @@
+"""
+Reconciliation runs: read a settlement statement, load the matching slice of
+vas_transactions, match them (``matching``) and store the discrepancies as
+``ReconciliationItem`` rows. Nothing is changed until ``apply_proposals``.
+
+Memory stays bounded by the statement and the period it covers: the
+statement arrives in normalised chunks of compact columns and our
+transactions are streamed from a replica with a server-side cursor and
+turned into frames batch by batch, never into model instances.
+"""
+import datetime
+import hashlib
+import logging
+import os
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.product.models import Transaction
+from apps.reconciliation import matching
+from apps.reconciliation.models import ReconciliationItem, ReconciliationRun
+from apps.reconciliation.statements import StatementError, read_statement
+from config.db_router import replica_alias
+
+logger = logging.getLogger(__name__)
+
+MATCH_WINDOW = datetime.timedelta(minutes=10)  # statement and our clocks disagree by up to this much
+MAX_PERIOD = datetime.timedelta(days=31)  # longer usually means misread dates; refuse instead of loading it all
+FETCH_ROWS = 50_000
+ITEM_BATCH_SIZE = 2000
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+#================ LOADING ====
+def load_statement(path, provider_code, file_format=None):
+    chunks = list(read_statement(path, provider_code, file_format))
+    return pd.concat(chunks, ignore_index=True) if chunks else None
+
+
+def load_transactions(provider_code, start, end, provider_account=None, window=MATCH_WINDOW):
+    """
+    Our transactions with the provider created between ``start`` and ``end``
+    (widened by ``window`` so vends near the edges can still be matched;
+    ``in_period`` marks the ones inside).
+    """
+    queryset = Transaction.objects.using(replica_alias()).filter(created_at__gte=start - window, created_at__lte=end + window)
+    if provider_account is not None:
+        queryset = queryset.filter(provider_account=provider_account)
+    else:
+        queryset = queryset.filter(provider_account__provider__provider_code=provider_code)
+    rows = queryset.order_by().values_list(*matching.TRANSACTION_FIELDS).iterator(chunk_size=FETCH_ROWS)
+
+    frames, batch = [], []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= FETCH_ROWS:
+            frames.append(matching.transactions_frame(batch))
+            batch = []
+    frames.append(matching.transactions_frame(batch))
+    ours = pd.concat(frames, ignore_index=True)
+    ours["in_period"] = ours["created_at"].between(start, end)
+    return ours
+
+
+#================ RUN ====
+def reconcile(path, provider_code, provider_account=None, file_format=None, window=MATCH_WINDOW):
+    """Match the statement at ``path``; returns the finished ``ReconciliationRun``."""
+    run = ReconciliationRun.objects.create(
+        provider_code=provider_code,
+        provider_account=provider_account,
+        source_name=os.path.basename(path),
+        source_sha256=file_sha256(path),
+    )
+    try:
+        statement = load_statement(path, provider_code, file_format)
+        if statement is None or statement["occurred_at"].isna().all():
+            raise StatementError("Statement has no dated rows to take its period from")
+        start = statement["occurred_at"].min().to_pydatetime()
+        end = statement["occurred_at"].max().to_pydatetime()
+        if end - start > MAX_PERIOD:
+            raise StatementError(f"Statement covers {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}, more than {MAX_PERIOD.days} days")
+        ours = load_transactions(provider_code, start, end, provider_account, window)
+        pairs, discrepancies = matching.match(statement, ours, window)
+
+        with db_transaction.atomic():
+            ReconciliationItem.objects.bulk_create(_items(run, discrepancies), batch_size=ITEM_BATCH_SIZE)
+            run.period_start, run.period_end = start, end
+            run.statement_rows = len(statement)
+            run.transaction_rows = int(ours["in_period"].sum())
+            run.matched_rows = len(pairs)
+            run.summary = {
+                "outcome": discrepancies["outcome"].value_counts().to_dict(),
+                "proposed_action": discrepancies["proposed_action"].value_counts().to_dict(),
+            }
+            run.status = "completed"
+            run.finished_at = timezone.now()
+            run.save()
+    except Exception as e:
+        logger.error(f"RECONCILIATION FAILED:: RUN={run.id} REASON={str(e)}")
+        run.status = "failed"
+        run.error = str(e)
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "error", "finished_at"])
+    return run
+
+
+def _items(run, discrepancies):
+    def text(value):
+        return "" if pd.isna(value) else str(value)
+
+    def number(value):
+        return None if pd.isna(value) else int(value)
+
+    def naira(kobo):
+        return None if pd.isna(kobo) else Decimal(int(kobo)) / 100
+
+    for row in discrepancies.itertuples(index=False):
+        yield ReconciliationItem(
+            run=run,
+            outcome=row.outcome,
+            proposed_action=row.proposed_action,
+            transaction_id=number(row.transaction_id),
+            statement_row=number(row.statement_row),
+            matched_on=text(row.matched_on),
+            provider_ref=text(row.provider_ref)[:230],
+            merchant_ref=text(row.merchant_ref)[:230],
+            msisdn=text(row.msisdn)[:50],
+            provider_amount=naira(row.provider_amount),
+            our_amount=naira(row.our_amount),
+            provider_status=text(row.provider_status),
+            our_status=text(row.our_status),
+        )
+
+
+#================ APPLY ====
+def apply_proposals(run):
+    """
+    Carry out the run's mark_success / mark_failed_and_reverse proposals.
+    Each item is applied in its own transaction against the locked row and
+    skipped when the transaction's status moved on since the run (a requery
+    got there first). Returns ``(applied, skipped)``.
+    """
+    applied = skipped = 0
+    items = run.items.filter(
+        proposed_action__in=[matching.MARK_SUCCESS, matching.MARK_FAILED_AND_REVERSE],
+        applied_at__isnull=True,
+    ).exclude(transaction__isnull=True)
+    for item in items.iterator():
+        with db_transaction.atomic():
+            txn = Transaction.objects.select_for_update().get(id=item.transaction_id)
+            if txn.status != item.our_status:
+                logger.info(f"RECONCILIATION SKIPPED:: ITEM={item.id} TXN={txn.id} STATUS={txn.status} WAS={item.our_status}")
+                skipped += 1
+                continue
+
+            if item.proposed_action == matching.MARK_SUCCESS:
+                txn.status = "Success"
+                txn.provider_desc = f"Reconciled with {run.provider_code} statement"
+                txn.save(update_fields=['status', 'provider_desc', 'updated_at'])
+            else:
+                if not txn.is_reverse and txn.discount_amount > 0:
+                    txn.merchant.credit_balance(txn.discount_amount, source="manual_reversal", transaction_id=txn.id)
+                txn.status = "Failed"
+                txn.provider_desc = f"Reconciled with {run.provider_code} statement"
+                txn.is_reverse = True
+                txn.reversed_at = timezone.now()
+                txn.save(update_fields=['status', 'provider_desc', 'is_reverse', 'reversed_at', 'updated_at'])
+
+            item.applied_at = timezone.now()
+            item.save(update_fields=['applied_at'])
+            applied += 1
+    logger.info(f"RECONCILIATION APPLIED:: RUN={run.id} APPLIED={applied} SKIPPED={skipped}")
+    return applied, skipped
@@ -0,0 +1,174 @@
+"""
+Streaming readers for provider settlement statements.
+
+A statement is read ``CHUNK_ROWS`` records at a time (``pandas.read_csv``
+with ``chunksize`` for CSV, ``iterparse`` for XML, clearing each element
+once read), and every chunk is normalised on its own into the compact,
+provider-independent frame the matcher works on:
+
+    row          1-based record number in the file
+    provider_ref provider's transaction id          (str, NA when blank)
+    merchant_ref our reference as sent to the provider
+    msisdn       beneficiary, formatted like format_msisdn (0803...)
+    amount       kobo (int64), so amounts compare exactly
+    status       Success / Failed / Pending / Unknown
+    occurred_at  UTC timestamp
+
+Providers name their columns differently; ``STATEMENT_FORMATS`` lists the
+accepted header names per field (matched case-insensitively) and anything
+else that differs per provider (XML record tag, time zone, date order).
+"""
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 200_000
+
+FIELDS = ("provider_ref", "merchant_ref", "msisdn", "amount", "status", "occurred_at")
+
+DEFAULT_FORMAT = {
+    "columns": {
+        "provider_ref": ("provider_ref", "provider_reference", "transaction_id", "trans_id", "txn_id", "reference", "ref", "id"),
+        "merchant_ref": ("merchant_ref", "client_ref", "client_reference", "external_ref", "request_id", "sequence_id"),
+        "msisdn": ("msisdn", "beneficiary", "beneficiary_account", "phone", "phone_number", "receiver", "destination", "recipient"),
+        "amount": ("amount", "value", "face_value", "denomination"),
+        "status": ("status", "state", "result", "response_code", "status_code"),
+        "occurred_at": ("occurred_at", "transaction_date", "transaction_time", "date", "timestamp", "datetime", "created_at"),
+    },
+    "statuses": {
+        "Success": ("success", "successful", "succeeded", "completed", "complete", "ok", "00", "0", "200"),
+        "Failed": ("failed", "failure", "fail", "error", "declined", "reversed", "refunded", "99"),
+        "Pending": ("pending", "processing", "in progress", "queued", "80"),
+    },
+    "record_tag": "transaction",
+    "timezone": "Africa/Lagos",
+    "dayfirst": False,
+}
+
+# per provider code: only what differs from DEFAULT_FORMAT
+STATEMENT_FORMATS = {
+    "MTN": {"record_tag": "Transaction"},
+    "GLO": {"record_tag": "record", "dayfirst": True},
+    "AIRTEL": {},
+    "9MOBILE": {"dayfirst": True},
+    "PAYVANTAGE": {},
+    "CREDITSWITCH": {},
+}
+
+
+class StatementError(ValueError):
+    """The statement cannot be read (unknown format, missing columns)."""
+
+
+def statement_format(provider_code):
+    return {**DEFAULT_FORMAT, **STATEMENT_FORMATS.get(provider_code, {})}
+
+
+#================ READERS ====
+def read_statement(path, provider_code, file_format=None):
+    """Yield normalised chunks of the statement at ``path``."""
+    fmt = statement_format(provider_code)
+    file_format = (file_format or path.rsplit(".", 1)[-1]).lower()
+    if file_format == "csv":
+        chunks = _csv_chunks(path)
+    elif file_format == "xml":
+        chunks = _xml_chunks(path, fmt["record_tag"])
+    else:
+        raise StatementError(f"Unsupported statement format: {file_format}")
+
+    first_row = 1
+    columns = None
+    for raw in chunks:
+        if columns is None:
+            columns = _resolve_columns(raw.columns, fmt)
+        yield normalize(raw, columns, fmt, first_row)
+        first_row += len(raw)
+
+
+def _csv_chunks(path):
+    return pd.read_csv(path, dtype=str, chunksize=CHUNK_ROWS, keep_default_na=False, skipinitialspace=True)
+
+
+def _xml_chunks(path, record_tag):
+    records = []
+    for _, element in ET.iterparse(path, events=("end",)):
+        if element.tag != record_tag:
+            continue
+        record = dict(element.attrib)
+        record.update((child.tag, (child.text or "").strip()) for child in element)
+        records.append(record)
+        element.clear()
+        if len(records) >= CHUNK_ROWS:
+            yield pd.DataFrame.from_records(records)
+            records = []
+    if records:
+        yield pd.DataFrame.from_records(records)
+
+
+def _resolve_columns(headers, fmt):
+    """statement header for each field; msisdn and occurred_at may be missing, refs need one of the two."""
+    by_name = {str(header).strip().lower(): header for header in headers}
+    columns = {}
+    for field in FIELDS:
+        columns[field] = next((by_name[name] for name in fmt["columns"][field] if name in by_name), None)
+    missing = [field for field in ("amount", "status") if columns[field] is None]
+    if columns["provider_ref"] is None and columns["merchant_ref"] is None:
+        missing.append("provider_ref or merchant_ref")
+    if missing:
+        raise StatementError(f"Statement has no column for: {', '.join(missing)} (headers: {', '.join(map(str, headers))})")
+    return columns
+
+
+#================ NORMALISATION ====
+def normalize(raw, columns, fmt, first_row=1):
+    def column(field):
+        header = columns[field]
+        if header is None:
+            return pd.Series(pd.NA, index=raw.index, dtype="string")
+        return raw[header].astype("string").str.strip().replace("", pd.NA)
+
+    status_map = {alias: status for status, aliases in fmt["statuses"].items() for alias in aliases}
+    frame = pd.DataFrame({
+        "row": np.arange(first_row, first_row + len(raw), dtype="int64"),
+        "provider_ref": column("provider_ref"),
+        "merchant_ref": column("merchant_ref"),
+        "msisdn": normalize_msisdn(column("msisdn")),
+        "amount": to_kobo(column("amount").str.replace(",", "", regex=False)),
+        "status": column("status").str.lower().map(status_map).fillna("Unknown").astype("string"),
+        "occurred_at": to_utc(column("occurred_at"), fmt["timezone"], fmt["dayfirst"]),
+    })
+    return frame
+
+
+def normalize_msisdn(values):
+    """Vectorised ``config.helper.format_msisdn`` (also drops spaces and dashes)."""
+    digits = values.str.replace(r"\D", "", regex=True)
+    return digits.str.replace(r"^234", "0", regex=True).replace("", pd.NA)
+
+
+def to_kobo(values):
+    """Naira amounts -> int64 kobo; unparseable amounts become NA."""
+    naira = pd.to_numeric(values, errors="coerce")
+    return (naira * 100).round().astype("Int64")
+
+
+def to_utc(values, timezone, dayfirst=False):
+    """
+    Parse timestamps as ``datetime64[ns, UTC]``; naive ones are in the provider's ``timezone``.
+    ``dayfirst`` only applies to local dates (05/01/2026): ISO values are always year-month-day.
+    """
+    result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+    present = values.notna()
+    has_offset = values.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", regex=True).fillna(False).astype(bool)
+    is_iso = values.str.match(r"\d{4}-\d{2}-\d{2}").fillna(False).astype(bool)
+    for aware in (False, True):
+        for iso in (False, True):
+            group = values[present & (has_offset == aware) & (is_iso == iso)]
+            if not len(group):
+                continue
+            parsed = pd.to_datetime(group, errors="coerce", dayfirst=dayfirst and not iso, format="mixed", utc=aware)
+            if not aware:
+                parsed = parsed.dt.tz_localize(timezone, ambiguous="NaT", nonexistent="NaT").dt.tz_convert("UTC")
+            result[group.index] = parsed.astype("datetime64[ns, UTC]")
+    return result
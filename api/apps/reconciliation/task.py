@@ -0,0 +1,37 @@
+import logging
+
+from celery import group, shared_task
+from django.core.cache import cache
+
+from apps.reconciliation.balances import merchant_ranges, reconcile_range
+
+logger = logging.getLogger(__name__)
+
+LOCK_EXPIRE = 600  # seconds
+
+
+#******************************************************#
+#======= internal balance reconciliation ==============#
+#******************************************************#
+@shared_task(bind=True)
+def reconcile_balances_task(self):
+    """Fan the merchant id ranges out to the reports workers, one task per range."""
+    ranges = merchant_ranges()
+    group(reconcile_balance_range_task.s(first_id, last_id) for first_id, last_id in ranges).apply_async()
+    logger.info(f"BALANCE RECONCILIATION DISPATCHED:: RANGES={len(ranges)}")
+    return len(ranges)
+
+
+@shared_task(bind=True)
+def reconcile_balance_range_task(self, first_id, last_id):
+    # a slow range must not overlap with the same range from the next run
+    lock_id = f"balance-recon-lock:{first_id}"
+    if not cache.add(lock_id, "locked", LOCK_EXPIRE):
+        logger.warning(f"Balance reconciliation for merchants {first_id}-{last_id} already running, skipping...")
+        return
+    try:
+        return reconcile_range(first_id, last_id)
+    except Exception as e:
+        logger.error(f"BALANCE RECONCILIATION FAILED:: RANGE={first_id}-{last_id} REASON={e}", exc_info=True)
+    finally:
+        cache.delete(lock_id)
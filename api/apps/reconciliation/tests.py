@@ -0,0 +1,178 @@
+import datetime
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from apps.reconciliation import matching
+from apps.reconciliation.statements import DEFAULT_FORMAT, normalize, statement_format, to_utc
+
+UTC = datetime.timezone.utc
+
+
+def statement(*rows):
+    """(provider_ref, merchant_ref, msisdn, amount, status, occurred_at) tuples -> statement frame."""
+    raw = pd.DataFrame.from_records(rows, columns=["ref", "client_ref", "msisdn", "amount", "status", "date"])
+    columns = dict(zip(("provider_ref", "merchant_ref", "msisdn", "amount", "status", "occurred_at"), raw.columns))
+    return normalize(raw, columns, DEFAULT_FORMAT)
+
+
+def ours(*rows, in_period=True):
+    """(id, provider_ref, merchant_ref, msisdn, amount, status, is_reverse, created_at) tuples -> our frame."""
+    frame = matching.transactions_frame(list(rows))
+    frame["in_period"] = in_period
+    return frame
+
+
+def at(hour, minute=0):
+    return datetime.datetime(2026, 1, 5, hour, minute, tzinfo=UTC)
+
+
+#================ STATEMENTS ====
+class ToUtcTests(SimpleTestCase):
+    def parse(self, *values, dayfirst=False):
+        return list(to_utc(pd.Series(values, dtype="string"), "Africa/Lagos", dayfirst))
+
+    def test_naive_values_are_provider_local_time(self):
+        self.assertEqual(self.parse("2026-01-05 10:00:00"), [pd.Timestamp(at(9))])
+
+    def test_offsets_are_respected(self):
+        self.assertEqual(self.parse("2026-01-05T10:00:00Z", "2026-01-05T10:00:00+02:00"), [pd.Timestamp(at(10)), pd.Timestamp(at(8))])
+
+    def test_dayfirst_reads_local_dates_day_first(self):
+        self.assertEqual(self.parse("05/01/2026 10:00", dayfirst=True), [pd.Timestamp(at(9))])
+        self.assertEqual(self.parse("01/05/2026 10:00"), [pd.Timestamp(at(9))])
+
+    def test_dayfirst_leaves_iso_values_alone(self):
+        parsed = self.parse("2026-01-05 10:00:00", "2026-01-05T10:00:00+01:00", "05/01/2026 10:00", dayfirst=True)
+        self.assertEqual(parsed, [pd.Timestamp(at(9))] * 3)
+
+    def test_blank_and_junk_are_nat(self):
+        self.assertTrue(all(pd.isna(value) for value in self.parse(None, "yesterday")))
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_columns_are_normalised(self):
+        frame = statement(
+            ("P1", "R1", "+234 803-111-2222", "1,000.50", "Successful", "2026-01-05 10:00:00"),
+            ("", "R2", "08031112223", "abc", "weird", ""),
+        )
+        first, second = frame.iloc[0], frame.iloc[1]
+        self.assertEqual(list(frame["row"]), [1, 2])
+        self.assertEqual((first["provider_ref"], first["msisdn"], first["amount"], first["status"]), ("P1", "08031112222", 100050, "Success"))
+        self.assertEqual(first["occurred_at"], pd.Timestamp(at(9)))
+        self.assertTrue(pd.isna(second["provider_ref"]) and pd.isna(second["amount"]) and pd.isna(second["occurred_at"]))
+        self.assertEqual(second["status"], "Unknown")
+
+    def test_dayfirst_providers(self):
+        raw = pd.DataFrame({"ref": ["P1", "P2"], "amount": ["50", "50"], "status": ["ok", "ok"],
+                            "date": ["05/01/2026 10:00", "2026-01-05 10:00:00"]})
+        columns = {"provider_ref": "ref", "merchant_ref": None, "msisdn": None, "amount": "amount", "status": "status", "occurred_at": "date"}
+        frame = normalize(raw, columns, statement_format("GLO"))
+        self.assertEqual(list(frame["occurred_at"]), [pd.Timestamp(at(9))] * 2)
+
+
+#================ MATCHING ====
+class MatchTests(SimpleTestCase):
+    def outcomes(self, discrepancies):
+        def number(value):
+            return None if pd.isna(value) else int(value)
+
+        rows = zip(discrepancies["outcome"], discrepancies["proposed_action"], discrepancies["statement_row"], discrepancies["transaction_id"])
+        return sorted(((outcome, action, number(row), number(txn_id)) for outcome, action, row, txn_id in rows), key=str)
+
+    def test_passes_match_on_provider_ref_then_merchant_ref_then_msisdn_amount(self):
+        provider = statement(
+            ("P1", "X1", "08030000001", "100", "success", "2026-01-05 10:00:00"),
+            ("", "R2", "08030000002", "200", "success", "2026-01-05 10:00:00"),
+            ("", "", "08030000003", "300", "success", "2026-01-05 10:03:00"),
+        )
+        mine = ours(
+            (1, "P1", "R1", "08030000001", "100", "Success", False, at(9)),
+            (2, None, "R2", "08030000002", "200", "Success", False, at(9)),
+            (3, None, "R3", "08030000003", "300", "Success", False, at(9)),
+        )
+        pairs, discrepancies = matching.match(provider, mine)
+        self.assertEqual(sorted(zip(pairs["row"], pairs["txn_id"], pairs["matched_on"])),
+                         [(1, 1, "provider_ref"), (2, 2, "merchant_ref"), (3, 3, "msisdn_amount")])
+        self.assertTrue(discrepancies.empty)
+
+    def test_repeated_refs_are_duplicates(self):
+        provider = statement(
+            ("P1", "R1", "08030000001", "100", "success", "2026-01-05 10:00:00"),
+            ("P1", "R9", "08030000001", "100", "success", "2026-01-05 10:00:00"),
+            ("P7", "R1", "08030000001", "100", "success", "2026-01-05 10:00:00"),
+        )
+        mine = ours((1, "P1", "R1", "08030000001", "100", "Success", False, at(9)))
+        pairs, discrepancies = matching.match(provider, mine)
+        self.assertEqual(list(pairs["row"]), [1])
+        self.assertEqual(self.outcomes(discrepancies), [
+            ("duplicate", matching.INVESTIGATE, 2, None),
+            ("duplicate", matching.INVESTIGATE, 3, None),
+        ])
+
+    def test_status_and_amount_mismatches(self):
+        provider = statement(
+            ("P1", "", "", "100", "success", ""),
+            ("P2", "", "", "100", "failed", ""),
+            ("P3", "", "", "100", "success", ""),
+            ("P4", "", "", "150", "success", ""),
+        )
+        mine = ours(
+            (1, "P1", "R1", "08030000001", "100", "Processing", False, at(9)),
+            (2, "P2", "R2", "08030000001", "100", "Success", False, at(9)),
+            (3, "P3", "R3", "08030000001", "100", "Failed", True, at(9)),
+            (4, "P4", "R4", "08030000001", "100", "Success", False, at(9)),
+        )
+        _, discrepancies = matching.match(provider, mine)
+        self.assertEqual(self.outcomes(discrepancies), [
+            ("amount_mismatch", matching.INVESTIGATE, 4, 4),
+            ("status_mismatch", matching.INVESTIGATE, 3, 3),
+            ("status_mismatch", matching.MARK_FAILED_AND_REVERSE, 2, 2),
+            ("status_mismatch", matching.MARK_SUCCESS, 1, 1),
+        ])
+
+    def test_nearest_pairs_are_one_to_one(self):
+        # both rows are nearest to transaction 1: the closer row keeps it, the other is left over
+        provider = statement(
+            ("", "", "08030000001", "100", "success", "2026-01-05 10:05:00"),
+            ("", "", "08030000001", "100", "success", "2026-01-05 10:01:00"),
+        )
+        mine = ours(
+            (1, None, "R1", "08030000001", "100", "Success", False, at(9)),
+            (2, None, "R2", "08030000001", "100", "Success", False, at(8, 40)),
+        )
+        pairs = matching._nearest_pairs(provider, mine, "10min")
+        self.assertEqual(sorted(zip(pairs["row"], pairs["txn_id"])), [(2, 1)])
+        self.assertTrue(pairs["row"].is_unique and pairs["txn_id"].is_unique)
+
+        pairs, discrepancies = matching.match(provider, mine, "30min")
+        self.assertEqual(sorted(zip(pairs["row"], pairs["txn_id"])), [(2, 1)])
+        self.assertEqual(self.outcomes(discrepancies), [
+            ("missing_ours", matching.INVESTIGATE, 1, None),
+            ("missing_provider", matching.INVESTIGATE, None, 2),
+        ])
+
+    def test_nearest_pairs_respect_the_window(self):
+        provider = statement(("", "", "08030000001", "100", "success", "2026-01-05 10:20:00"))
+        mine = ours((1, None, "R1", "08030000001", "100", "Success", False, at(9)))
+        self.assertTrue(matching._nearest_pairs(provider, mine, "10min").empty)
+
+    def test_missing_provider_actions(self):
+        mine = ours(
+            (1, None, "R1", "08030000001", "100", "Pending", False, at(9)),
+            (2, None, "R2", "08030000001", "100", "Processing", False, at(9)),
+            (3, None, "R3", "08030000001", "100", "Success", False, at(9)),
+            (4, None, "R4", "08030000001", "100", "Failed", True, at(9)),
+        )
+        report = matching._missing_provider(mine)
+        self.assertEqual(sorted(zip(report["transaction_id"], report["proposed_action"])), [
+            (1, matching.MARK_FAILED_AND_REVERSE),
+            (2, matching.MARK_FAILED_AND_REVERSE),
+            (3, matching.INVESTIGATE),
+        ])
+
+    def test_transactions_outside_the_period_are_not_reported(self):
+        provider = statement(("P1", "", "", "100", "success", ""))
+        mine = ours((1, None, "R1", "08030000001", "100", "Pending", False, at(9)), in_period=False)
+        _, discrepancies = matching.match(provider, mine)
+        self.assertEqual(list(discrepancies["outcome"]), ["missing_ours"])
@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+from .models import DailyTransactionRollup, RollupWatermark
+# Register your models here.
+
+admin.site.register(DailyTransactionRollup)
+admin.site.register(RollupWatermark)
@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.report.rollups import (
+    RefreshLockLost, acquire_refresh_lock, rebuild_range, refresh_daily_rollups, release_refresh_lock,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily transaction rollups for a date range, or run one incremental refresh"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Last day to rebuild (YYYY-MM-DD), defaults to --start")
+        parser.add_argument("--merchant-id", type=int, help="Only rebuild this merchant")
+
+    def handle(self, *args, **options):
+        start = end = None
+        if options["start"]:
+            try:
+                start = datetime.date.fromisoformat(options["start"])
+                end = datetime.date.fromisoformat(options["end"] or options["start"])
+            except ValueError:
+                raise CommandError("Dates must be in YYYY-MM-DD format")
+            if end < start:
+                raise CommandError("--end must not be before --start")
+
+        # refreshes and backfills rebuild the same slices, so they run alone under this lock
+        token = acquire_refresh_lock()
+        if token is None:
+            raise CommandError("A rollup refresh is already running")
+        try:
+            if start is None:
+                slices = refresh_daily_rollups(lock=token)
+                self.stdout.write(f"Incremental refresh rebuilt {slices} slice(s)")
+                return
+            buckets = rebuild_range(start, end, options["merchant_id"], lock=token)
+        except RefreshLockLost:
+            raise CommandError("Lost the rollup refresh lock to another run, stopped")
+        finally:
+            release_refresh_lock(token)
+        self.stdout.write(f"Rebuilt {buckets} rollup bucket(s) between {start} and {end}")
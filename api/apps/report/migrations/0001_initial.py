@@ -0,0 +1,54 @@
+# Generated by Django 4.2.1 on 2026-10-19 16:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('provider', '0001_initial'),
+        ('merchant', '0006_rename_today_tranx_value_merchant_today_tranx_count'),
+        ('product', '0009_transaction_merchant_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'vas_rollup_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('tranx_count', models.PositiveIntegerField(default=0)),
+                ('reversed_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_discount_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='daily_rollups', to='merchant.merchant')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='daily_rollups', to='product.product')),
+                ('provider_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='daily_rollups', to='provider.provideraccount')),
+            ],
+            options={
+                'db_table': 'vas_daily_transaction_rollups',
+                'indexes': [models.Index(fields=['merchant', 'day'], name='vas_rollup_merchant_day_idx'), models.Index(fields=['provider_account', 'day'], name='vas_rollup_provider_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailytransactionrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'merchant', 'product', 'provider_account', 'status'), name='vas_daily_rollup_bucket_uniq'),
+        ),
+    ]
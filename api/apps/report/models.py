@@ -0,0 +1,57 @@
+from django.db import models
+
+from apps.product.models import Product
+from apps.provider.models import ProviderAccount
+
+# Create your models here.
+
+#=============================================#
+#********** Daily Transaction Rollup *********#
+#=============================================#
+class DailyTransactionRollup(models.Model):
+    """
+    Per-day counts and sums of vas_transactions by
+    merchant x product x provider account x status.
+
+    Rows are derived data: a (day, merchant) slice is always rebuilt in full
+    from vas_transactions, so replaying a refresh never double counts.
+    """
+    day = models.DateField()
+    merchant = models.ForeignKey('merchant.Merchant', on_delete=models.DO_NOTHING, related_name='daily_rollups')
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, related_name='daily_rollups')
+    provider_account = models.ForeignKey(ProviderAccount, on_delete=models.DO_NOTHING, related_name='daily_rollups', null=True, blank=True)
+    status = models.CharField(max_length=50)
+    tranx_count = models.PositiveIntegerField(default=0)
+    reversed_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_discount_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "vas_daily_transaction_rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'merchant', 'product', 'provider_account', 'status'],
+                name='vas_daily_rollup_bucket_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['merchant', 'day'], name='vas_rollup_merchant_day_idx'),
+            models.Index(fields=['provider_account', 'day'], name='vas_rollup_provider_day_idx'),
+        ]
+
+
+#=============================================#
+#********** Rollup Watermark ******************#
+#=============================================#
+class RollupWatermark(models.Model):
+    """High-water mark of Transaction.updated_at already folded into rollups"""
+    name = models.CharField(max_length=100, unique=True)
+    last_updated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "vas_rollup_watermarks"
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_updated_at}"
@@ -0,0 +1,228 @@
+"""
+Incremental daily rollups over vas_transactions.
+
+The refresh job walks Transaction.updated_at from the last watermark, works
+out which (day, merchant) slices were touched and rebuilds each slice from
+scratch with a single grouped aggregate. Because a slice is always replaced
+wholesale, re-running a window (or overlapping the previous one) is safe, and
+a transaction that moves from Pending to Failed simply moves between status
+buckets on the next pass.
+
+The window since the watermark is walked in ``REFRESH_BUCKET`` steps of
+updated_at; each step's slices are rebuilt (every slice in its own short
+transaction) and the watermark is moved past the step before the next one
+starts. No transaction spans the run, so a long catch-up holds no locks or
+old snapshots, and a run that dies resumes from the last finished step.
+
+Refreshes and backfills run alone under ``REFRESH_LOCK``. A run stops after
+``REFRESH_BUDGET`` (well inside the lock's expiry) and leaves the rest of a
+long catch-up to the next beat; the lock is re-armed before every step and
+only released by the run that holds it.
+"""
+import datetime
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.product.models import Transaction
+from apps.report.models import DailyTransactionRollup, RollupWatermark
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "daily_transactions"
+# Re-read a little before the watermark so rows committed late (updated_at is
+# set before commit) are still picked up; slices are rebuilt, so overlap is free
+WATERMARK_OVERLAP = timedelta(minutes=2)
+REFRESH_BUCKET = timedelta(minutes=15)  # updated_at span folded in per step
+REFRESH_LOCK = "rollup-refresh-lock"  # cache.add lock held by whoever runs the refresh
+REFRESH_LOCK_EXPIRE = 600  # seconds
+REFRESH_BUDGET = timedelta(minutes=4)  # a run stops stepping after this long
+
+
+class RefreshLockLost(Exception):
+    """The refresh lock expired and was taken by another run."""
+
+
+#================ LOCK ====
+def acquire_refresh_lock():
+    """Token for the refresh lock, or None while another run holds it."""
+    token = uuid.uuid4().hex
+    return token if cache.add(REFRESH_LOCK, token, REFRESH_LOCK_EXPIRE) else None
+
+
+def release_refresh_lock(token):
+    # not atomic, but the window only matters if the lock already timed out
+    if cache.get(REFRESH_LOCK) == token:
+        cache.delete(REFRESH_LOCK)
+
+
+def _hold_refresh_lock(token):
+    """Re-arm the lock for another step; raise if another run took it over."""
+    if token is None:
+        return
+    if cache.get(REFRESH_LOCK) != token:
+        raise RefreshLockLost(REFRESH_LOCK)
+    cache.touch(REFRESH_LOCK, REFRESH_LOCK_EXPIRE)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + timedelta(days=1)
+
+
+#================ SLICE REBUILD ====
+def rebuild_slice(day, merchant_id):
+    """Recompute every rollup bucket for one merchant on one day."""
+    start, end = _day_bounds(day)
+    buckets = (
+        Transaction.objects.filter(merchant_id=merchant_id, created_at__gte=start, created_at__lt=end)
+        .values('product_id', 'provider_account_id', 'status')
+        .annotate(
+            tranx_count=Count('id'),
+            reversed_count=Count('id', filter=Q(is_reverse=True)),
+            total_amount=Sum('amount'),
+            total_discount_amount=Sum('discount_amount'),
+        )
+        .order_by()
+    )
+    rows = [
+        DailyTransactionRollup(day=day, merchant_id=merchant_id, **bucket)
+        for bucket in buckets
+    ]
+    with db_transaction.atomic():
+        DailyTransactionRollup.objects.filter(day=day, merchant_id=merchant_id).delete()
+        DailyTransactionRollup.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_range(start_date, end_date, merchant_id=None, lock=None):
+    """
+    Rebuild all slices with activity between two dates (inclusive); used for
+    backfills. ``lock`` is the refresh lock token, re-armed before each slice.
+    """
+    start, _ = _day_bounds(start_date)
+    _, end = _day_bounds(end_date)
+    queryset = Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    if merchant_id:
+        queryset = queryset.filter(merchant_id=merchant_id)
+    slices = (
+        queryset.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'merchant_id')
+        .distinct()
+        .order_by()
+    )
+    rebuilt = 0
+    for day, m_id in slices.iterator():
+        _hold_refresh_lock(lock)
+        rebuilt += rebuild_slice(day, m_id)
+    return rebuilt
+
+
+#================ INCREMENTAL REFRESH ====
+def _touched_slices(lower, upper):
+    changed = Transaction.objects.filter(updated_at__gte=lower, updated_at__lt=upper, created_at__isnull=False)
+    return set(
+        changed.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'merchant_id')
+        .distinct()
+        .order_by()
+    )
+
+
+def _advance_watermark(watermark, upper):
+    # only forwards, in case a manual run overlapped this one
+    RollupWatermark.objects.filter(id=watermark.id).filter(
+        Q(last_updated_at__isnull=True) | Q(last_updated_at__lt=upper)
+    ).update(last_updated_at=upper, updated_at=timezone.now())
+
+
+def refresh_daily_rollups(overlap=WATERMARK_OVERLAP, bucket=REFRESH_BUCKET, budget=REFRESH_BUDGET, lock=None):
+    """
+    Fold transactions changed since the last watermark into the rollups, one
+    ``bucket`` of updated_at at a time, for at most ``budget``. ``lock`` is the
+    refresh lock token, re-armed before each step.
+
+    Returns the number of (day, merchant) slices rebuilt.
+    """
+    deadline = time.monotonic() + budget.total_seconds()
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    end = timezone.now()
+    if watermark.last_updated_at:
+        lower = watermark.last_updated_at - overlap
+    else:
+        lower = Transaction.objects.filter(updated_at__lt=end).aggregate(first=Min('updated_at'))['first']
+
+    rebuilt = 0
+    if lower is None:  # nothing to fold in yet
+        lower = end
+        _advance_watermark(watermark, end)
+    while lower < end and time.monotonic() < deadline:
+        _hold_refresh_lock(lock)
+        upper = min(lower + bucket, end)
+        for day, merchant_id in sorted(_touched_slices(lower, upper)):
+            rebuild_slice(day, merchant_id)
+            rebuilt += 1
+        _advance_watermark(watermark, upper)
+        lower = upper
+
+    if lower < end:
+        logger.warning(f"ROLLUP REFRESH:: BUDGET SPENT, BEHIND BY {end - lower}")
+    logger.info(f"ROLLUP REFRESH:: SLICES={rebuilt} WATERMARK={lower.isoformat()}")
+    return rebuilt
+
+
+#================ REPORT QUERIES (rollups only) ====
+def merchant_daily_summary(merchant_id, start_date, end_date, product_code=None):
+    queryset = DailyTransactionRollup.objects.filter(merchant_id=merchant_id, day__gte=start_date, day__lte=end_date)
+    if product_code:
+        queryset = queryset.filter(product__product_code=product_code)
+    return (
+        queryset.values('day', 'product__product_code', 'status')
+        .annotate(
+            tranx_count=Sum('tranx_count'),
+            reversed_count=Sum('reversed_count'),
+            total_amount=Sum('total_amount'),
+            total_discount_amount=Sum('total_discount_amount'),
+        )
+        .order_by('day', 'product__product_code', 'status')
+    )
+
+
+def provider_volume(start_date, end_date):
+    return (
+        DailyTransactionRollup.objects.filter(day__gte=start_date, day__lte=end_date)
+        .values('day', 'provider_account__account_name', 'status')
+        .annotate(tranx_count=Sum('tranx_count'), total_amount=Sum('total_amount'))
+        .order_by('day', 'provider_account__account_name', 'status')
+    )
+
+
+def success_rates(start_date, end_date, merchant_id=None):
+    """Success ratio per product over the range, computed from rollups."""
+    queryset = DailyTransactionRollup.objects.filter(day__gte=start_date, day__lte=end_date)
+    if merchant_id:
+        queryset = queryset.filter(merchant_id=merchant_id)
+    rows = (
+        queryset.values('product__product_code')
+        .annotate(
+            total=Sum('tranx_count'),
+            success=Sum('tranx_count', filter=Q(status='Success')),
+        )
+        .order_by('product__product_code')
+    )
+    return [
+        {
+            'product_code': row['product__product_code'],
+            'total': row['total'],
+            'success': row['success'] or 0,
+            'success_rate': round((row['success'] or 0) / row['total'], 4) if row['total'] else 0,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,23 @@
+import logging
+
+from celery import shared_task
+from apps.report.rollups import acquire_refresh_lock, refresh_daily_rollups, release_refresh_lock
+
+logger = logging.getLogger(__name__)
+
+
+#******************************************************#
+#======= fold changed transactions into rollups =======#
+#******************************************************#
+@shared_task(bind=True)
+def refresh_daily_rollups_task(self):
+    token = acquire_refresh_lock()
+    if token is None:
+        logger.warning("Rollup refresh already running, skipping...")
+        return
+    try:
+        return refresh_daily_rollups(lock=token)
+    except Exception as e:
+        logger.error(f"ROLLUP REFRESH FAILED:: REASON={e}", exc_info=True)
+    finally:
+        release_refresh_lock(token)
@@ -0,0 +1,138 @@
+import datetime
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.merchant.models import Merchant, User
+from apps.product.models import Product, ProductCategory, Transaction
+from apps.provider.models import Provider, ProviderAccount
+from apps.report import rollups
+from apps.report.models import DailyTransactionRollup, RollupWatermark
+
+DAY = datetime.date(2026, 1, 5)
+
+
+def at(hour, day=DAY):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time(hour)))
+
+
+class RollupTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email="rollup@example.com", username="rollup")
+        cls.merchant = Merchant.objects.create(business_name="rollup", current_balance=Decimal("0"), user=user)
+        provider = Provider.objects.create(name="MTN", provider_code="MTN")
+        cls.account = ProviderAccount.objects.create(provider=provider, account_name="mtn")
+        cls.category = ProductCategory.objects.create(name="Airtime", category_code="AIRTIME")
+        cls.product = Product.objects.create(product_name="MTN", product_code="MTN", description="", category=cls.category)
+
+    def setUp(self):
+        cache.delete(rollups.REFRESH_LOCK)
+        self.refs = 0
+
+    def tearDown(self):
+        cache.delete(rollups.REFRESH_LOCK)
+
+    def transaction(self, created_at, status="Success", amount="100", updated_at=None):
+        self.refs += 1
+        txn = Transaction.objects.create(
+            amount=Decimal(amount), discount_amount=Decimal(amount) - 1, beneficiary_account="08030000001",
+            product=self.product, product_category=self.category, description="", merchant_ref=f"R{self.refs}",
+            status=status, merchant=self.merchant, provider_account=self.account,
+        )
+        Transaction.objects.filter(id=txn.id).update(created_at=created_at, updated_at=updated_at or timezone.now())
+        return txn
+
+    def buckets(self, day=DAY):
+        return dict(
+            DailyTransactionRollup.objects.filter(day=day, merchant=self.merchant).values_list("status", "tranx_count")
+        )
+
+    def set_watermark(self, value):
+        RollupWatermark.objects.update_or_create(name=rollups.WATERMARK_NAME, defaults={"last_updated_at": value})
+
+
+#================ SLICE REBUILD ====
+class RebuildSliceTests(RollupTestCase):
+    def test_slice_is_replaced_wholesale(self):
+        self.transaction(at(9))
+        self.transaction(at(10), amount="50")
+        self.transaction(at(11), status="Failed")
+        self.transaction(at(9, DAY + timedelta(days=1)))
+        self.assertEqual(rollups.rebuild_slice(DAY, self.merchant.id), 2)
+        success = DailyTransactionRollup.objects.get(day=DAY, status="Success")
+        self.assertEqual((success.tranx_count, success.total_amount, success.total_discount_amount), (2, Decimal("150"), Decimal("148")))
+
+        # rebuilding again never double counts
+        rollups.rebuild_slice(DAY, self.merchant.id)
+        self.assertEqual(self.buckets(), {"Success": 2, "Failed": 1})
+        self.assertEqual(self.buckets(DAY + timedelta(days=1)), {})
+
+    def test_rebuild_range_covers_every_day(self):
+        self.transaction(at(9))
+        self.transaction(at(9, DAY + timedelta(days=1)), status="Failed")
+        self.assertEqual(rollups.rebuild_range(DAY, DAY + timedelta(days=1)), 2)
+        self.assertEqual(self.buckets(DAY + timedelta(days=1)), {"Failed": 1})
+
+
+#================ INCREMENTAL REFRESH ====
+class RefreshTests(RollupTestCase):
+    def test_status_change_moves_between_buckets(self):
+        txn = self.transaction(at(9), status="Processing")
+        self.transaction(at(10))
+        rollups.refresh_daily_rollups()
+        self.assertEqual(self.buckets(), {"Processing": 1, "Success": 1})
+
+        Transaction.objects.filter(id=txn.id).update(status="Failed", updated_at=timezone.now())
+        rollups.refresh_daily_rollups()
+        self.assertEqual(self.buckets(), {"Failed": 1, "Success": 1})
+
+    def test_rows_committed_behind_the_watermark_are_picked_up(self):
+        now = timezone.now()
+        self.set_watermark(now)
+        # updated_at is set before commit, so a row can land just behind the watermark
+        self.transaction(at(9), updated_at=now - timedelta(minutes=1))
+        self.transaction(at(9, DAY - timedelta(days=1)), updated_at=now - rollups.WATERMARK_OVERLAP - timedelta(minutes=1))
+        rollups.refresh_daily_rollups()
+        self.assertEqual(self.buckets(), {"Success": 1})
+        self.assertEqual(self.buckets(DAY - timedelta(days=1)), {})
+        self.assertGreaterEqual(RollupWatermark.objects.get().last_updated_at, now)
+
+    def test_watermark_only_moves_forward(self):
+        later = timezone.now() + timedelta(hours=1)
+        self.set_watermark(later)
+        rollups.refresh_daily_rollups()
+        self.assertEqual(RollupWatermark.objects.get().last_updated_at, later)
+
+    def test_catch_up_stops_at_the_budget(self):
+        self.transaction(at(9), updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(rollups.refresh_daily_rollups(budget=timedelta(0)), 0)
+        self.assertIsNone(RollupWatermark.objects.get().last_updated_at)
+        self.assertEqual(rollups.refresh_daily_rollups(), 1)
+
+    def test_a_lost_lock_stops_the_run(self):
+        self.transaction(at(9))
+        token = rollups.acquire_refresh_lock()
+        cache.set(rollups.REFRESH_LOCK, "someone-else")  # ours expired and was taken
+        with self.assertRaises(rollups.RefreshLockLost):
+            rollups.refresh_daily_rollups(lock=token)
+        rollups.release_refresh_lock(token)
+        self.assertEqual(cache.get(rollups.REFRESH_LOCK), "someone-else")
+
+
+class RebuildCommandTests(RollupTestCase):
+    def test_backfill_waits_for_the_refresh_lock(self):
+        self.transaction(at(9))
+        token = rollups.acquire_refresh_lock()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", start=DAY.isoformat())
+        rollups.release_refresh_lock(token)
+        call_command("rebuild_rollups", start=DAY.isoformat(), stdout=io.StringIO())
+        self.assertEqual(self.buckets(), {"Success": 1})
+        self.assertIsNone(cache.get(rollups.REFRESH_LOCK))
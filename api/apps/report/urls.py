@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import ReportApiView
+
+urlpatterns = [
+
+    #==================== REPORTING API (rollups) =========================
+    path('getDailySummary', ReportApiView.as_view({'get':'get_daily_summary'}),name="getDailySummary"),
+    path('getSuccessRate', ReportApiView.as_view({'get':'get_success_rate'}),name="getSuccessRate"),
+]
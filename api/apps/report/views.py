@@ -0,0 +1,87 @@
+import datetime
+import logging
+
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from apps.report.rollups import merchant_daily_summary, success_rates
+from config.db_router import reads
+from config.helper import CustomAuthentication, JsonResponse
+from config.response_codes import SUCCESS, INVALID_PAYLOAD, NO_DATA_FOUND, PROCESSING_ERROR
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORT_DAYS = 366
+# Create your views here.
+
+
+class ReportApiView(viewsets.ViewSet):
+    """Merchant reports. Every query here reads vas_daily_transaction_rollups only, from a replica when one is fresh."""
+    authentication_classes = [CustomAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    #******************************************************#
+    #======= daily summary by product and status ==========#
+    #******************************************************#
+    def get_daily_summary(self, request):
+        try:
+            date_range = self._parse_date_range(request)
+            if isinstance(date_range, JsonResponse):
+                return date_range
+            start_date, end_date = date_range
+
+            with reads():
+                rows = list(merchant_daily_summary(
+                    request.auth.merchant_id, start_date, end_date,
+                    product_code=request.query_params.get("product_code"),
+                ))
+            data = [
+                {
+                    "day": row["day"].isoformat(),
+                    "product_code": row["product__product_code"],
+                    "status": row["status"],
+                    "tranx_count": row["tranx_count"],
+                    "reversed_count": row["reversed_count"],
+                    "total_amount": str(row["total_amount"]),
+                    "total_discount_amount": str(row["total_discount_amount"]),
+                }
+                for row in rows
+            ]
+            if not data:
+                return JsonResponse(code=NO_DATA_FOUND, msg="No record found")
+            return JsonResponse(code=SUCCESS, data=data)
+        except Exception as e:
+            logger.error(f"GET DAILY SUMMARY FAILED:: REASON={e}")
+            return JsonResponse(code=PROCESSING_ERROR, msg="Unable to retrieve report, please try again")
+
+    #******************************************************#
+    #======= success rate by product ======================#
+    #******************************************************#
+    def get_success_rate(self, request):
+        try:
+            date_range = self._parse_date_range(request)
+            if isinstance(date_range, JsonResponse):
+                return date_range
+            start_date, end_date = date_range
+
+            with reads():
+                data = success_rates(start_date, end_date, merchant_id=request.auth.merchant_id)
+            if not data:
+                return JsonResponse(code=NO_DATA_FOUND, msg="No record found")
+            return JsonResponse(code=SUCCESS, data=data)
+        except Exception as e:
+            logger.error(f"GET SUCCESS RATE FAILED:: REASON={e}")
+            return JsonResponse(code=PROCESSING_ERROR, msg="Unable to retrieve report, please try again")
+
+    def _parse_date_range(self, request):
+        """Read and validate start_date/end_date (YYYY-MM-DD, inclusive)"""
+        try:
+            start_date = datetime.date.fromisoformat(request.query_params.get("start_date", ""))
+            end_date = datetime.date.fromisoformat(request.query_params.get("end_date", ""))
+        except ValueError:
+            return JsonResponse(code=INVALID_PAYLOAD, msg="start_date and end_date are required in YYYY-MM-DD format", status=400)
+        if end_date < start_date:
+            return JsonResponse(code=INVALID_PAYLOAD, msg="end_date must not be before start_date", status=400)
+        if (end_date - start_date).days >= MAX_REPORT_DAYS:
+            return JsonResponse(code=INVALID_PAYLOAD, msg=f"Date range cannot exceed {MAX_REPORT_DAYS} days", status=400)
+        return start_date, end_date
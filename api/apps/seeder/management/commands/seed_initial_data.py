@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from django.core.cache import cache
+from apps.product.cache_utils import clear_all_product_caches
 
 from apps.provider.models import Provider, ProviderAccount
 from apps.product.models import ProductCategory, Product
@@ -420,9 +420,7 @@ class Command(BaseCommand):
         seed_products(provider_map, provider_account_map, category_map)
         
         # Clear product-related caches after seeding
-        cache.delete("product_categories_active")
-        # Clear product caches (pattern-based clearing would require django-redis)
-        self.stdout.write(self.style.WARNING("Note: Product caches may need manual clearing if using Redis"))
+        transaction.on_commit(clear_all_product_caches)
 
         self.stdout.write(self.style.SUCCESS("Seeded users, merchant, providers, provider accounts, product categories, and products successfully."))
 
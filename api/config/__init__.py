@@ -0,0 +1,5 @@
+# load the Celery app with Django so tasks published from the API use its
+# broker, routes and queues (and the tracing publish hook)
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -0,0 +1,270 @@
+"""
+Stampede-safe cache reads.
+
+``get_or_compute(key, compute, ttl, name)`` is the one way the product app and
+authentication read computed values from the shared cache. Entries are stored
+as ``(value, soft_expires_at, delta)``:
+
+    - the Redis TTL is ``ttl`` plus a stale window; after the (jittered) soft
+      expiry the value is still served while exactly one caller recomputes it
+      (stale-while-revalidate)
+    - before the soft expiry a caller may refresh early with probability
+      growing as expiry nears, scaled by ``delta`` (how long the value took to
+      compute) - the XFetch rule - so hot keys are usually renewed before
+      anyone sees them expire
+    - on a cold miss one caller takes a short lock (``cache.add``) and
+      computes; the others wait briefly for its result instead of all
+      hitting the database (single-flight)
+
+In front of the shared cache sits a per-worker near tier (``LocalTTLCache``,
+bounded by entry count and bytes): fresh entries and tag versions are kept
+in process for ``NEAR_CACHE_TTL`` seconds, so a hot key costs no Redis round
+trip, decompression or unpickling at all. Tag invalidations are broadcast
+over the pub/sub bus in ``config.localcache``; while the subscription is down
+the near tier falls back to a few seconds of TTL. Hit/miss metrics are
+reported per tier: ``<name>_local`` and ``<name>``.
+
+Entries can carry tags ("product:MTNVTU", "merchant:1234567"). Every tag has
+a version number in the cache and the entry is stored under its key plus the
+versions of its tags, so ``invalidate_tags`` (a version bump) orphans every
+entry carrying the tag at once; orphans age out on their TTL. The versions are
+read before computing, so a write racing an invalidation lands under the old
+versions and is never served.
+
+Entry keys are prefixed with ``ENTRY_PREFIX``, so a plain ``cache.set`` under
+the same name (older code, a rolling deploy) never collides with an envelope,
+and anything under the prefix that is not an envelope reads as a miss. Bump
+the prefix whenever the envelope layout changes.
+
+Values are stored as plain data (``config.cachecodec``); anything else goes
+through a ``Record``. ``None`` results are never cached. Entries written here must only be read
+through ``get_or_compute``, and values it returns may be shared with other
+requests in the same worker: treat them as read-only.
+"""
+import logging
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from config import cachecodec
+from config.localcache import LocalTTLCache, ensure_listener, publish_invalidation
+from config.metrics import CACHE_REQUESTS, NEAR_CACHE_BYTES, NEAR_CACHE_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALE_TTL = 60  # seconds a value may be served past its soft expiry
+TTL_JITTER = 0.1  # +/- fraction applied to every soft expiry
+LOCK_TIMEOUT = 10  # seconds; a crashed holder frees the key after this
+LOCK_WAIT = 2.0  # seconds a cold-miss caller waits for the lock holder
+LOCK_POLL = 0.025
+
+ENTRY_PREFIX = "swr:v2:"  # envelope layout version, see the module docstring
+NEAR_NAMESPACE = "near"
+TAGS_NAMESPACE = "tags"
+_near = LocalTTLCache(NEAR_NAMESPACE, maxsize=20000, ttl=settings.NEAR_CACHE_TTL, max_bytes=settings.NEAR_CACHE_MAX_BYTES)
+_near_tags = LocalTTLCache(TAGS_NAMESPACE, maxsize=20000, ttl=settings.NEAR_CACHE_TTL)
+
+
+#================ TAGS ====
+def _tag_key(tag):
+    return f"tag:{tag}"
+
+
+def _fresh_version():
+    # larger than anything handed out before, so a version evicted from the
+    # cache never brings back entries stored under an older one
+    return int(time.time() * 1000000)
+
+
+def tag_versions(tags):
+    ensure_listener()
+    generation = _near_tags.generation
+    versions = {tag: _near_tags.get(tag) for tag in tags}
+    missing = {_tag_key(tag): tag for tag, version in versions.items() if version is None}
+    if not missing:
+        CACHE_REQUESTS.labels("cache_tags_local", "hit").inc()
+        return [versions[tag] for tag in tags]
+    CACHE_REQUESTS.labels("cache_tags_local", "miss").inc()
+    found = cache.get_many(list(missing))
+    absent = [k for k in missing if k not in found]
+    if absent:
+        for k in absent:
+            cache.add(k, _fresh_version(), None)
+        found.update(cache.get_many(absent))
+    for k, tag in missing.items():
+        versions[tag] = found.get(k, 0)
+        if versions[tag]:
+            _near_tags.set(tag, versions[tag], generation=generation)
+    return [versions[tag] for tag in tags]
+
+
+def tagged_key(key, tags):
+    if not tags:
+        return key
+    return f"{key}@{'.'.join(str(v) for v in tag_versions(tags))}"
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.add(_tag_key(tag), _fresh_version(), None)
+        publish_invalidation(TAGS_NAMESPACE, tag)
+    logger.info("CACHE TAGS INVALIDATED:: %s", ",".join(tags))
+
+
+def _entry_key(key, tags):
+    return f"{ENTRY_PREFIX}{tagged_key(key, tags)}"
+
+
+#================ RECORDS ====
+class Record:
+    """
+    Explicit, versioned cache form of a value that is not plain data (an ORM
+    instance, say). ``fields(value)`` lists what to keep, ``build(*fields)``
+    makes the value again; bump ``version`` whenever either changes, stored
+    records of another version are treated as a miss.
+    """
+
+    version = 1
+
+    def fields(self, value):
+        raise NotImplementedError
+
+    def build(self, *fields):
+        raise NotImplementedError
+
+    def dump(self, value):
+        return [self.version, *self.fields(value)]
+
+    def load(self, record):
+        if not record or record[0] != self.version:
+            return None
+        return self.build(*record[1:])
+
+
+#================ ENTRIES ====
+def _lock_key(key):
+    return f"{key}:lock"
+
+
+def _acquire(key):
+    token = uuid.uuid4().hex
+    return token if cache.add(_lock_key(key), token, LOCK_TIMEOUT) else None
+
+
+def _release(key, token):
+    # not atomic, but the window only matters if the lock already timed out
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _promote(key, value, stored, soft_expires_at, generation):
+    """Keep a fresh value in this worker until shortly before its soft expiry."""
+    ttl = min(_near.ttl, soft_expires_at - time.time())
+    if ttl <= 0 or generation is None:
+        return
+    _near.set(key, (value, soft_expires_at), ttl, size=cachecodec.size(stored), generation=generation)
+    NEAR_CACHE_BYTES.labels(NEAR_NAMESPACE).set(_near.size_bytes)
+    NEAR_CACHE_ENTRIES.labels(NEAR_NAMESPACE).set(len(_near))
+
+
+def _store(key, value, ttl, stale_ttl, delta, record, generation=None):
+    stored = record.dump(value) if record else value
+    soft_ttl = ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)
+    soft_expires_at = time.time() + soft_ttl
+    cache.set(key, (stored, soft_expires_at, delta), int(soft_ttl + stale_ttl) + 1)
+    _promote(key, value, stored, soft_expires_at, generation)
+
+
+def _load(entry, record):
+    """Shared-cache entry -> value, or None for a record of another version or no envelope at all."""
+    if not isinstance(entry, (list, tuple)) or len(entry) != 3:  # msgpack hands tuples back as lists
+        return None
+    return record.load(entry[0]) if record else entry[0]
+
+
+def _compute_and_set(key, compute, ttl, stale_ttl, record, generation=None):
+    started = time.perf_counter()
+    value = compute()
+    if value is not None:
+        _store(key, value, ttl, stale_ttl, time.perf_counter() - started, record, generation)
+    return value
+
+
+def _refresh(key, compute, ttl, stale_ttl, record, value, name, result, generation):
+    """One caller recomputes; the rest keep the value they already have."""
+    token = _acquire(key)
+    if token is None:
+        CACHE_REQUESTS.labels(name, result).inc()
+        return value
+    CACHE_REQUESTS.labels(name, "refresh").inc()
+    try:
+        fresh = _compute_and_set(key, compute, ttl, stale_ttl, record, generation)
+    except Exception as e:
+        logger.error(f"CACHE REFRESH FAILED FOR {key}, SERVING CACHED VALUE:: REASON={e}")
+        return value
+    finally:
+        _release(key, token)
+    return value if fresh is None else fresh
+
+
+def set_value(key, value, ttl, tags=(), stale_ttl=DEFAULT_STALE_TTL, record=None):
+    """Store ``value`` the way ``get_or_compute`` expects to find it."""
+    _store(_entry_key(key, tags), value, ttl, stale_ttl, 0.0, record)
+
+
+def get_or_compute(key, compute, ttl, name, tags=(), stale_ttl=DEFAULT_STALE_TTL, beta=1.0, record=None):
+    """
+    Cached value for ``key``, calling ``compute()`` when it is missing or due.
+
+    ``name`` labels the cache in the hit/miss metrics; ``tags`` are the
+    invalidation tags of the entry; ``record`` (a ``Record``) converts values
+    that are not plain data; ``beta`` > 1 favours earlier refreshes, 0
+    disables them.
+    """
+    key = _entry_key(key, tags)
+    near = _near.get(key)
+    if near is not None:
+        CACHE_REQUESTS.labels(f"{name}_local", "hit").inc()
+        return near[0]
+    CACHE_REQUESTS.labels(f"{name}_local", "miss").inc()
+
+    generation = _near.generation
+    entry = cache.get(key)
+    value = _load(entry, record)
+    if value is not None:
+        _, soft_expires_at, delta = entry
+        now = time.time()
+        if now >= soft_expires_at:
+            return _refresh(key, compute, ttl, stale_ttl, record, value, name, "stale", generation)
+        if beta and delta and now - delta * beta * math.log(1.0 - random.random()) >= soft_expires_at:
+            return _refresh(key, compute, ttl, stale_ttl, record, value, name, "hit", generation)
+        CACHE_REQUESTS.labels(name, "hit").inc()
+        _promote(key, value, entry[0], soft_expires_at, generation)
+        return value
+
+    CACHE_REQUESTS.labels(name, "miss").inc()
+    token = _acquire(key)
+    if token is None:
+        # someone else is computing it: wait for their result
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            entry = cache.get(key)
+            value = _load(entry, record)
+            if value is not None:
+                _promote(key, value, entry[0], entry[1], generation)
+                return value
+            if cache.get(_lock_key(key)) is None:
+                break
+        return _compute_and_set(key, compute, ttl, stale_ttl, record, generation)
+    try:
+        return _compute_and_set(key, compute, ttl, stale_ttl, record, generation)
+    finally:
+        _release(key, token)
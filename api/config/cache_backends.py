@@ -0,0 +1,45 @@
+"""
+Cache backends used by settings.CACHES.
+
+TracedRedisCache is django-redis with a client span around every call, so
+cache round trips show up inside request and task traces (nothing is
+recorded outside a trace).
+
+MsgpackSerializer is the django-redis SERIALIZER; it also decides on
+compression (see config.cachecodec), so no COMPRESSOR is configured.
+"""
+from django_redis.cache import RedisCache
+from django_redis.serializers.base import BaseSerializer
+
+from config import cachecodec
+from config.tracing import start_span
+
+
+def _traced(operation):
+    def method(self, *args, **kwargs):
+        with start_span(f"cache.{operation}", kind="client", root=False):
+            return getattr(super(TracedRedisCache, self), operation)(*args, **kwargs)
+    method.__name__ = operation
+    return method
+
+
+class TracedRedisCache(RedisCache):
+    get = _traced("get")
+    set = _traced("set")
+    add = _traced("add")
+    delete = _traced("delete")
+    get_many = _traced("get_many")
+    set_many = _traced("set_many")
+    delete_many = _traced("delete_many")
+    incr = _traced("incr")
+    decr = _traced("decr")
+    touch = _traced("touch")
+    has_key = _traced("has_key")
+
+
+class MsgpackSerializer(BaseSerializer):
+    def dumps(self, value):
+        return cachecodec.dumps(value)
+
+    def loads(self, value):
+        return cachecodec.loads(value)
@@ -0,0 +1,80 @@
+"""
+Wire format for values in the shared cache.
+
+Values are msgpack - the cache only holds plain data: the ``config.cache``
+envelope, catalog bodies, principal and product records (see
+``apps.product.records``). A one-byte header says how the rest is encoded:
+
+    0x01  msgpack
+    0x02  msgpack, zlib compressed (payloads of ``COMPRESS_MIN_BYTES`` or more)
+    0x03  pickle - fallback for a value msgpack cannot encode; counted in
+          the metrics so it can be turned into a record
+
+Anything else is read as the previous format (pickle, zlib compressed by
+django-redis above 15 bytes) so values written before the switch stay
+readable until they expire.
+
+msgpack has no tuples: sequences come back as lists.
+"""
+import pickle
+import time
+import zlib
+
+import msgpack
+
+from config.metrics import CACHE_DECODE_SECONDS, CACHE_PAYLOAD_BYTES
+
+MSGPACK = 0x01
+MSGPACK_ZLIB = 0x02
+PICKLE = 0x03
+FORMATS = {MSGPACK: "msgpack", MSGPACK_ZLIB: "msgpack_zlib", PICKLE: "pickle"}
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 1  # the payloads are small; speed over ratio
+
+
+def encode(value):
+    """value -> (marker, payload) without the header or metrics."""
+    try:
+        payload = msgpack.packb(value, use_bin_type=True)
+    except (TypeError, ValueError, OverflowError):
+        return PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(payload, COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            return MSGPACK_ZLIB, compressed
+    return MSGPACK, payload
+
+
+def dumps(value):
+    marker, payload = encode(value)
+    CACHE_PAYLOAD_BYTES.labels(FORMATS[marker]).observe(len(payload) + 1)
+    return bytes((marker,)) + payload
+
+
+def _legacy(data):
+    try:
+        data = zlib.decompress(data)
+    except zlib.error:
+        pass
+    return pickle.loads(data)
+
+
+def loads(data):
+    started = time.perf_counter()
+    marker = data[0] if data else None
+    if marker == MSGPACK:
+        value = msgpack.unpackb(data[1:], raw=False, strict_map_key=False)
+    elif marker == MSGPACK_ZLIB:
+        value = msgpack.unpackb(zlib.decompress(data[1:]), raw=False, strict_map_key=False)
+    elif marker == PICKLE:
+        value = pickle.loads(data[1:])
+    else:
+        value = _legacy(data)
+    CACHE_DECODE_SECONDS.labels(FORMATS.get(marker, "legacy")).observe(time.perf_counter() - started)
+    return value
+
+
+def size(value):
+    """Encoded size of ``value``, for size-bounded caches."""
+    return len(encode(value)[1]) + 1
@@ -1,7 +1,9 @@
 import os
+import shutil
+import sys
 import logging
 from celery import Celery
-from celery.signals import setup_logging  # noqa
+from celery.signals import setup_logging, worker_init, worker_process_shutdown  # noqa
 from . import settings
 
 
@@ -30,6 +32,44 @@ def setup_celery_logging(**kwargs):
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+# app task modules are named task.py (apps.product.task, apps.report.task)
+app.autodiscover_tasks(related_name='task')
+
+# carry trace context from the publishing request into the task
+from config.tracing import install_celery_hooks  # noqa: E402
+install_celery_hooks()
+
+
+@worker_init.connect
+def setup_worker(**kwargs):
+    # -P gevent: let psycopg2 yield to other greenlets while a query runs
+    gevent_monkey = sys.modules.get("gevent.monkey")
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("socket"):
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    # workers are not behind gunicorn: serve their metrics (throttling) on a port of their own
+    from django.conf import settings as django_settings
+    if django_settings.CELERY_METRICS_PORT:
+        from prometheus_client import REGISTRY, CollectorRegistry, multiprocess, start_http_server
+        metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+        if metrics_dir:
+            # prefork children write their samples here, as gunicorn workers do;
+            # start clean so a previous run's samples are not aggregated again
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+            os.makedirs(metrics_dir, exist_ok=True)
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        start_http_server(django_settings.CELERY_METRICS_PORT, registry=registry)
+
+
+@worker_process_shutdown.connect
+def drop_process_metrics(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
 
 
 
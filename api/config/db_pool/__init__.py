@@ -0,0 +1,7 @@
+"""
+PostgreSQL backend with a per-process connection pool.
+
+Set ``ENGINE`` to ``config.db_pool`` (settings does this when
+``DATABASE_POOL_SIZE`` is set). See ``pool.ConnectionPool`` for behaviour and
+``base.DatabaseWrapper`` for how Django's connection handling maps onto it.
+"""
@@ -0,0 +1,78 @@
+"""
+Django's PostgreSQL backend (psycopg2) with pooled connections.
+
+Django still opens and closes "its" connection per request (``CONN_MAX_AGE``
+should be 0); opening checks a connection out of the process-wide pool and
+closing hands it back, rolled back to idle. Each greenlet/thread has its own
+``DatabaseWrapper`` as usual, so ``POOL.SIZE`` bounds the connections one
+worker holds however many requests it is serving.
+
+Pool options live in ``DATABASES[alias]["POOL"]``: ``SIZE``, ``TIMEOUT``
+(seconds to wait for a free connection), ``MAX_LIFETIME`` and
+``HEALTH_CHECK_INTERVAL`` (seconds).
+
+Works behind pgbouncer in transaction mode provided server-side cursors are
+disabled (``DISABLE_SERVER_SIDE_CURSORS``) and the database role carries the
+session settings (time zone) rather than per-connection ``SET``s.
+"""
+import os
+import threading
+
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions
+
+from config.db_pool.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, error_class):
+    key = (os.getpid(), alias)  # never share sockets with a forked parent
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = settings_dict.get("POOL", {})
+                pool = _pools[key] = ConnectionPool(
+                    alias,
+                    size=int(options.get("SIZE", 10)),
+                    timeout=float(options.get("TIMEOUT", 5)),
+                    max_lifetime=float(options.get("MAX_LIFETIME", 1800)),
+                    health_check_interval=float(options.get("HEALTH_CHECK_INTERVAL", 30)),
+                    error_class=error_class,
+                )
+    return pool
+
+
+def _reset(connection):
+    """Back to idle outside a transaction; False if the connection cannot be reused."""
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+        connection.rollback()
+        return connection.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+    return status == extensions.TRANSACTION_STATUS_IDLE
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict, self.Database.OperationalError)
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.checkout(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params), owner=self)
+        # what the parent sets while connecting, needed for reused connections too
+        try:
+            self.isolation_level = IsolationLevel(self.settings_dict["OPTIONS"]["isolation_level"])
+        except KeyError:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.checkin(self.connection, _reset)
@@ -0,0 +1,208 @@
+"""
+Bounded pool of raw DB-API connections, one per worker process and alias.
+
+Checkout hands out the most recently used idle connection (the warmest, and
+it lets surplus connections age out), opening a new one while fewer than
+``size`` exist. When all are checked out the caller waits up to ``timeout``
+seconds, then gets ``error_class``. Waiting is on a ``threading.Condition``,
+which gevent's monkey patching turns into a greenlet-aware wait, so one
+greenlet waiting for a connection never blocks the others.
+
+Connections are dropped instead of reused when they:
+
+    - are older than ``max_lifetime`` (jittered, so they do not all reconnect
+      together)
+    - fail a ``SELECT 1`` health check, run when they sat idle longer than
+      ``health_check_interval``
+    - come back closed, or with a transaction that cannot be rolled back
+
+A checkout may name an ``owner`` (the ``DatabaseWrapper``): if the owner is
+garbage collected while still holding the connection, a weakref finalizer
+hands the connection back as abandoned and its slot is freed, instead of
+counting against ``size`` for the life of the process. Finalizers can run
+during any allocation, so they only queue the connection and never wait for
+the pool lock; the next checkout (or a waiter) reclaims the slot.
+"""
+import collections
+import logging
+import random
+import threading
+import time
+import weakref
+
+from config.metrics import DB_POOL_CHECKOUTS, DB_POOL_CONNECTIONS, DB_POOL_DISCARDS, DB_POOL_WAIT
+
+logger = logging.getLogger(__name__)
+
+LIFETIME_JITTER = 0.1
+WAIT_SLICE = 0.5  # seconds; waiters re-check for abandoned connections this often
+
+
+class ConnectionPool:
+    def __init__(self, alias, size=10, timeout=5.0, max_lifetime=1800, health_check_interval=30,
+                 error_class=RuntimeError):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.error_class = error_class
+        self._idle = []  # [(connection, returned_at)]
+        self._expires = {}  # id(connection) -> monotonic deadline
+        self._open = 0
+        self._owned = {}  # id(connection) -> weakref.finalize on the owner
+        self._abandoned = collections.deque()  # connections whose owner was collected
+        self._cond = threading.Condition(threading.Lock())
+
+    #================ CHECKOUT ====
+    def checkout(self, connect, owner=None):
+        """
+        A connection from the pool, or a new one from ``connect()``. When
+        ``owner`` is collected before ``checkin`` the connection's slot is freed.
+        """
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                abandoned = self._reclaim_abandoned()
+                while not self._idle and self._open >= self.size:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        DB_POOL_CHECKOUTS.labels(self.alias, "timeout").inc()
+                        DB_POOL_WAIT.labels(self.alias).observe(time.monotonic() - started)
+                        logger.error("DB POOL EXHAUSTED:: alias=%s size=%s waited=%.3fs", self.alias, self.size, self.timeout)
+                        raise self.error_class(
+                            f"connection pool '{self.alias}' exhausted: {self.size} connections in use for {self.timeout}s"
+                        )
+                    waited = True
+                    self._cond.wait(min(remaining, WAIT_SLICE))
+                    abandoned += self._reclaim_abandoned()
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                else:
+                    connection, returned_at = None, None
+                    self._open += 1  # reserve the slot, connect outside the lock
+            for stale in abandoned:
+                self._close_quietly(stale)
+
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                self._expires[id(connection)] = time.monotonic() + self.max_lifetime * random.uniform(1 - LIFETIME_JITTER, 1)
+            elif not self._reusable(connection, returned_at):
+                continue
+
+            if owner is not None:
+                self._own(connection, owner)
+            DB_POOL_CHECKOUTS.labels(self.alias, "waited" if waited else "immediate").inc()
+            DB_POOL_WAIT.labels(self.alias).observe(time.monotonic() - started)
+            self._report()
+            return connection
+
+    def _reusable(self, connection, returned_at):
+        now = time.monotonic()
+        if now >= self._expires.get(id(connection), 0):
+            self._discard(connection, "lifetime")
+            return False
+        if now - returned_at >= self.health_check_interval:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Exception as e:
+                logger.warning("DB POOL HEALTH CHECK FAILED:: alias=%s reason=%s", self.alias, e)
+                self._discard(connection, "unhealthy")
+                return False
+        return True
+
+    #================ ABANDONED ====
+    def _own(self, connection, owner):
+        finalizer = weakref.finalize(owner, self._abandon, connection)
+        finalizer.atexit = False  # at exit the process is closing its sockets anyway
+        self._owned[id(connection)] = finalizer
+
+    def _disown(self, connection):
+        finalizer = self._owned.pop(id(connection), None)
+        if finalizer is not None:
+            finalizer.detach()
+
+    def _abandon(self, connection):
+        # runs inside the garbage collector: queue it, never block on the lock
+        self._owned.pop(id(connection), None)
+        self._abandoned.append(connection)
+        if self._cond.acquire(blocking=False):
+            try:
+                self._cond.notify()
+            finally:
+                self._cond.release()
+
+    def _reclaim_abandoned(self):
+        """Free the slots of abandoned connections; call with ``_cond`` held, close them after."""
+        reclaimed = []
+        while self._abandoned:
+            connection = self._abandoned.popleft()
+            self._open -= 1
+            self._expires.pop(id(connection), None)
+            DB_POOL_DISCARDS.labels(self.alias, "abandoned").inc()
+            logger.warning("DB POOL CONNECTION ABANDONED:: alias=%s (owner collected without close())", self.alias)
+            reclaimed.append(connection)
+        return reclaimed
+
+    #================ CHECKIN ====
+    def checkin(self, connection, reset):
+        """
+        Return ``connection``. ``reset(connection)`` must leave it idle outside
+        a transaction and return True, or return False when it is unusable.
+        """
+        self._disown(connection)
+        try:
+            usable = reset(connection)
+        except Exception as e:
+            logger.warning("DB POOL RESET FAILED:: alias=%s reason=%s", self.alias, e)
+            usable = False
+        if not usable:
+            self._discard(connection, "broken")
+            return
+        if time.monotonic() >= self._expires.get(id(connection), 0):
+            self._discard(connection, "lifetime")
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+        self._report()
+
+    def _discard(self, connection, reason):
+        DB_POOL_DISCARDS.labels(self.alias, reason).inc()
+        self._expires.pop(id(connection), None)
+        self._close_quietly(connection)
+        self._release_slot()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _release_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+        self._report()
+
+    def close_idle(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection, "closed")
+
+    def _report(self):
+        idle = len(self._idle)
+        DB_POOL_CONNECTIONS.labels(self.alias, "idle").set(idle)
+        DB_POOL_CONNECTIONS.labels(self.alias, "in_use").set(self._open - idle)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self.size, "open": self._open, "idle": len(self._idle)}
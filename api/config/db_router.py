@@ -0,0 +1,135 @@
+"""
+Primary/replica routing with explicit read intent.
+
+Everything goes to the primary unless the caller says a read may be served
+by a replica, either for a block of code::
+
+    with reads(merchant_id=merchant.id):
+        rows = list(queryset)
+
+or for one queryset evaluated later (streamed responses)::
+
+    queryset.using(replica_alias(merchant_id))
+
+A replica is only picked when it is configured (``replica_*`` aliases, see
+settings), its replication lag is under ``REPLICA_MAX_LAG`` seconds, the
+primary connection is not inside a transaction, and the merchant has not
+vended within the last ``READ_YOUR_WRITES_SECONDS`` (``pin_primary``), so a
+merchant polling a transaction it just created always finds it. Otherwise
+the read falls back to the primary.
+
+Only use replica reads for results that go straight back to the caller.
+Anything written into a shared cache (catalog bodies, products, principals)
+is read from the primary: a replica up to ``REPLICA_MAX_LAG`` behind would
+store pre-invalidation rows under the new tag version.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from config.metrics import DB_READ_ROUTES, DB_REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PREFIX = "replica_"
+PIN_KEY = "db_pin:merchant:{}"
+
+# 0 when the replica has replayed all it received (an idle primary writes
+# nothing, so the last replay timestamp alone would read as growing lag)
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_read_alias = ContextVar("db_read_alias", default=None)
+_lag_checks = {}  # alias -> (checked_at, healthy)
+
+
+class PrimaryReplicaRouter:
+    """Reads follow the active ``reads()`` block; writes and migrations stay on the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+#================ READ INTENT ====
+def replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith(REPLICA_PREFIX)]
+
+
+def replica_alias(merchant_id=None):
+    """Database alias a replica-safe read should use right now."""
+    aliases = replicas()
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        reason = "atomic"
+    elif merchant_id is not None and cache.get(PIN_KEY.format(merchant_id)):
+        reason = "pinned"
+    else:
+        healthy = [alias for alias in aliases if _replica_healthy(alias)]
+        if healthy:
+            alias = random.choice(healthy)
+            DB_READ_ROUTES.labels(alias, "replica").inc()
+            return alias
+        reason = "lagging"
+    DB_READ_ROUTES.labels(DEFAULT_DB_ALIAS, reason).inc()
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def reads(merchant_id=None):
+    """Serve reads inside the block from a replica when one is safe to use."""
+    token = _read_alias.set(replica_alias(merchant_id))
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def pin_primary(merchant_id):
+    """Keep ``merchant_id``'s reads on the primary until replicas have caught up."""
+    if replicas():
+        cache.set(PIN_KEY.format(merchant_id), 1, settings.READ_YOUR_WRITES_SECONDS)
+
+
+#================ REPLICATION LAG ====
+def _replica_healthy(alias):
+    now = time.monotonic()
+    checked = _lag_checks.get(alias)
+    if checked is not None and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    # claim the check so concurrent requests keep using the previous verdict
+    _lag_checks[alias] = (now, checked[1] if checked else False)
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except Exception as e:
+        logger.warning("REPLICA LAG CHECK FAILED:: alias=%s reason=%s", alias, e)
+        healthy = False
+    else:
+        lag = float(lag) if lag is not None else float("inf")
+        DB_REPLICA_LAG.labels(alias).set(lag)
+        healthy = lag <= settings.REPLICA_MAX_LAG
+        if not healthy:
+            logger.warning("REPLICA LAGGING:: alias=%s lag=%.1fs max=%ss", alias, lag, settings.REPLICA_MAX_LAG)
+    _lag_checks[alias] = (now, healthy)
+    return healthy
@@ -16,7 +16,13 @@ from rest_framework.exceptions import AuthenticationFailed
 from django.utils import timezone
 from django.core.cache import cache
 #from rest_framework.authtoken.models import Token
-from apps.merchant.models import Merchant
+from apps.merchant.models import User
+from config.principal import get_principal, invalidate_principal
+from config.tokens import verify_access_token
+from config.metrics import stage
+from config.renderers import ORJSONRenderer, render_json
+from config.tracing import start_span
+from django.conf import settings
 from config.response_codes import AUTHENTICATION_ERROR, RESPONSE_MESSAGES
 import logging
 
@@ -41,12 +47,20 @@ def custom_exception_handler(exc, context):
 
 #====================== CUSTOM API RESPONSE ==============#
 class JsonResponse(Response):
+    """
+    The API envelope: {responseCode, responseMessage, responseData, ...}.
+
+    Rendered straight to JSON bytes with orjson unless content negotiation
+    picked some other renderer, so it also works outside DRF views.
+    """
+
     def __init__(self, data=[], code="00",success=True, msg="Successful",
                  status=None,
                  paginator=None,
                  template_name=None, headers=None,
                  exception=False, content_type=None, **kwargs):
-        super().__init__(None, status=status)
+        super().__init__(None, status=status, template_name=template_name, headers=headers,
+                         exception=exception, content_type=content_type)
 
         if isinstance(data, Serializer):
             msg = (
@@ -55,17 +69,18 @@ class JsonResponse(Response):
                 '`.error`. representation.'
             )
             raise AssertionError(msg)
-        self.data = {'responseCode': code, 'responseMessage': msg, 'responseData': data}
         if paginator:
-            self.data.update({'nextPage': paginator.get_next_link(), 'prevPage': paginator.get_previous_link(), 'totalCount': paginator.page.paginator.count})
-        self.data.update(kwargs)
-        self.template_name = template_name
-        self.exception = exception
-        self.content_type = content_type
+            kwargs.update(nextPage=paginator.get_next_link(), prevPage=paginator.get_previous_link(), totalCount=paginator.page.paginator.count)
+        self.data = {'responseCode': code, 'responseMessage': msg, 'responseData': data, **kwargs}
 
-        if headers:
-            for name, value in headers.items():
-                self[name] = value
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, 'accepted_renderer', None)
+        if renderer is not None and not isinstance(renderer, ORJSONRenderer):
+            return super().rendered_content
+        self['Content-Type'] = self.content_type or ORJSONRenderer.media_type
+        indent = 'indent=' in (getattr(self, 'accepted_media_type', None) or '')
+        return render_json(self.data, indent)
 
 
 
@@ -73,66 +88,52 @@ class JsonResponse(Response):
 class CustomAuthentication(BaseAuthentication):
     """
     Optimized authentication class for vending API that validates:
-    - Merchant code from X-Merchant-Code header
-    - API token from Authorization header (Bearer token) - JWT signed with merchant's secret key
-    - Timestamp from X-Timestamp header (replay attack protection)
-    
-    Security improvements:
-    - Uses JWT tokens signed with merchant's secret key (secret key never sent in request)
-    - Includes timestamp in JWT to prevent replay attacks
-    - Caches merchant data to reduce database queries
-    - Validates token signature using merchant's secret key from database
+    - Merchant code from X-MERCHANT-CODE header
+    - API key from X-API-KEY header
+    - HMAC-SHA256 of "timestamp|api_key" from X-SIGNATURE header, keyed with the merchant's secret
+    - Timestamp from X-TIMESTAMP header (replay attack protection)
+
+    The merchant is resolved to a compact MerchantPrincipal (see config.principal)
+    served from a per-worker LRU, then Redis, then an indexed api_key_hash lookup.
+
+    On success ``request.user`` is a lightweight (unsaved) User carrying the
+    merchant's user id and ``request.auth`` is the MerchantPrincipal.
+
+    When ACCESS_TOKEN_ENABLED is set, a request may instead carry
+    ``Authorization: Bearer <token>`` obtained from getAccessToken; the token is
+    verified statelessly (config.tokens) and ``request.auth`` is a TokenPrincipal.
     """
-    # Cache TTL for merchant data (5 minutes)
-    _cache_ttl = 300  # 5 minutes in seconds
-    
-    def _get_cached_merchant(self, merchant_code, api_key):
-        """
-        Get merchant from distributed cache (Redis/Memcached) or database.
-        Works across multiple server instances using Django's cache framework.
-        
-        Multi-instance safety:
-        - Uses Django's cache framework which supports Redis/Memcached
-        - Cache is shared across all server instances
-        - Automatically handles cache expiration and invalidation
-        """
-        cache_key = f"merchant_auth_{merchant_code}"
-        
-        # Try to get from distributed cache (works across instances)
-        cached_merchant = cache.get(cache_key)
-        if cached_merchant:
-            return cached_merchant
-        
-        # Cache miss - fetch from database
-        try:
-            merchant = Merchant.objects.select_related('user').get(
-                merchant_code=merchant_code,
-                is_active=True,
-                api_key=api_key
-            )
-            # Store in distributed cache (shared across all instances)
-            cache.set(cache_key, merchant, self._cache_ttl)
-            return merchant
-        except Merchant.DoesNotExist:
-            return None
-    
+    allow_access_tokens = True
+
+    def _get_principal(self, merchant_code, api_key):
+        return get_principal(merchant_code, api_key)
+
     @staticmethod
     def invalidate_merchant_cache(merchant_code):
         """
         Invalidate merchant cache when merchant data changes.
-        Call this after updating merchant information to ensure all instances
-        get the latest data.
-        
+        Drops the principal from Redis and from every worker's local cache.
+
         Usage:
             CustomAuthentication.invalidate_merchant_cache(merchant_code)
         """
-        cache_key = f"merchant_auth_{merchant_code}"
-        cache.delete(cache_key)
-    
+        invalidate_principal(merchant_code)
+
     def authenticate(self, request):
+        with stage("auth"), start_span("auth", root=False):
+            return self._authenticate(request)
+
+    def _authenticate(self, request):
         request_ip = get_client_ip(request)
         
         try:
+            # Short-lived access token: no merchant lookup, HMAC or timestamp parsing
+            if self.allow_access_tokens and settings.ACCESS_TOKEN_ENABLED:
+                authorization = request.headers.get("Authorization", "")
+                if authorization.startswith("Bearer "):
+                    principal = verify_access_token(authorization[7:].strip(), request_ip)
+                    return (User(id=principal.user_id), principal)
+
             # Get merchant code from header
             merchant_code = request.headers.get("X-MERCHANT-CODE")
             api_key = request.headers.get("X-API-KEY")
@@ -143,9 +144,9 @@ class CustomAuthentication(BaseAuthentication):
                 raise AuthenticationFailed('Merchant code, API key, received signature, and timestamp are required')
             
             
-            # Get cached merchant (reduces DB queries)
-            merchant = self._get_cached_merchant(merchant_code, api_key)
-            if not merchant:
+            # Get cached principal (reduces DB queries)
+            principal = self._get_principal(merchant_code, api_key)
+            if not principal or not principal.is_active:
                 logger.error(f"Merchant not found or inactive: {merchant_code}")
                 raise AuthenticationFailed('Invalid merchant code or merchant is inactive')
             
@@ -159,42 +160,31 @@ class CustomAuthentication(BaseAuthentication):
                 req_time = req_time.replace(tzinfo=timezone.utc)
             # Use Django's timezone-aware now() which respects TIME_ZONE setting
             now = datetime.now(timezone.utc)
-            logger.info(f"REQUEST TIMESTAMP:: {req_time} CURRENT TIMESTAMP:: {now} DIFF SECONDS:: {abs((now - req_time).total_seconds())}")
-            if abs((now - req_time).total_seconds()) > 300:
-                logger.error(f"Expired request: {timestamp} (diff: {abs((now - req_time).total_seconds())} seconds)")
+            drift = abs((now - req_time).total_seconds())
+            logger.debug("REQUEST TIMESTAMP:: %s CURRENT TIMESTAMP:: %s DIFF SECONDS:: %s", req_time, now, drift)
+            if drift > 300:
+                logger.error("Expired request: %s (diff: %s seconds)", timestamp, drift)
                 raise AuthenticationFailed('Request has expired') 
             
-            # Simple signature: timestamp|api_key
-            stringToSign = f"{timestamp}|{api_key}"
-            logger.info(f"STRING TO SIGN:: {stringToSign}")
-            #compare stringToSign with received signature
-            server_signature = base64.b64encode(
-                    hmac.new(
-                    merchant.api_secret.encode(),
-                    stringToSign.encode(),
-                    hashlib.sha256
-                ).digest()
-            ).decode()
-
-            if not hmac.compare_digest(received_signature.encode("utf-8"), server_signature.encode("utf-8")):
-                logger.error(f"Invalid signature: {received_signature.encode('utf-8')} != {server_signature.encode('utf-8')}")
+            if not verify_request_signature(principal.api_secret, timestamp, api_key, received_signature):
+                logger.error("Invalid signature for merchant %s", merchant_code)
                 raise AuthenticationFailed('Invalid signature')
 
                 
             # Optional: Validate IP address if configured
-            if merchant.api_access_ips and request_ip not in merchant.api_access_ips.split(','):
-                logger.error(f"Unauthorized IP: {request_ip} not in {merchant.api_access_ips}")
+            if not principal.allows_ip(request_ip):
+                logger.error("Unauthorized IP: %s for merchant %s", request_ip, merchant_code)
                 raise AuthenticationFailed('Unauthorized IP')
             
             # Get user associated with merchant
-            if not merchant.user:
+            if not principal.user_id:
                 logger.error(f"No user associated with merchant: {merchant_code}")
                 raise AuthenticationFailed('Merchant account not properly configured')
             
-            user = merchant.user
+            user = User(id=principal.user_id)
             
-            logger.info(f"Authentication successful for merchant: {merchant_code}, user: {user.email}")
-            return (user, merchant)
+            logger.info("Authentication successful for merchant: %s, user id: %s", merchant_code, principal.user_id)
+            return (user, principal)
             
         except AuthenticationFailed:
             # Re-raise authentication failures
@@ -205,14 +195,10 @@ class CustomAuthentication(BaseAuthentication):
 
 
 
-#======================== function to measure response time ========
-#===============================================================#
-def measure_response_time(start_time,txt):
-    import time
-    end_time = time.time()
-    response_time = end_time - start_time
-    logger.info(f"{txt} RESPONSE TIME: {response_time} seconds")
-    return response_time
+class SignedRequestAuthentication(CustomAuthentication):
+    """Signed-request only variant, used where a bearer token must not be accepted (token exchange)."""
+    allow_access_tokens = False
+
 
 #============== Custome Cors ===================
 class CustomCorsMiddleware:
@@ -240,6 +226,20 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
+#******************************************************#
+#======= merchant request signature ===================#
+#******************************************************#
+def request_signature(api_secret, timestamp, api_key):
+    """base64(HMAC-SHA256(api_secret, "timestamp|api_key")), as merchants sign X-SIGNATURE."""
+    return base64.b64encode(
+        hmac.new(api_secret.encode(), f"{timestamp}|{api_key}".encode(), hashlib.sha256).digest()
+    ).decode()
+
+
+def verify_request_signature(api_secret, timestamp, api_key, received_signature):
+    expected = request_signature(api_secret, timestamp, api_key)
+    return hmac.compare_digest(received_signature.encode("utf-8"), expected.encode("utf-8"))
+
 #******************************************************#
 #======= format phone number ==========================#
 #******************************************************#
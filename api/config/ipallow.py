@@ -0,0 +1,102 @@
+"""
+Compiled merchant IP allowlists.
+
+``Merchant.api_access_ips`` is a comma separated list of addresses and/or CIDR
+blocks (IPv4 or IPv6). It is compiled once, when the principal is built, into
+sorted, merged ``[start, end]`` integer ranges per address family. A lookup is
+one address parse plus a ``bisect`` over the range starts, i.e. O(log n)
+however many egress ranges an aggregator lists.
+"""
+import ipaddress
+import logging
+import socket
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+_V4_MAPPED_PREFIX = 0xFFFF << 32
+
+
+def _merge(ranges):
+    """Sort ``(start, end)`` pairs and collapse overlapping/adjacent ones."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return tuple(r[0] for r in merged), tuple(r[1] for r in merged)
+
+
+class IPAllowlist:
+    """
+    Immutable set of IPv4/IPv6 ranges.
+
+    An allowlist built from an empty string places no restriction; one built
+    from entries that are all invalid still restricts (and matches nothing).
+    """
+
+    __slots__ = ("_v4_starts", "_v4_ends", "_v6_starts", "_v6_ends", "restricted", "raw")
+
+    def __init__(self, v4_ranges=(), v6_ranges=(), restricted=None, raw=""):
+        self._v4_starts, self._v4_ends = _merge(v4_ranges)
+        self._v6_starts, self._v6_ends = _merge(v6_ranges)
+        self.restricted = bool(v4_ranges or v6_ranges) if restricted is None else restricted
+        self.raw = raw
+
+    @classmethod
+    def compile(cls, raw):
+        """
+        Build an allowlist from the stored comma separated string.
+        Whitespace around entries is ignored; invalid entries are logged and skipped.
+        """
+        v4, v6, restricted = [], [], False
+        for entry in (raw or "").split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            restricted = True
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                logger.warning(f"IGNORING INVALID ALLOWLIST ENTRY:: ENTRY={entry}")
+                continue
+            bounds = (int(network.network_address), int(network.broadcast_address))
+            (v4 if network.version == 4 else v6).append(bounds)
+        return cls(v4, v6, restricted=restricted, raw=raw or "")
+
+    def __bool__(self):
+        return self.restricted
+
+    def __len__(self):
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    def __contains__(self, ip):
+        return self.contains(ip)
+
+    def contains(self, ip):
+        if not ip:
+            return False
+        # inet_pton is much cheaper than building an ipaddress object per request
+        try:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+            starts, ends = self._v4_starts, self._v4_ends
+        except OSError:
+            try:
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+            except OSError:
+                return False
+            if value >> 32 == 0xFFFF:  # ::ffff:a.b.c.d, match against the IPv4 ranges
+                value -= _V4_MAPPED_PREFIX
+                starts, ends = self._v4_starts, self._v4_ends
+            else:
+                starts, ends = self._v6_starts, self._v6_ends
+        i = bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+    def __repr__(self):
+        return f"<IPAllowlist v4={len(self._v4_starts)} v6={len(self._v6_starts)}>"
+
+
+EMPTY_ALLOWLIST = IPAllowlist()
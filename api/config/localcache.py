@@ -0,0 +1,252 @@
+"""
+Per-worker in-process caches kept coherent through Redis pub/sub.
+
+A ``LocalTTLCache`` lives in each gunicorn/celery worker and answers hot reads
+without a Redis round trip. Writers call ``publish_invalidation(namespace, key)``
+after changing the underlying data; every worker subscribed to the
+invalidation channel then drops that key from its local copy.
+
+Other per-worker state (e.g. the access token revocation list) can listen on
+the same channel through ``register_handler``.
+
+If the subscription drops, messages may have been missed, so every registered
+handler is reset (caches are cleared) when the listener reconnects, and while
+it is down entries are only kept for ``DEGRADED_TTL`` seconds. A half-open
+connection delivers nothing and raises nothing, so the listener pings the
+subscription and treats ``LISTENER_DEAD_AFTER`` seconds without a message or
+pong as a drop.
+
+Caches can be bounded by entry count and, when ``max_bytes`` is set, by the
+approximate size of their values; the least recently used entries go first.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "vendicore_vas:invalidate"
+DEGRADED_TTL = 5  # seconds, while invalidations may be missed
+LISTENER_POLL = 1.0  # seconds the subscriber waits for a message per loop
+LISTENER_SOCKET_TIMEOUT = 30  # seconds; only a stalled read or write hits it, not an idle channel
+LISTENER_PING_INTERVAL = 5  # seconds between PINGs on the subscription
+LISTENER_DEAD_AFTER = 15  # seconds without a message or pong before the connection counts as dead
+_MISSING = object()
+
+
+#================ LOCAL TTL LRU ====
+class LocalTTLCache:
+    """
+    Thread-safe LRU with a per-entry time to live.
+
+    ``generation`` changes on every delete/clear: read it before fetching a
+    value from the shared cache and pass it to ``set`` so an invalidation
+    that arrived in between is not overwritten with the old value.
+    """
+
+    def __init__(self, namespace, maxsize=10000, ttl=30, max_bytes=None):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        register_handler(namespace, self.delete, self.clear)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value, size = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._bytes -= size
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, size=0, generation=None):
+        ttl = self.ttl if ttl is None else ttl
+        if not listener_healthy():
+            ttl = min(ttl, DEGRADED_TTL)
+        if ttl <= 0 or (self.max_bytes and size > self.max_bytes):
+            return
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._data[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self._bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted[2]
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._data)
+
+
+#================ INVALIDATION BUS ====
+_handlers = {}
+_listener = None
+_listener_lock = threading.Lock()
+_redis_client = None
+
+
+def register_handler(namespace, on_message, on_reset):
+    """
+    Route invalidation messages for ``namespace`` to ``on_message(key)``.
+    ``on_reset()`` is called whenever the subscription (re)connects.
+    """
+    _handlers[namespace] = (on_message, on_reset)
+
+
+def get_redis_client():
+    """Raw redis client for pub/sub, or None when running on the local memory cache."""
+    global _redis_client
+    redis_url = getattr(settings, "REDIS_URL", None)
+    if not redis_url:
+        return None
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(redis_url, socket_connect_timeout=5, socket_timeout=5)
+    return _redis_client
+
+
+def publish_invalidation(namespace, key):
+    """Apply ``key`` to this worker's handler and tell every other worker to do the same."""
+    handler = _handlers.get(namespace)
+    if handler is not None:
+        handler[0](key)
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.publish(INVALIDATION_CHANNEL, f"{namespace}|{key}")
+    except Exception as e:
+        logger.error(f"FAILED TO PUBLISH CACHE INVALIDATION {namespace}|{key}:: REASON={e}")
+
+
+def _dispatch(message):
+    namespace, _, key = message.partition("|")
+    handler = _handlers.get(namespace)
+    if handler is not None:
+        handler[0](key)
+
+
+def _reset_all():
+    for _, on_reset in list(_handlers.values()):
+        try:
+            on_reset()
+        except Exception as e:
+            logger.error(f"FAILED TO RESET LOCAL CACHE STATE:: REASON={e}")
+
+
+class InvalidationListener(threading.Thread):
+    """Background subscriber applying invalidation messages to local caches."""
+
+    reconnect_delay = 1.0
+
+    def __init__(self, redis_url):
+        super().__init__(name="cache-invalidation-listener", daemon=True)
+        import redis
+        # the loop polls with get_message(timeout=...), so an idle channel never
+        # reaches the socket timeout; it only bounds a read or write that stalls.
+        # Liveness comes from our own pings (see run), not health_check_interval
+        self.client = redis.Redis.from_url(redis_url, socket_connect_timeout=5, socket_timeout=LISTENER_SOCKET_TIMEOUT)
+        self.pid = os.getpid()
+        self.connected = False
+        self.last_seen = 0.0  # monotonic time of the last message or pong
+
+    @property
+    def alive(self):
+        return self.connected and time.monotonic() - self.last_seen <= LISTENER_DEAD_AFTER
+
+    def run(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # anything published while we were away is lost, start clean
+                _reset_all()
+                self.last_seen = time.monotonic()
+                self.connected = True
+                next_ping = self.last_seen + LISTENER_PING_INTERVAL
+                while True:
+                    message = pubsub.get_message(timeout=LISTENER_POLL)
+                    now = time.monotonic()
+                    if message is not None:
+                        self.last_seen = now
+                        if message.get("type") == "message":
+                            _dispatch(message["data"].decode())
+                    if now - self.last_seen > LISTENER_DEAD_AFTER:
+                        raise ConnectionError(f"no message or pong for {now - self.last_seen:.0f}s")
+                    if now >= next_ping:
+                        pubsub.ping()
+                        next_ping = now + LISTENER_PING_INTERVAL
+            except Exception as e:
+                logger.warning(f"CACHE INVALIDATION LISTENER DISCONNECTED:: REASON={e}")
+            self.connected = False
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(self.reconnect_delay)
+
+
+def listener_healthy():
+    """False while this process may be missing invalidations from other workers."""
+    if not getattr(settings, "REDIS_URL", None):
+        # local memory cache: nothing is shared between processes
+        return True
+    return _listener is not None and _listener.pid == os.getpid() and _listener.alive
+
+
+def ensure_listener():
+    """
+    Start the subscriber for this process if it is not running.
+
+    Called lazily from cache reads rather than at import time so gunicorn's
+    pre-fork master never owns the thread; a forked child notices the pid
+    change and starts its own.
+    """
+    global _listener
+    if _listener is not None and _listener.pid == os.getpid():
+        return _listener
+    redis_url = getattr(settings, "REDIS_URL", None)
+    if not redis_url:
+        return None
+    with _listener_lock:
+        if _listener is None or _listener.pid != os.getpid():
+            _listener = InvalidationListener(redis_url)
+            _listener.start()
+    return _listener
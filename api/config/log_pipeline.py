@@ -0,0 +1,243 @@
+"""
+Asynchronous, sampled, structured logging.
+
+Request threads run the sampling filter, interpolate the message (``%``-args
+may be mutable objects or lazy values that must be read while they are still
+current) and ``put_nowait`` onto a bounded queue; a background writer drains
+the queue, formats each record as JSON, redacts secrets and writes to the
+console. When the queue is full the record is dropped and
+counted rather than blocking a vend; the writer reports the drop count.
+
+Wired up from ``settings.LOGGING``:
+
+    'handlers': {'async_console': {
+        '()': 'config.log_pipeline.NonBlockingQueueHandler',
+        'maxsize': 10000,
+        'formatter': 'json',
+        'filters': ['sampling'],
+    }}
+
+The writer is started lazily on first emit and restarted after a fork, so the
+gunicorn master and each worker own their own thread (greenlet under gevent).
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+DEFAULT_REDACT_PATTERNS = (
+    # key=value / "key": "value" pairs whose value must never be written out; the
+    # key may carry any prefix in any case or separator style (apiKey, auth_key,
+    # accessToken, client_secret, merchant_pin) but must end in one of these words.
+    # A quoted value is masked up to its closing quote, spaces and all
+    r'(?i)(\b(?:[\w-]*?(?:key|secret|password|passwd|token|authorization|signature)|(?:[\w-]*[_-])?pin)'
+    r'["\']?\s*[:=]\s*(?P<quote>["\'])?(?:Basic |Bearer )?)'
+    r'(?(quote)(?:(?!(?P=quote)).)*|[^"\'\s,;&<}]+)',
+    # <xsd:pin>1234</xsd:pin>, <authKey>...</authKey> style SOAP fields
+    r'(?i)(<(?:\w+:)?(?:\w*?(?:key|secret|password|passwd|token)|pin)>)[^<]*',
+)
+
+
+#================ FILTERS ====
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of INFO/DEBUG records per logger.
+
+    ``rates`` maps logger name prefixes to a keep ratio (0.0 - 1.0); the
+    longest matching prefix wins. WARNING and above are never sampled.
+    """
+
+    def __init__(self, rates=None, default_rate=1.0):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_rate = float(default_rate)
+        self._resolved = {}
+
+    def _rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = self.default_rate
+            for prefix, prefix_rate in self.rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = float(prefix_rate)
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+class Redactor:
+    """Masks secrets in a formatted message."""
+
+    def __init__(self, patterns=DEFAULT_REDACT_PATTERNS, mask="***"):
+        self.patterns = [re.compile(p) for p in patterns]
+        self.mask = mask
+
+    def __call__(self, text):
+        for pattern in self.patterns:
+            text = pattern.sub(lambda m: m.group(1) + self.mask, text)
+        return text
+
+
+#================ FORMATTERS ====
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any ``extra=`` fields."""
+
+    def __init__(self, redact=True, redact_patterns=None, **kwargs):
+        super().__init__(**kwargs)
+        self.redactor = Redactor(redact_patterns or DEFAULT_REDACT_PATTERNS) if redact else None
+
+    def format(self, record):
+        message = record.getMessage()
+        if self.redactor is not None:
+            message = self.redactor(message)
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": message,
+            "pid": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RedactingFormatter(logging.Formatter):
+    """The classic text format with the same redaction as JsonFormatter."""
+
+    def __init__(self, *args, redact_patterns=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.redactor = Redactor(redact_patterns or DEFAULT_REDACT_PATTERNS)
+
+    def format(self, record):
+        return self.redactor(super().format(record))
+
+
+#================ QUEUE HANDLER ====
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueue records for a background writer; never blocks the caller.
+
+    The formatter set on this handler (``'formatter'`` in dictConfig) is used
+    by the writer, so JSON encoding and redaction happen off the request thread.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # The message and traceback are rendered here: args may be objects the
+        # caller goes on to change, and the exception is only current now. A
+        # copy, so handlers after this one still see the original record.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # after a fork the parent's writer thread is gone and its queue may
+            # hold records already written by the parent: start over
+            self.queue = queue.Queue(maxsize=self.maxsize)
+            self._listener = _Writer(self.queue, _DropReportingHandler(self))
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush_and_stop)
+
+    def flush_and_stop(self):
+        listener, self._listener = self._listener, None
+        if listener is not None and self._pid == os.getpid():
+            listener.stop()
+        self._pid = None
+
+    def close(self):
+        self.flush_and_stop()
+        self.target.close()
+        super().close()
+
+
+class _Writer(QueueListener):
+    def enqueue_sentinel(self):
+        # the queue may be full at shutdown; wait for room instead of raising
+        self.queue.put(self._sentinel)
+
+
+class _DropReportingHandler(logging.Handler):
+    """Writer-side wrapper: reports drops, then hands the record to the target."""
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+
+    def handle(self, record):
+        owner = self.owner
+        if owner.dropped != owner._reported_dropped:
+            lost = owner.dropped - owner._reported_dropped
+            owner._reported_dropped = owner.dropped
+            owner.target.handle(logging.makeLogRecord({
+                "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "LOG QUEUE FULL:: DROPPED=%s TOTAL DROPPED=%s", "args": (lost, owner.dropped),
+            }))
+        owner.target.handle(record)
+        return True
+
+
+def sampling_filter_from_env():
+    """Filter factory for settings.LOGGING, rates come from LOG_SAMPLE_RATES (JSON)."""
+    try:
+        rates = json.loads(os.environ.get("LOG_SAMPLE_RATES", "{}"))
+    except ValueError:
+        rates = {}
+    return SamplingFilter(rates=rates, default_rate=os.environ.get("LOG_SAMPLE_DEFAULT", "1.0"))
@@ -0,0 +1,237 @@
+"""
+Prometheus metrics.
+
+Every gunicorn worker writes its samples to ``PROMETHEUS_MULTIPROC_DIR``
+(set by gunicorn.conf.py before the app is imported); ``/metrics`` on any
+worker aggregates the whole container. Each API container is scraped as its
+own target and Prometheus sums across ``instance``, e.g.
+
+    sum by (endpoint, le) (rate(vendicore_http_request_duration_seconds_bucket[5m]))
+
+Without the env var (runserver, shell) metrics stay in-process. Celery
+workers serve theirs on ``CELERY_METRICS_PORT`` (see config.celery).
+"""
+import logging
+import os
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+from config.ipallow import IPAllowlist
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+#================ METRICS ====
+HTTP_REQUEST_LATENCY = Histogram(
+    "vendicore_http_request_duration_seconds", "Request latency by endpoint",
+    ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "vendicore_stage_duration_seconds", "Latency of a stage within a request (auth, preflight, debit, provider_call, finalize)",
+    ["endpoint", "stage"], buckets=LATENCY_BUCKETS,
+)
+PROVIDER_CALL_LATENCY = Histogram(
+    "vendicore_provider_call_duration_seconds", "Provider call latency by account and outcome code",
+    ["provider_account", "operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "vendicore_db_queries_per_request", "Database queries executed per request",
+    ["endpoint"], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_QUERIES = Counter("vendicore_db_queries_total", "Database queries executed", ["endpoint"])
+CACHE_REQUESTS = Counter("vendicore_cache_requests_total", "Cache lookups by cache and result (hit/miss/stale/refresh)", ["cache", "result"])
+CACHE_PAYLOAD_BYTES = Histogram(
+    "vendicore_cache_payload_bytes", "Encoded size of values written to the shared cache",
+    ["format"], buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+CACHE_DECODE_SECONDS = Histogram(
+    "vendicore_cache_decode_seconds", "Time to decode a value read from the shared cache",
+    ["format"], buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01),
+)
+NEAR_CACHE_BYTES = Gauge("vendicore_near_cache_bytes", "Approximate size of the per-worker near cache", ["cache"], multiprocess_mode="livesum")
+NEAR_CACHE_ENTRIES = Gauge("vendicore_near_cache_entries", "Entries in the per-worker near cache", ["cache"], multiprocess_mode="livesum")
+DB_POOL_WAIT = Histogram(
+    "vendicore_db_pool_wait_seconds", "Time spent checking a connection out of the pool",
+    ["alias"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5),
+)
+DB_POOL_CHECKOUTS = Counter("vendicore_db_pool_checkouts_total", "Pool checkouts by outcome (immediate/waited/timeout)", ["alias", "outcome"])
+DB_POOL_DISCARDS = Counter("vendicore_db_pool_discards_total", "Pooled connections closed instead of reused, by reason", ["alias", "reason"])
+DB_POOL_CONNECTIONS = Gauge("vendicore_db_pool_connections", "Pooled connections by state (idle/in_use)", ["alias", "state"], multiprocess_mode="livesum")
+DB_READ_ROUTES = Counter("vendicore_db_read_routes_total", "Replica-eligible reads by database and reason (replica/pinned/atomic/lagging)", ["alias", "reason"])
+DB_REPLICA_LAG = Gauge("vendicore_db_replica_lag_seconds", "Replication lag seen by the last check", ["alias"], multiprocess_mode="max")
+PROVIDER_THROTTLED = Counter("vendicore_provider_throttled_total", "Background provider calls deferred by the per-account limits", ["provider_account", "reason"])
+IN_FLIGHT = Gauge("vendicore_http_requests_in_flight", "Requests currently being served", multiprocess_mode="livesum")
+
+_endpoint = ContextVar("metrics_endpoint", default="unmatched")
+
+
+def current_endpoint():
+    return _endpoint.get()
+
+
+#================ HELPERS ====
+class StageTimer:
+    """
+    Times consecutive stages of a request: ``mark(stage)`` records the time
+    since the previous mark (or since the timer was created).
+    """
+
+    __slots__ = ("_last",)
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        STAGE_LATENCY.labels(_endpoint.get(), stage).observe(now - self._last)
+        self._last = now
+
+
+class stage:
+    """``with stage("auth"): ...`` records the block under the current endpoint."""
+
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_LATENCY.labels(_endpoint.get(), self.name).observe(time.perf_counter() - self._start)
+        return False
+
+
+def record_cache(cache_name, value):
+    """Count a cache lookup as a hit (value is not None) or miss; returns ``value``."""
+    CACHE_REQUESTS.labels(cache_name, "miss" if value is None else "hit").inc()
+    return value
+
+
+def observe_provider_call(provider_account, operation, started, response):
+    outcome = (response or {}).get("responseCode") or "none"
+    PROVIDER_CALL_LATENCY.labels(provider_account, operation, outcome).observe(time.perf_counter() - started)
+
+
+#================ MIDDLEWARE ====
+class _QueryCounter:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Request latency, in-flight and query count per resolved url name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info == "/metrics":
+            return self.get_response(request)
+        token = _endpoint.set("unmatched")
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        status = 500
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(counter))
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            IN_FLIGHT.dec()
+            endpoint = _endpoint.get()
+            HTTP_REQUEST_LATENCY.labels(endpoint, request.method, status).observe(time.perf_counter() - started)
+            DB_QUERIES_PER_REQUEST.labels(endpoint).observe(counter.count)
+            if counter.count:
+                DB_QUERIES.labels(endpoint).inc(counter.count)
+            _endpoint.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match is not None:
+            _endpoint.set(match.url_name or match.view_name or "unnamed")
+        return None
+
+
+#================ QUEUE DEPTH ====
+_broker_client = None
+
+
+def queue_depths():
+    """Messages waiting per Celery queue, summed over the priority lists; {} if unknown."""
+    global _broker_client
+    broker_url = getattr(settings, "CELERY_BROKER_URL", None) or ""
+    if not broker_url.startswith(("redis://", "rediss://", "unix://")):
+        return {}
+    if _broker_client is None:
+        import redis
+        _broker_client = redis.Redis.from_url(broker_url, socket_connect_timeout=2, socket_timeout=2)
+    options = settings.CELERY_BROKER_TRANSPORT_OPTIONS
+    steps, sep = options["priority_steps"], options["sep"]
+    names = [queue.name for queue in settings.CELERY_TASK_QUEUES]
+    pipe = _broker_client.pipeline(transaction=False)
+    for name in names:
+        for step in steps:
+            # kombu's key for a priority list; step 0 is the bare queue name
+            pipe.llen(f"{name}{sep}{step}" if step else name)
+    try:
+        lengths = pipe.execute()
+    except Exception as e:
+        logger.warning("QUEUE DEPTH UNAVAILABLE:: reason=%s", e)
+        return {}
+    return {name: sum(lengths[i * len(steps):(i + 1) * len(steps)]) for i, name in enumerate(names)}
+
+
+class QueueDepthCollector:
+    """
+    Broker backlog read at scrape time, the signal for scaling workers per
+    queue. Every API container reports the same broker, so aggregate with
+    ``max by (queue)``.
+    """
+
+    def collect(self):
+        gauge = GaugeMetricFamily("vendicore_celery_queue_depth", "Messages waiting in each Celery queue", labels=["queue"])
+        for queue, depth in queue_depths().items():
+            gauge.add_metric([queue], depth)
+        yield gauge
+
+
+_queue_registry = CollectorRegistry(auto_describe=False)
+_queue_registry.register(QueueDepthCollector())
+
+
+#================ /metrics ====
+# comma separated IPs/CIDRs of the Prometheus scrapers; unset means nobody may scrape
+_allowed_scrapers = IPAllowlist.compile(os.environ.get("METRICS_ALLOWED_IPS", ""))
+
+
+def metrics_view(request):
+    if not _allowed_scrapers.contains(request.META.get("REMOTE_ADDR")):
+        return HttpResponseForbidden()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry) + generate_latest(_queue_registry), content_type=CONTENT_TYPE_LATEST)
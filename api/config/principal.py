@@ -0,0 +1,163 @@
+"""
+Compact authenticated-principal records for CustomAuthentication.
+
+Instead of caching a pickled ``Merchant`` model (with its related ``User``) we
+cache only what authentication needs. Lookups go:
+
+    per-worker LRU  ->  Redis (small tuple)  ->  DB (indexed api_key_hash)
+
+Credential changes on a merchant publish an invalidation so every worker drops
+its local copy (see apps.merchant.signals).
+"""
+import hashlib
+import hmac
+import logging
+
+from django.core.cache import cache
+
+from apps.merchant.models import Merchant
+from config.cache import get_or_compute, invalidate_tags, set_value, tagged_key
+from config.ipallow import EMPTY_ALLOWLIST, IPAllowlist
+from config.localcache import LocalTTLCache, ensure_listener, publish_invalidation
+from config.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_NAMESPACE = "principal"
+PRINCIPAL_RECORD_VERSION = 1
+PRINCIPAL_CACHE_TTL = 300  # Redis tier, seconds
+PRINCIPAL_LOCAL_TTL = 60  # per-worker tier, seconds
+REJECTED_TTL = 30  # seconds a rejected (merchant_code, api key) pair is not looked up again
+RECHECK_INTERVAL = 1  # seconds between database checks of unknown keys for one merchant
+
+_local_principals = LocalTTLCache(PRINCIPAL_NAMESPACE, maxsize=5000, ttl=PRINCIPAL_LOCAL_TTL)
+
+
+def hash_api_key(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+#================ PRINCIPAL RECORD ====
+class MerchantPrincipal:
+    """What a request needs to know about the authenticated merchant."""
+
+    __slots__ = (
+        "merchant_id", "merchant_code", "user_id", "api_secret",
+        "api_key_hash", "allowed_ips", "is_active",
+    )
+
+    def __init__(self, merchant_id, merchant_code, user_id, api_secret, api_key_hash, api_access_ips, is_active):
+        self.merchant_id = merchant_id
+        self.merchant_code = merchant_code
+        self.user_id = user_id
+        self.api_secret = api_secret or ""
+        self.api_key_hash = api_key_hash or ""
+        # compiled once here; the principal (and so the allowlist) is kept in the local LRU
+        self.allowed_ips = IPAllowlist.compile(api_access_ips) if api_access_ips else EMPTY_ALLOWLIST
+        self.is_active = is_active
+
+    @classmethod
+    def from_record(cls, record):
+        version, *fields = record
+        if version != PRINCIPAL_RECORD_VERSION:
+            return None
+        return cls(*fields)
+
+    def matches_key(self, api_key_hash):
+        return hmac.compare_digest(self.api_key_hash, api_key_hash)
+
+    def allows_ip(self, ip):
+        return not self.allowed_ips or self.allowed_ips.contains(ip)
+
+    def __repr__(self):
+        return f"<MerchantPrincipal {self.merchant_code}>"
+
+
+PRINCIPAL_FIELDS = (
+    "id", "merchant_code", "user_id", "api_secret",
+    "api_key_hash", "api_access_ips", "is_active",
+)
+
+
+def _cache_key(merchant_code):
+    return f"merchant_principal_{merchant_code}"
+
+
+def _rejected_key(merchant_code, api_key_hash):
+    return f"principal_rejected:{merchant_code}:{api_key_hash}"
+
+
+def merchant_tag(merchant_code):
+    return f"merchant:{merchant_code}"
+
+
+def _load_record(merchant_code, api_key_hash):
+    row = (
+        Merchant.objects.filter(merchant_code=merchant_code, api_key_hash=api_key_hash, is_active=True)
+        .values_list(*PRINCIPAL_FIELDS)
+        .first()
+    )
+    if row is None:
+        return None
+    return (PRINCIPAL_RECORD_VERSION, *row)
+
+
+#================ LOOKUP / INVALIDATION ====
+def get_principal(merchant_code, api_key):
+    """
+    Resolve ``(merchant_code, api_key)`` to a principal, or None.
+
+    The cached record is keyed by merchant code only; the presented key is
+    checked against the stored hash, and a mismatch falls through to the
+    database in case the key was just rotated. Failed lookups are cached
+    for ``REJECTED_TTL`` (under the merchant tag, so a credential change
+    clears them) and the fallthrough runs at most once per
+    ``RECHECK_INTERVAL`` per merchant, so a client retrying a bad key
+    costs Redis reads, not database queries.
+    """
+    ensure_listener()
+    api_key_hash = hash_api_key(api_key)
+    cache_key = _cache_key(merchant_code)
+
+    principal = _local_principals.get(cache_key)
+    if principal is not None and principal.matches_key(api_key_hash):
+        CACHE_REQUESTS.labels("principal_local", "hit").inc()
+        return principal
+    CACHE_REQUESTS.labels("principal_local", "miss").inc()
+
+    tags = (merchant_tag(merchant_code),)
+    rejected_key = tagged_key(_rejected_key(merchant_code, api_key_hash), tags)
+    if cache.get(rejected_key):
+        CACHE_REQUESTS.labels("principal_rejected", "hit").inc()
+        return None
+
+    loaded = []
+
+    def load():
+        loaded.append(True)
+        return _load_record(merchant_code, api_key_hash)
+
+    record = get_or_compute(cache_key, load, PRINCIPAL_CACHE_TTL, "principal_redis", tags=tags)
+    principal = MerchantPrincipal.from_record(record) if record is not None else None
+    if principal is None or not principal.matches_key(api_key_hash):
+        if loaded:
+            cache.set(rejected_key, 1, REJECTED_TTL)
+            return None
+        # cached record from before a key rotation: check the database, but not
+        # more than once per interval for a merchant whatever keys are presented
+        if not cache.add(f"principal_recheck:{merchant_code}", 1, RECHECK_INTERVAL):
+            return None
+        record = _load_record(merchant_code, api_key_hash)
+        if record is None:
+            cache.set(rejected_key, 1, REJECTED_TTL)
+            return None
+        set_value(cache_key, record, PRINCIPAL_CACHE_TTL, tags=tags)
+        principal = MerchantPrincipal.from_record(record)
+    _local_principals.set(cache_key, principal)
+    return principal
+
+
+def invalidate_principal(merchant_code):
+    """Drop a merchant's principal from Redis and from every worker's local cache."""
+    invalidate_tags(merchant_tag(merchant_code))
+    publish_invalidation(PRINCIPAL_NAMESPACE, _cache_key(merchant_code))
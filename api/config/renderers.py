@@ -0,0 +1,60 @@
+"""
+orjson-backed JSON parser and renderer for DRF.
+
+Wire format matches rest_framework.renderers.JSONRenderer for everything the
+API returns: compact separators, UTF-8 (not \\u escaped), Decimal as a JSON
+number, UUID as a string, UTC datetimes with a ``Z`` suffix. Things orjson
+does not know (lazy translation strings, querysets, generators...) fall back
+to DRF's own encoder.
+"""
+from decimal import Decimal
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+_fallback = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _fallback.default(obj)
+
+
+def render_json(data, indent=False):
+    """Python data -> JSON bytes, as the API renders it."""
+    return orjson.dumps(data, default=_default, option=(_OPTIONS | orjson.OPT_INDENT_2) if indent else _OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, bytes):
+            # prebuilt body
+            return data
+        indent = False
+        if accepted_media_type:
+            # "application/json; indent=4" from the browsable API or curl
+            indent = "indent=" in accepted_media_type
+        return render_json(data, indent)
+
+
+class ORJSONParser(BaseParser):
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return None
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -1,9 +1,11 @@
 
 from pathlib import Path
 import os 
+import json
 import datetime
 from datetime import timedelta
 from celery.schedules import crontab
+from kombu import Queue
 from dotenv import load_dotenv
 # Load variables from the .env file
 load_dotenv()
@@ -42,7 +44,11 @@ INSTALLED_APPS = [
     'apps.merchant',
     'apps.product',
     'apps.provider',
+    'apps.report',
+    'apps.ledger',
+    'apps.reconciliation',
     'apps.seeder',  # Seeder app for management commands
+    'apps.perf',  # benchmark / load testing management commands
     'corsheaders',
 ]
 
@@ -57,10 +63,10 @@ REST_FRAMEWORK = {
     ],
     
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'config.renderers.ORJSONParser',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-         'rest_framework.renderers.JSONRenderer',
+         'config.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,  # Set the number of items per page
@@ -74,7 +80,18 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
+#=============== MERCHANT ACCESS TOKENS ==================#
+# Optional: merchants exchange one signed request for a short-lived bearer token
+ACCESS_TOKEN_ENABLED = os.environ.get("ACCESS_TOKEN_ENABLED", "false").lower() == "true"
+ACCESS_TOKEN_TTL = int(os.environ.get("ACCESS_TOKEN_TTL", 900))  # seconds
+ACCESS_TOKEN_SIGNING_KEY = os.environ.get("ACCESS_TOKEN_SIGNING_KEY") or SECRET_KEY
+
+# Largest airtime amount a single vend may request (naira)
+VEND_MAX_AMOUNT = int(os.environ.get("VEND_MAX_AMOUNT", 1000000))
+
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
+    'config.tracing.TracingMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     #'config.helper.CustomCorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -108,18 +125,56 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # settings.py
 #CELERYD_HIJACK_ROOT_LOGGER= False,
+# Re-point provider endpoints, e.g. at the simulator (manage.py run_provider_simulator):
+# PROVIDER_BASE_URL_OVERRIDES='{"MTN": "http://localhost:9100", "GLO": "http://localhost:9100"}'
+PROVIDER_BASE_URL_OVERRIDES = json.loads(os.environ.get('PROVIDER_BASE_URL_OVERRIDES') or '{}')
+
+# Tracing (config/tracing.py): off unless an exporter is configured
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', 'none')  # none | file | otlp
+TRACING_ENABLED = TRACE_EXPORTER in ('file', 'otlp')
+TRACE_FILE_PATH = os.environ.get('TRACE_FILE_PATH', '/tmp/vendicore_traces.jsonl')
+TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT', 'http://localhost:4318')
+TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'vendicore-api')
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))  # head sampling of new traces
+TRACE_TAIL_LATENCY_MS = float(os.environ.get('TRACE_TAIL_LATENCY_MS', 2000))  # always keep slower (or failed) segments
+
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json | text
+LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() == 'true'
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
         'verbose': {
+            '()': 'config.log_pipeline.RedactingFormatter',
             'format': '%(asctime)s [%(levelname)s] %(module)s: %(message)s'
         },
+        'json': {
+            '()': 'config.log_pipeline.JsonFormatter',
+        },
+    },
+    'filters': {
+        # per-logger INFO/DEBUG sampling, e.g. LOG_SAMPLE_RATES='{"config.helper": 0.1}'
+        'sampling': {
+            '()': 'config.log_pipeline.sampling_filter_from_env',
+        },
+        'trace_context': {
+            '()': 'config.tracing.TraceContextFilter',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['sampling', 'trace_context'],
+        },
+        # records are queued and written by a background thread, see config/log_pipeline.py
+        'async_console': {
+            '()': 'config.log_pipeline.NonBlockingQueueHandler',
+            'maxsize': LOG_QUEUE_SIZE,
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['sampling', 'trace_context'],
         },
         #'file': {
         #    'class': 'logging.FileHandler',
@@ -135,8 +190,8 @@ LOGGING = {
     },
     
     'root': {
-        'handlers': ['console'],
-        'level': 'INFO',
+        'handlers': ['async_console' if LOG_ASYNC else 'console'],
+        'level': os.environ.get('LOG_LEVEL', 'INFO'),
     },
     
 }
@@ -157,6 +212,45 @@ DATABASES = {
     }
 }
 
+# Per-worker connection pool (config.db_pool), off unless DATABASE_POOL_SIZE is set.
+# Size it so workers * DATABASE_POOL_SIZE stays under max_connections (or the
+# pgbouncer pool); Django itself then opens/closes per request (CONN_MAX_AGE 0).
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 0))
+if DATABASE_POOL_SIZE and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'config.db_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'SIZE': DATABASE_POOL_SIZE,
+            'TIMEOUT': float(os.environ.get("DATABASE_POOL_TIMEOUT", 5)),
+            'MAX_LIFETIME': float(os.environ.get("DATABASE_POOL_MAX_LIFETIME", 1800)),
+            'HEALTH_CHECK_INTERVAL': float(os.environ.get("DATABASE_POOL_HEALTH_CHECK_INTERVAL", 30)),
+        },
+    })
+
+# Behind pgbouncer in transaction mode consecutive transactions may run on
+# different server connections: no server-side cursors (they live across
+# transactions), and session settings such as the time zone belong on the
+# database role (ALTER ROLE ... SET timezone TO 'UTC'), not on the connection.
+if os.environ.get("DATABASE_PGBOUNCER", "false").lower() == "true":
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas (config.db_router): DATABASE_REPLICA_HOSTS="host[:port],..." adds
+# replica_0, replica_1, ... with the primary's credentials and options. Only
+# reads marked replica-safe go there; everything else stays on the primary.
+for index, replica in enumerate(h.strip() for h in os.environ.get("DATABASE_REPLICA_HOSTS", "").split(",") if h.strip()):
+    replica_host, _, replica_port = replica.partition(":")
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['config.db_router.PrimaryReplicaRouter']
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 2))  # seconds
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", 5))
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", 30))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -207,12 +301,61 @@ CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
 redbeat_redis_url = os.getenv("CELERY_BROKER_URL")
 beat_scheduler = "redbeat.RedBeatScheduler"
 
+# One queue per kind of work so a provider outage (requery retries) cannot
+# starve reversals; each queue has its own worker service (docker-compose.yml).
+CELERY_TASK_QUEUES = (
+    Queue("default"),
+    Queue("requery"),
+    Queue("reversal"),
+    Queue("notifications"),
+    Queue("reports"),
+)
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_ROUTES = {
+    "apps.product.task.trigger_provider_requery_task": {"queue": "requery"},
+    "apps.product.task.cron_reverse_timeout_unreversed_transaction": {"queue": "reversal"},
+    "apps.report.task.*": {"queue": "reports"},
+    "apps.ledger.task.*": {"queue": "reports"},
+    "apps.reconciliation.task.*": {"queue": "reports"},
+    "apps.*.task.notify_*": {"queue": "notifications"},
+}
+# Redis has no native priorities: kombu keeps one list per step and drains
+# lower numbers first (0 is the most urgent)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "queue_order_strategy": "priority",
+    "priority_steps": [0, 3, 6, 9],
+    "sep": ":",
+}
+CELERY_TASK_DEFAULT_PRIORITY = 6
+# a worker only holds what it is running, so priorities and other workers get a say
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Celery workers serve their own /metrics on this port when set (config.celery)
+CELERY_METRICS_PORT = int(os.environ.get("CELERY_METRICS_PORT", 0))
+
+# Background provider calls, per provider account (apps.provider.throttle);
+# override per account with rate_limit / burst / concurrency in its config
+PROVIDER_RATE_LIMIT = float(os.environ.get("PROVIDER_RATE_LIMIT", 5))  # calls per second
+PROVIDER_BURST = float(os.environ.get("PROVIDER_BURST", 10))
+PROVIDER_CONCURRENCY = int(os.environ.get("PROVIDER_CONCURRENCY", 4))
+
 
 CELERY_BEAT_SCHEDULE = {
     "reverse-timeout-transactions-every-minute": {
         "task": "apps.product.task.cron_reverse_timeout_unreversed_transaction",
         "schedule": crontab(minute="*/7"),  # every 1 minute
     },
+    "refresh-daily-rollups-every-five-minutes": {
+        "task": "apps.report.task.refresh_daily_rollups_task",
+        "schedule": crontab(minute="*/5"),
+    },
+    "take-ledger-balance-snapshots-hourly": {
+        "task": "apps.ledger.task.take_balance_snapshots_task",
+        "schedule": crontab(minute=15),
+    },
+    "reconcile-merchant-balances-every-thirty-minutes": {
+        "task": "apps.reconciliation.task.reconcile_balances_task",
+        "schedule": crontab(minute="5,35"),
+    },
 }
 
 #=============== CACHE CONFIGURATION ==================#
@@ -228,13 +371,14 @@ if REDIS_URL:
     try:
         CACHES = {
             'default': {
-                'BACKEND': 'django_redis.cache.RedisCache',
+                'BACKEND': 'config.cache_backends.TracedRedisCache',
                 'LOCATION': REDIS_URL,
                 'OPTIONS': {
                     'CLIENT_CLASS': 'django_redis.client.DefaultClient',
                     'SOCKET_CONNECT_TIMEOUT': 5,
                     'SOCKET_TIMEOUT': 5,
-                    'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+                    # msgpack records; compresses large payloads itself
+                    'SERIALIZER': 'config.cache_backends.MsgpackSerializer',
                     'IGNORE_EXCEPTIONS': True,  # Don't fail if Redis is down
                     #'PARSER_CLASS': 'redis.connection.HiredisParser',  # Faster parsing (optional)
                 },
@@ -264,3 +408,7 @@ else:
             }
         }
     }
+
+# Per-worker near cache in front of the shared cache (see config.cache)
+NEAR_CACHE_TTL = int(os.environ.get('NEAR_CACHE_TTL', 60))  # seconds
+NEAR_CACHE_MAX_BYTES = int(os.environ.get('NEAR_CACHE_MAX_BYTES', 32 * 1024 * 1024))
@@ -0,0 +1,42 @@
+import json
+import logging
+
+from django.test import SimpleTestCase
+
+from config.log_pipeline import JsonFormatter, Redactor
+
+
+#================ LOG REDACTION ====
+class RedactorTests(SimpleTestCase):
+    def setUp(self):
+        self.redact = Redactor()
+
+    def test_keys_ending_in_key_or_secret(self):
+        self.assertEqual(self.redact("secret_key=abc auth_key=def&x=1"), "secret_key=*** auth_key=***&x=1")
+        self.assertEqual(self.redact("x-api-key: zz clientSecret=s"), "x-api-key: *** clientSecret=***")
+
+    def test_header_dicts(self):
+        # how provider headers reach the log when log_raw_payloads is on
+        headers = {"key": "K123", "token": "T999", "Authorization": "Basic QWxhZGRpbg==", "Content-Type": "text/xml"}
+        self.assertEqual(
+            self.redact(str(headers)),
+            "{'key': '***', 'token': '***', 'Authorization': 'Basic ***', 'Content-Type': 'text/xml'}",
+        )
+
+    def test_quoted_values_are_masked_whole(self):
+        self.assertEqual(self.redact('{"password": "p w x", "user": "bob"}'), '{"password": "***", "user": "bob"}')
+        self.assertEqual(self.redact("pin='1 2'"), "pin='***'")
+
+    def test_soap_elements(self):
+        self.assertEqual(
+            self.redact("<ns:pin>1234</ns:pin><token>abc</token><key>k</key><authKey>z</authKey><msisdn>0803</msisdn>"),
+            "<ns:pin>***</ns:pin><token>***</token><key>***</key><authKey>***</authKey><msisdn>0803</msisdn>",
+        )
+
+    def test_ordinary_fields_are_left_alone(self):
+        text = "VEND FAILED:: REASON=timeout amount=100 status=Success keys=3"
+        self.assertEqual(self.redact(text), text)
+
+    def test_formatter_redacts_the_message(self):
+        record = logging.LogRecord("vend", logging.INFO, __file__, 1, "HEADERS:: %s", ({"key": "K123"},), None)
+        self.assertEqual(json.loads(JsonFormatter().format(record))["msg"], "HEADERS:: {'key': '***'}")
@@ -0,0 +1,186 @@
+"""
+Short-lived merchant access tokens.
+
+A merchant trades one HMAC-signed request (the normal CustomAuthentication
+headers) for a signed JWT carrying its principal claims. Later requests send
+``Authorization: Bearer <token>`` and are verified without any merchant lookup:
+only the token signature, expiry and a per-worker revocation list are checked.
+
+Revocation state lives in two places:
+- Redis hashes, so a freshly started worker can load it;
+- each worker's memory, kept current through the invalidation channel
+  (config.localcache), so a check is a set/dict lookup.
+
+Revocations are either a single token id (jti) or a per-merchant "not before"
+time that kills every token issued earlier (used when credentials change).
+``iat`` and "not before" carry microseconds: with whole seconds a token
+exchanged in the same second right after a revocation was revoked too, and
+one exchanged just before it survived if the comparison was strict.
+"""
+import logging
+import threading
+import time
+import uuid
+
+import jwt
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from config.localcache import ensure_listener, get_redis_client, publish_invalidation, register_handler
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ISSUER = "vendicore"
+TOKEN_ALGORITHM = "HS256"
+REVOCATION_NAMESPACE = "token_revocation"
+REVOKED_JTI_KEY = "vendicore_vas:token_revoked_jti"
+MERCHANT_NOT_BEFORE_KEY = "vendicore_vas:token_merchant_nbf"
+
+
+def _signing_key():
+    return settings.ACCESS_TOKEN_SIGNING_KEY
+
+
+#================ TOKEN PRINCIPAL ====
+class TokenPrincipal:
+    """Principal rebuilt from verified token claims, no database involved."""
+
+    __slots__ = ("merchant_id", "merchant_code", "user_id", "jti", "expires_at", "is_active")
+
+    def __init__(self, claims):
+        self.merchant_id = int(claims["sub"])
+        self.merchant_code = claims["mc"]
+        self.user_id = claims["uid"]
+        self.jti = claims["jti"]
+        self.expires_at = claims["exp"]
+        self.is_active = True
+
+    def __repr__(self):
+        return f"<TokenPrincipal {self.merchant_code}>"
+
+
+#================ REVOCATION LIST ====
+class RevocationList:
+    def __init__(self):
+        self._jtis = {}  # jti -> exp, pruned once expired
+        self._merchant_not_before = {}  # merchant_id -> epoch seconds (float)
+        self._loaded = False
+        self._lock = threading.Lock()
+        register_handler(REVOCATION_NAMESPACE, self.apply, self.reload)
+
+    def is_revoked(self, claims):
+        if not self._loaded:
+            self.reload()
+        if claims["jti"] in self._jtis:
+            return True
+        not_before = self._merchant_not_before.get(int(claims["sub"]))
+        return not_before is not None and claims["iat"] < not_before
+
+    def apply(self, message):
+        """Apply one ``jti:<id>:<exp>`` or ``merchant:<id>:<epoch>`` message."""
+        kind, _, rest = message.partition(":")
+        ident, _, value = rest.partition(":")
+        with self._lock:
+            if kind == "jti":
+                self._jtis[ident] = int(value)
+                self._prune()
+            elif kind == "merchant":
+                self._merchant_not_before[int(ident)] = max(float(value), self._merchant_not_before.get(int(ident), 0))
+
+    def reload(self):
+        client = get_redis_client()
+        jtis, not_before = {}, {}
+        if client is not None:
+            try:
+                jtis = {k.decode(): int(v) for k, v in client.hgetall(REVOKED_JTI_KEY).items()}
+                not_before = {int(k): float(v) for k, v in client.hgetall(MERCHANT_NOT_BEFORE_KEY).items()}
+            except Exception as e:
+                logger.error(f"FAILED TO LOAD TOKEN REVOCATIONS:: REASON={e}")
+                return
+        with self._lock:
+            self._jtis.update(jtis)
+            for merchant_id, value in not_before.items():
+                self._merchant_not_before[merchant_id] = max(value, self._merchant_not_before.get(merchant_id, 0))
+            self._prune()
+            self._loaded = True
+
+    def _prune(self):
+        now = int(time.time())
+        expired = [jti for jti, exp in self._jtis.items() if exp < now]
+        for jti in expired:
+            del self._jtis[jti]
+
+
+revocations = RevocationList()
+
+
+#================ ISSUE / VERIFY ====
+def issue_access_token(principal, client_ip):
+    """
+    Mint a token for an already authenticated (signed request) principal.
+
+    When the merchant has an IP allowlist the token is bound to the address
+    that exchanged it, so later requests need no allowlist lookup.
+    """
+    now = round(time.time(), 6)
+    ttl = settings.ACCESS_TOKEN_TTL
+    claims = {
+        "iss": TOKEN_ISSUER,
+        "sub": str(principal.merchant_id),
+        "mc": principal.merchant_code,
+        "uid": principal.user_id,
+        "iat": now,  # sub-second, compared with the merchant's revocation time
+        "exp": int(now) + ttl,
+        "jti": uuid.uuid4().hex,
+    }
+    if principal.allowed_ips:
+        claims["cip"] = client_ip
+    token = jwt.encode(claims, _signing_key(), algorithm=TOKEN_ALGORITHM)
+    return token, ttl
+
+
+def verify_access_token(token, client_ip):
+    """Return a TokenPrincipal for a valid token or raise AuthenticationFailed."""
+    try:
+        claims = jwt.decode(
+            token,
+            _signing_key(),
+            algorithms=[TOKEN_ALGORITHM],
+            issuer=TOKEN_ISSUER,
+            options={"require": ["exp", "iat", "sub", "jti"]},
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed('Access token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed('Invalid access token')
+
+    ensure_listener()
+    if revocations.is_revoked(claims):
+        raise AuthenticationFailed('Access token has been revoked')
+    if "cip" in claims and claims["cip"] != client_ip:
+        logger.error(f"Unauthorized IP: {client_ip} for token issued to {claims['cip']}")
+        raise AuthenticationFailed('Unauthorized IP')
+    return TokenPrincipal(claims)
+
+
+def revoke_token(jti, expires_at):
+    client = get_redis_client()
+    if client is not None:
+        try:
+            # every entry is moot once its token expires, i.e. within one TTL of the last write
+            client.pipeline().hset(REVOKED_JTI_KEY, jti, int(expires_at)).expire(REVOKED_JTI_KEY, settings.ACCESS_TOKEN_TTL).execute()
+        except Exception as e:
+            logger.error(f"FAILED TO PERSIST TOKEN REVOCATION {jti}:: REASON={e}")
+    publish_invalidation(REVOCATION_NAMESPACE, f"jti:{jti}:{int(expires_at)}")
+
+
+def revoke_merchant_tokens(merchant_id):
+    """Invalidate every token issued to ``merchant_id`` up to now."""
+    now = round(time.time(), 6)
+    client = get_redis_client()
+    if client is not None:
+        try:
+            client.pipeline().hset(MERCHANT_NOT_BEFORE_KEY, merchant_id, now).expire(MERCHANT_NOT_BEFORE_KEY, settings.ACCESS_TOKEN_TTL).execute()
+        except Exception as e:
+            logger.error(f"FAILED TO PERSIST MERCHANT TOKEN REVOCATION {merchant_id}:: REASON={e}")
+    publish_invalidation(REVOCATION_NAMESPACE, f"merchant:{merchant_id}:{now}")
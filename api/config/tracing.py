@@ -0,0 +1,479 @@
+"""
+Lightweight built-in tracing.
+
+Spans are kept in a contextvar (so they follow greenlets and threads) and are
+propagated with the W3C ``traceparent`` header: read from incoming HTTP
+requests, written into Celery message headers when a task is published and
+read back when the worker runs it, so a vend, its countdown requery and any
+reversal share one trace id.
+
+Sampling
+    head: a new trace is "sampled" with probability TRACE_SAMPLE_RATE and the
+          decision travels with the traceparent flags, so every downstream
+          segment of a sampled trace is kept.
+    tail: spans of unsampled traces are still recorded (cheaply) until the
+          local root ends; the segment is kept anyway if any span failed or
+          the root took longer than TRACE_TAIL_LATENCY_MS.
+
+Kept segments go to a background exporter: JSON lines to a file
+(TRACE_EXPORTER=file) or OTLP/HTTP JSON to a collector (TRACE_EXPORTER=otlp).
+"""
+import abc
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+MAX_SPANS_PER_SEGMENT = 500
+MAX_STATEMENT_LENGTH = 300
+
+_current = ContextVar("trace_current_span", default=None)
+
+
+def _new_trace_id():
+    return f"{random.getrandbits(128):032x}"
+
+
+def _new_span_id():
+    return f"{random.getrandbits(64):016x}"
+
+
+#================ SPANS ====
+class _Segment:
+    """The spans of one trace recorded in this process under one local root."""
+
+    __slots__ = ("trace_id", "sampled", "spans", "error")
+
+    def __init__(self, trace_id, sampled):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+        self.error = False
+
+
+class Span:
+    __slots__ = ("segment", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, segment, name, parent_id=None, kind="internal", attributes=None):
+        self.segment = segment
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    @property
+    def trace_id(self):
+        return self.segment.trace_id
+
+    @property
+    def traceparent(self):
+        return f"00-{self.segment.trace_id}-{self.span_id}-{'01' if self.segment.sampled else '00'}"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+        self.segment.error = True
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        self.finish()
+        return False
+
+    def finish(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        segment = self.segment
+        if len(segment.spans) < MAX_SPANS_PER_SEGMENT:
+            segment.spans.append(self)
+        if self.parent_id is None or self.kind in ("server", "consumer"):
+            _finish_segment(self)
+
+
+class _NoopSpan:
+    """Returned when tracing is off or there is no trace to attach to."""
+
+    __slots__ = ()
+    trace_id = None
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def finish(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enabled():
+    return settings.TRACING_ENABLED
+
+
+def current_span():
+    return _current.get()
+
+
+def parse_traceparent(value):
+    """``00-<trace_id>-<parent_id>-<flags>`` -> (trace_id, parent_id, sampled) or None."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 0x01)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def start_span(name, kind="internal", traceparent=None, attributes=None, root=True):
+    """
+    Start a span as a child of the current one.
+
+    With no current span a new trace (or a continuation of ``traceparent``) is
+    started, unless ``root`` is False: db/cache/http helpers pass root=False so
+    they only record inside an existing trace.
+    """
+    if not settings.TRACING_ENABLED:
+        return NOOP_SPAN
+    parent = _current.get()
+    if parent is not None and traceparent is None:
+        return Span(parent.segment, name, parent.span_id, kind, attributes)
+    if not root and traceparent is None:
+        return NOOP_SPAN
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id, sampled = _new_trace_id(), None, random.random() < settings.TRACE_SAMPLE_RATE
+    return Span(_Segment(trace_id, sampled), name, parent_id, kind, attributes)
+
+
+def current_traceparent():
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+#================ SAMPLING / EXPORT ====
+def _finish_segment(root):
+    segment = root.segment
+    if not segment.spans:
+        return
+    duration_ms = (root.end_ns - root.start_ns) / 1e6
+    keep = segment.sampled or segment.error or duration_ms >= settings.TRACE_TAIL_LATENCY_MS
+    spans, segment.spans = segment.spans, []
+    if keep:
+        get_exporter().submit(spans)
+
+
+class SpanExporter(abc.ABC):
+    """
+    Exports finished segments from a background thread in batches of about
+    ``batch_size`` spans: a batch goes out as soon as it is full, or
+    ``flush_interval`` after its first segment arrived. Drops segments when
+    the queue is full.
+    """
+
+    def __init__(self, maxsize=2000, batch_size=200, flush_interval=2.0):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, spans):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+            self._pid = os.getpid()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = list(self._queue.get())
+            # a backlog goes out batch after batch; only a quiet queue waits
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.extend(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._safe_export(batch)
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        if self._queue is None or self._pid != os.getpid():
+            return
+        batch = self._drain()
+        if batch:
+            self._safe_export(batch)
+
+    def _safe_export(self, spans):
+        try:
+            self.export(spans)
+        except Exception as e:
+            logger.warning("TRACE EXPORT FAILED:: SPANS=%s REASON=%s", len(spans), e)
+
+    @abc.abstractmethod
+    def export(self, spans):
+        """Send ``spans``; runs on the exporter thread, exceptions are logged."""
+
+
+def _span_dict(span):
+    return {
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "parent_id": span.parent_id,
+        "name": span.name,
+        "kind": span.kind,
+        "start_ns": span.start_ns,
+        "duration_ms": round((span.end_ns - span.start_ns) / 1e6, 3),
+        "attributes": span.attributes,
+        "error": span.error,
+    }
+
+
+class FileSpanExporter(SpanExporter):
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, "a") as fh:
+            for span in spans:
+                fh.write(json.dumps(_span_dict(span), default=str) + "\n")
+
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """OTLP/HTTP with the JSON encoding, e.g. an OpenTelemetry collector on :4318."""
+
+    def __init__(self, endpoint, service_name, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._session = None
+
+    def export(self, spans):
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "vendicore"}, "spans": [
+                {
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": _OTLP_KINDS.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                }
+                for span in spans
+            ]}],
+        }]}
+        resp = self._session.post(self.endpoint, json=body, timeout=5)
+        resp.raise_for_status()
+
+
+class _NullExporter(SpanExporter):
+    def submit(self, spans):
+        pass
+
+
+_exporter = None
+
+
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        kind = settings.TRACE_EXPORTER
+        if kind == "otlp":
+            _exporter = OtlpHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME)
+        elif kind == "file":
+            _exporter = FileSpanExporter(settings.TRACE_FILE_PATH)
+        else:
+            _exporter = _NullExporter()
+    return _exporter
+
+
+#================ DB / LOGGING ====
+def db_span_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: one span per query inside an active trace."""
+    span = start_span("db.query", kind="client", root=False)
+    if span is NOOP_SPAN:
+        return execute(sql, params, many, context)
+    span.set_attribute("db.statement", sql[:MAX_STATEMENT_LENGTH])
+    span.set_attribute("db.alias", context["connection"].alias)
+    with span:
+        return execute(sql, params, many, context)
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds trace_id/span_id to log records so log lines can be joined to traces."""
+
+    def filter(self, record):
+        span = _current.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+#================ MIDDLEWARE ====
+class TracingMiddleware:
+    """Server span per request, continuing an incoming ``traceparent``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.TRACING_ENABLED or request.path_info == "/metrics":
+            return self.get_response(request)
+        from django.db import connections
+        from contextlib import ExitStack
+
+        span = start_span(
+            f"{request.method} {request.path_info}", kind="server",
+            traceparent=request.headers.get(TRACEPARENT_HEADER),
+            attributes={"http.method": request.method, "http.target": request.path_info},
+        )
+        with span, ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(db_span_wrapper))
+            response = self.get_response(request)
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.record_error(f"HTTP {response.status_code}")
+            response["traceresponse"] = span.traceparent
+            return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        span = _current.get()
+        match = request.resolver_match
+        if span is not None and match is not None and match.url_name:
+            span.name = f"{request.method} {match.url_name}"
+            span.set_attribute("http.route", match.route)
+        return None
+
+
+#================ CELERY ====
+_task_spans = {}
+
+
+def install_celery_hooks():
+    """Connect the publish/run signals; called from config.celery."""
+    from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+
+    @before_task_publish.connect(weak=False)
+    def inject_traceparent(headers=None, **kwargs):
+        traceparent = current_traceparent()
+        if traceparent and headers is not None:
+            headers[TRACEPARENT_HEADER] = traceparent
+
+    @task_prerun.connect(weak=False)
+    def start_task_span(task_id=None, task=None, **kwargs):
+        request = task.request
+        traceparent = getattr(request, TRACEPARENT_HEADER, None) or (request.headers or {}).get(TRACEPARENT_HEADER)
+        span = start_span(f"celery {task.name}", kind="consumer", traceparent=traceparent,
+                          attributes={"celery.task_id": task_id, "celery.retries": request.retries})
+        if span is NOOP_SPAN:
+            return
+        from contextlib import ExitStack
+        from django.db import connections
+        span.__enter__()
+        db_wrappers = ExitStack()
+        for alias in connections:
+            db_wrappers.enter_context(connections[alias].execute_wrapper(db_span_wrapper))
+        _task_spans[task_id] = (span, db_wrappers)
+
+    @task_failure.connect(weak=False)
+    def fail_task_span(task_id=None, exception=None, **kwargs):
+        entry = _task_spans.get(task_id)
+        if entry is not None:
+            entry[0].record_error(exception)
+
+    @task_postrun.connect(weak=False)
+    def finish_task_span(task_id=None, state=None, **kwargs):
+        entry = _task_spans.pop(task_id, None)
+        if entry is None:
+            return
+        span, db_wrappers = entry
+        db_wrappers.close()
+        span.set_attribute("celery.state", state)
+        span.__exit__(None, None, None)
@@ -3,12 +3,15 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 #from rest_framework_simplejwt import views as jwt_views
 from . import views
+from .metrics import metrics_view
 
 
 urlpatterns = [
     #path('admin/', admin.site.urls),
     path('api/product/',include('apps.product.urls')),
     path('api/merchant/',include('apps.merchant.urls')),
+    path('api/report/',include('apps.report.urls')),
+    path('metrics', metrics_view, name="metrics"),
    # Catch-all pattern for unrecognized routes
     re_path(r'^.*$', views.HandleInvalidRoute.as_view()),
 ]
@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for the API containers.
+
+Prometheus multiprocess mode: every worker writes its metric samples to
+PROMETHEUS_MULTIPROC_DIR, which has to be set before prometheus_client is
+imported (i.e. before the app loads) and emptied when the master starts so
+samples from a previous run are not aggregated again.
+"""
+import os
+import shutil
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/vendicore_metrics")
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # psycopg2 blocks in C; the wait callback yields to other greenlets while
+    # a query is in flight instead of stalling the whole worker
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen not installed, database calls will block the gevent worker")
+        else:
+            patch_psycopg()
+
+
+def child_exit(server, worker):
+    # drop the dead worker's live gauges (in-flight) from the aggregate
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)